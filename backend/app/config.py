@@ -13,10 +13,102 @@ class Settings:
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: set = {".pdf"}
     
+    # Page-level PDF extraction cache
+    PAGE_CACHE_DIR: str = os.getenv("PAGE_CACHE_DIR", "cache/pages")
+    PAGE_CACHE_MAX_BYTES: int = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))  # 200MB
+    
+    # Cross-page boilerplate removal before text is sent to Gemini
+    BOILERPLATE_REMOVAL_ENABLED: bool = os.getenv("BOILERPLATE_REMOVAL_ENABLED", "true").lower() == "true"
+    BOILERPLATE_MIN_PAGE_RATIO: float = float(os.getenv("BOILERPLATE_MIN_PAGE_RATIO", "0.5"))
+    BOILERPLATE_EDGE_LINES: int = int(os.getenv("BOILERPLATE_EDGE_LINES", "3"))
+    BOILERPLATE_MIN_LINE_CHARS: int = int(os.getenv("BOILERPLATE_MIN_LINE_CHARS", "30"))
+    
+    # Streaming extraction of long documents: pages are parsed into the page cache,
+    # then read back one at a time and sent to Gemini in chunks of at most
+    # PDF_STREAMING_CHUNK_CHARS, so memory does not grow with the document (0 disables)
+    PDF_STREAMING_MIN_PAGES: int = int(os.getenv("PDF_STREAMING_MIN_PAGES", "150"))
+    PDF_STREAMING_CHUNK_CHARS: int = int(os.getenv("PDF_STREAMING_CHUNK_CHARS", "100000"))
+    
+    # Incremental re-extraction: above this fraction of changed pages, extract everything
+    INCREMENTAL_MAX_CHANGED_RATIO: float = float(os.getenv("INCREMENTAL_MAX_CHANGED_RATIO", "0.7"))
+    
     # Gemini model configuration
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
     GEMINI_TEMPERATURE: float = float(os.getenv("GEMINI_TEMPERATURE", "0.1"))
     GEMINI_MAX_TOKENS: int = int(os.getenv("GEMINI_MAX_TOKENS", "40000"))
+    GEMINI_MAX_INPUT_CHARS: int = int(os.getenv("GEMINI_MAX_INPUT_CHARS", "100000"))
+    GEMINI_MAX_SPLIT_DEPTH: int = int(os.getenv("GEMINI_MAX_SPLIT_DEPTH", "4"))
+    
+    # Gemini client pool (long-lived connections shared by all jobs)
+    GEMINI_CLIENT_POOL_SIZE: int = int(os.getenv("GEMINI_CLIENT_POOL_SIZE", "4"))
+    GEMINI_CLIENT_ACQUIRE_TIMEOUT: float = float(os.getenv("GEMINI_CLIENT_ACQUIRE_TIMEOUT", "300"))
+    GEMINI_WARMUP_TIMEOUT: float = float(os.getenv("GEMINI_WARMUP_TIMEOUT", "5"))
+    GEMINI_TRANSPORT: str = os.getenv("GEMINI_TRANSPORT", "")  # "grpc" (default) or "rest"
+    
+    # Gemini call deadlines and hedging: a call is abandoned after
+    # GEMINI_CALL_TIMEOUT_SECONDS (0 = no deadline). With hedging, a call still
+    # running past the GEMINI_HEDGE_PERCENTILE latency of the last
+    # GEMINI_LATENCY_HISTORY calls of similar size gets a duplicate request;
+    # hedges are capped to GEMINI_HEDGE_MAX_EXTRA_FRACTION of the calls of the last hour
+    GEMINI_CALL_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_CALL_TIMEOUT_SECONDS", "300"))
+    GEMINI_HEDGING_ENABLED: bool = os.getenv("GEMINI_HEDGING_ENABLED", "true").lower() == "true"
+    GEMINI_HEDGE_PERCENTILE: float = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+    GEMINI_HEDGE_MIN_SAMPLES: int = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+    GEMINI_HEDGE_MAX_EXTRA_FRACTION: float = float(os.getenv("GEMINI_HEDGE_MAX_EXTRA_FRACTION", "0.05"))
+    GEMINI_LATENCY_HISTORY: int = int(os.getenv("GEMINI_LATENCY_HISTORY", "200"))
+    
+    # Gemini rate limiting (0 disables a quota)
+    GEMINI_REQUESTS_PER_MINUTE: int = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "15"))
+    GEMINI_TOKENS_PER_MINUTE: int = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+    GEMINI_RATE_LIMIT_STATE_FILE: str = os.getenv("GEMINI_RATE_LIMIT_STATE_FILE", "")
+    
+    # Database-backed job queue: with JOB_QUEUE_ENABLED the API only enqueues
+    # uploads and `python worker.py` processes them; otherwise the API runs
+    # each job itself during the request
+    JOB_QUEUE_ENABLED: bool = os.getenv("JOB_QUEUE_ENABLED", "false").lower() == "true"
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+    JOB_HEARTBEAT_SECONDS: float = float(os.getenv("JOB_HEARTBEAT_SECONDS", "20"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_CANCEL_POLL_SECONDS: float = float(os.getenv("JOB_CANCEL_POLL_SECONDS", "2"))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "2"))
+    JOB_QUEUE_LOCK_FILE: str = os.getenv("JOB_QUEUE_LOCK_FILE", "job_queue.lock")  # SQLite only
+    
+    # Admission control: uploads get 429 once this many jobs are pending or
+    # processing (0 = unbounded; at most 32 when jobs run in the API process),
+    # and each pipeline stage runs at most this many jobs at a time per process
+    # (0 = unlimited)
+    MAX_QUEUED_JOBS: int = int(os.getenv("MAX_QUEUED_JOBS", "50"))
+    STAGE_PARSING_CONCURRENCY: int = int(os.getenv("STAGE_PARSING_CONCURRENCY", str(os.cpu_count() or 1)))
+    STAGE_LLM_CONCURRENCY: int = int(os.getenv("STAGE_LLM_CONCURRENCY", "8"))
+    STAGE_EXCEL_CONCURRENCY: int = int(os.getenv("STAGE_EXCEL_CONCURRENCY", str(min(2, os.cpu_count() or 1))))
+    ADMISSION_THROUGHPUT_WINDOW_SECONDS: float = float(os.getenv("ADMISSION_THROUGHPUT_WINDOW_SECONDS", "900"))
+    ADMISSION_DEFAULT_JOB_SECONDS: float = float(os.getenv("ADMISSION_DEFAULT_JOB_SECONDS", "60"))  # Until a job has finished
+    
+    # Window in which a repeated Idempotency-Key on /api/extract returns the existing job
+    IDEMPOTENCY_KEY_TTL_HOURS: float = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+    
+    # Excel regeneration worker pool size
+    REGENERATE_WORKERS: int = int(os.getenv("REGENERATE_WORKERS", str(min(4, os.cpu_count() or 1))))
+    
+    # Workbook comparison (accuracy scoring)
+    COMPARE_REL_TOLERANCE: float = float(os.getenv("COMPARE_REL_TOLERANCE", "0.001"))
+    COMPARE_ABS_TOLERANCE: float = float(os.getenv("COMPARE_ABS_TOLERANCE", "0.01"))
+    COMPARE_MAX_DIFFS: int = int(os.getenv("COMPARE_MAX_DIFFS", "50"))
+    COMPARE_WORKERS: int = int(os.getenv("COMPARE_WORKERS", str(min(4, os.cpu_count() or 1))))
+    
+    # Streaming data export
+    EXPORT_MAX_RESULTS: int = int(os.getenv("EXPORT_MAX_RESULTS", "10000"))
+    EXPORT_PARQUET_ROW_GROUP: int = int(os.getenv("EXPORT_PARQUET_ROW_GROUP", "10000"))
+    
+    # Storage retention for uploads/ and outputs/ (0 disables a limit)
+    RETENTION_ENABLED: bool = os.getenv("RETENTION_ENABLED", "true").lower() == "true"
+    RETENTION_INTERVAL_SECONDS: int = int(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+    RETENTION_MAX_AGE_DAYS: float = float(os.getenv("RETENTION_MAX_AGE_DAYS", "30"))
+    RETENTION_MAX_TOTAL_BYTES: int = int(os.getenv("RETENTION_MAX_TOTAL_BYTES", str(2 * 1024 * 1024 * 1024)))  # 2GB
+    RETENTION_ORPHAN_GRACE_SECONDS: int = int(os.getenv("RETENTION_ORPHAN_GRACE_SECONDS", "3600"))
+    
+    # Number of results whose parsed sheets are kept for paged previews
+    SHEET_PREVIEW_CACHE_SIZE: int = int(os.getenv("SHEET_PREVIEW_CACHE_SIZE", "32"))
     
     # Database configuration (Neon PostgreSQL)
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
@@ -1,6 +1,20 @@
 """Database package initialization."""
 
-from .models import Base, UploadedFile, ExtractionResult, ExtractionLog, JobStatus
+from .models import (
+    Base,
+    UploadedFile,
+    ExtractionResult,
+    ExtractionLog,
+    JobStatus,
+    FundSummary,
+    PortfolioInvestment,
+    PortfolioCompanyProfile,
+    PortfolioCompanyFinancial,
+    FundLatestReport,
+    FundQuarterMetric,
+    FundExposure,
+    SearchDocument
+)
 from .database import engine, SessionLocal, get_db, init_db
 
 __all__ = [
@@ -9,6 +23,14 @@ __all__ = [
     "ExtractionResult",
     "ExtractionLog",
     "JobStatus",
+    "FundSummary",
+    "PortfolioInvestment",
+    "PortfolioCompanyProfile",
+    "PortfolioCompanyFinancial",
+    "FundLatestReport",
+    "FundQuarterMetric",
+    "FundExposure",
+    "SearchDocument",
     "engine",
     "SessionLocal",
     "get_db",
@@ -2,9 +2,12 @@
 CRUD operations for database models.
 """
 
-from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from sqlalchemy import Text, and_, cast, func, insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, defer
+from typing import Callable, List, Optional, Dict, Any, Iterator, Set, Tuple
+from datetime import date, datetime
+import html
 import uuid
 
 from .models import (
@@ -13,8 +16,36 @@ from .models import (
     ExtractionLog,
     JobStatus,
     JobStatusEnum,
-    LogLevelEnum
+    LogLevelEnum,
+    FundSummary,
+    PortfolioInvestment,
+    PortfolioCompanyProfile,
+    PortfolioCompanyFinancial,
+    FundLatestReport,
+    FundQuarterMetric,
+    FundExposure,
+    SearchDocument
 )
+from .fulltext import FULLTEXT_PREFIX, PG_DOCUMENT_VECTOR, PG_TS_CONFIG
+
+# Results with stored data: None assigned to the JSON column is stored as a
+# JSON null rather than SQL NULL, so both are excluded
+HAS_EXTRACTED_DATA = and_(
+    ExtractionResult.extracted_data.isnot(None),
+    cast(ExtractionResult.extracted_data, Text) != "null"
+)
+
+# Delimiters of matches in search snippets, replaced by <mark> tags once the
+# snippet text has been HTML-escaped
+SNIPPET_MATCH_START = "\x02"
+SNIPPET_MATCH_END = "\x03"
+
+
+def _snippet_html(snippet: Optional[str]) -> Optional[str]:
+    """HTML-escape a search snippet and mark its matches with <mark> tags."""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(SNIPPET_MATCH_START, "<mark>").replace(SNIPPET_MATCH_END, "</mark>")
 
 
 class UploadedFileService:
@@ -67,6 +98,32 @@ class UploadedFileService:
             query = query.order_by(UploadedFile.upload_timestamp.asc())
         return query.offset(skip).limit(limit).all()
     
+    @staticmethod
+    def get_all_paths(db: Session) -> List[Tuple[int, str]]:
+        """Get (id, file_path) of every uploaded file, without loading full rows."""
+        return [(row.id, row.file_path) for row in db.query(UploadedFile.id, UploadedFile.file_path).all()]
+    
+    @staticmethod
+    def set_page_hashes(db: Session, file_id: int, page_hashes: List[str]) -> Optional[UploadedFile]:
+        """Store the page fingerprints of an uploaded file."""
+        db_file = db.query(UploadedFile).filter(UploadedFile.id == file_id).first()
+        if db_file:
+            db_file.page_hashes = page_hashes
+            db.commit()
+            db.refresh(db_file)
+        return db_file
+    
+    @staticmethod
+    def mark_evicted(db: Session, file_ids: List[int], evicted_at: datetime) -> int:
+        """Mark uploaded files whose PDF was removed by the retention manager."""
+        if not file_ids:
+            return 0
+        count = db.query(UploadedFile).filter(UploadedFile.id.in_(file_ids)).update(
+            {UploadedFile.evicted_at: evicted_at}, synchronize_session=False
+        )
+        db.commit()
+        return count
+    
     @staticmethod
     def delete(db: Session, file_id: int) -> bool:
         """Delete uploaded file record."""
@@ -91,7 +148,9 @@ class ExtractionResultService:
         processing_time: Optional[float] = None,
         total_characters_extracted: Optional[int] = None,
         total_sheets_generated: Optional[int] = None,
-        gemini_model_used: Optional[str] = None
+        gemini_model_used: Optional[str] = None,
+        base_file_id: Optional[int] = None,
+        inherited_sections: Optional[List[str]] = None
     ) -> ExtractionResult:
         """Create a new extraction result record."""
         db_result = ExtractionResult(
@@ -102,7 +161,9 @@ class ExtractionResultService:
             processing_time=processing_time,
             total_characters_extracted=total_characters_extracted,
             total_sheets_generated=total_sheets_generated,
-            gemini_model_used=gemini_model_used
+            gemini_model_used=gemini_model_used,
+            base_file_id=base_file_id,
+            inherited_sections=inherited_sections
         )
         db.add(db_result)
         db.commit()
@@ -119,6 +180,55 @@ class ExtractionResultService:
         """Get extraction result by ID."""
         return db.query(ExtractionResult).filter(ExtractionResult.id == result_id).first()
     
+    @staticmethod
+    def get_by_id_deferred(db: Session, result_id: int) -> Optional[ExtractionResult]:
+        """Get extraction result by ID without loading extracted_data until it is accessed."""
+        return db.query(ExtractionResult).options(
+            defer(ExtractionResult.extracted_data)
+        ).filter(ExtractionResult.id == result_id).first()
+    
+    @staticmethod
+    def has_extracted_data(db: Session, result_id: int) -> Optional[bool]:
+        """
+        Whether a result has stored extracted data, checked in SQL without loading it.
+        
+        Returns:
+            None if the result does not exist
+        """
+        row = db.query(HAS_EXTRACTED_DATA.label("has_data")).filter(ExtractionResult.id == result_id).first()
+        return None if row is None else bool(row.has_data)
+    
+    @staticmethod
+    def get_by_excel_filename(db: Session, excel_filename: str) -> Optional[ExtractionResult]:
+        """Get extraction result by its Excel filename."""
+        return db.query(ExtractionResult).filter(ExtractionResult.excel_filename == excel_filename).first()
+    
+    @staticmethod
+    def get_all_excel_paths(db: Session) -> List[Tuple[int, int, str, bool]]:
+        """
+        Get (id, file_id, excel_path, has extracted data) of every result,
+        without loading extracted_data. Only results with extracted data can
+        have their Excel file regenerated.
+        """
+        return [
+            (row.id, row.file_id, row.excel_path, bool(row.has_data))
+            for row in db.query(
+                ExtractionResult.id, ExtractionResult.file_id, ExtractionResult.excel_path,
+                HAS_EXTRACTED_DATA.label("has_data")
+            ).all()
+        ]
+    
+    @staticmethod
+    def mark_excel_evicted(db: Session, result_ids: List[int], evicted_at: Optional[datetime]) -> int:
+        """Mark (or, with evicted_at=None, unmark) results whose Excel file was evicted."""
+        if not result_ids:
+            return 0
+        count = db.query(ExtractionResult).filter(ExtractionResult.id.in_(result_ids)).update(
+            {ExtractionResult.excel_evicted_at: evicted_at}, synchronize_session=False
+        )
+        db.commit()
+        return count
+    
     @staticmethod
     def get_all(
         db: Session,
@@ -130,6 +240,99 @@ class ExtractionResultService:
             ExtractionResult.extraction_timestamp.desc()
         ).offset(skip).limit(limit).all()
     
+    @staticmethod
+    def _filtered_query(
+        query,
+        gemini_model_used: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ):
+        """Apply the result filters shared by regeneration and export."""
+        query = query.filter(HAS_EXTRACTED_DATA)
+        if gemini_model_used:
+            query = query.filter(ExtractionResult.gemini_model_used == gemini_model_used)
+        if since:
+            query = query.filter(ExtractionResult.extraction_timestamp >= since)
+        if until:
+            query = query.filter(ExtractionResult.extraction_timestamp <= until)
+        return query.order_by(ExtractionResult.extraction_timestamp.desc(), ExtractionResult.id.desc())
+    
+    @staticmethod
+    def get_filtered(
+        db: Session,
+        gemini_model_used: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[ExtractionResult]:
+        """Get extraction results that have stored data, with optional filtering."""
+        query = ExtractionResultService._filtered_query(
+            db.query(ExtractionResult), gemini_model_used, since, until
+        )
+        return query.offset(skip).limit(limit).all()
+    
+    @staticmethod
+    def get_filtered_ids(
+        db: Session,
+        gemini_model_used: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[int]:
+        """Get the IDs of extraction results that have stored data, without loading the data."""
+        query = ExtractionResultService._filtered_query(
+            db.query(ExtractionResult.id), gemini_model_used, since, until
+        )
+        return [row.id for row in query.offset(skip).limit(limit).all()]
+    
+    @staticmethod
+    def get_filtered_excel_paths(
+        db: Session,
+        gemini_model_used: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[Tuple[int, str]]:
+        """Get (id, excel_path) of extraction results that have stored data, without loading the data."""
+        query = ExtractionResultService._filtered_query(
+            db.query(ExtractionResult.id, ExtractionResult.excel_path), gemini_model_used, since, until
+        )
+        return [(row.id, row.excel_path) for row in query.offset(skip).limit(limit).all()]
+    
+    @staticmethod
+    def get_by_ids(db: Session, result_ids: List[int]) -> List[ExtractionResult]:
+        """Get extraction results by ID, in the given order."""
+        if not result_ids:
+            return []
+        results = {
+            result.id: result
+            for result in db.query(ExtractionResult).filter(ExtractionResult.id.in_(result_ids)).all()
+        }
+        return [results[result_id] for result_id in result_ids if result_id in results]
+    
+    @staticmethod
+    def iter_extracted_data(
+        db: Session,
+        result_ids: List[int],
+        batch_size: int = 50
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Yield (result_id, extracted_data) in the given order, loading a batch at a time.
+        Only the two columns are selected, so nothing accumulates in the session.
+        """
+        for start in range(0, len(result_ids), batch_size):
+            batch = result_ids[start:start + batch_size]
+            rows = db.query(ExtractionResult.id, ExtractionResult.extracted_data).filter(
+                ExtractionResult.id.in_(batch)
+            ).all()
+            data_by_id = {row.id: row.extracted_data for row in rows}
+            for result_id in batch:
+                if data_by_id.get(result_id) is not None:
+                    yield result_id, data_by_id.pop(result_id)
+    
     @staticmethod
     def update_extracted_data(
         db: Session,
@@ -152,9 +355,19 @@ class JobStatusService:
     def create(
         db: Session,
         file_id: int,
-        job_id: Optional[str] = None
+        job_id: Optional[str] = None,
+        template_id: Optional[str] = None,
+        prior_file_id: Optional[int] = None,
+        idempotency_key: Optional[str] = None,
+        request_fingerprint: Optional[str] = None
     ) -> JobStatus:
-        """Create a new job status record."""
+        """
+        Create a new job status record.
+        
+        Raises:
+            IntegrityError: If another job holds the idempotency key (the
+                session is rolled back)
+        """
         if not job_id:
             job_id = str(uuid.uuid4())
         
@@ -162,10 +375,19 @@ class JobStatusService:
             file_id=file_id,
             job_id=job_id,
             status=JobStatusEnum.PENDING,
-            progress_percentage=0
+            current_step="queued",
+            progress_percentage=0,
+            template_id=template_id,
+            prior_file_id=prior_file_id,
+            idempotency_key=idempotency_key,
+            request_fingerprint=request_fingerprint
         )
         db.add(db_job)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise
         db.refresh(db_job)
         return db_job
     
@@ -174,6 +396,20 @@ class JobStatusService:
         """Get job status by job ID."""
         return db.query(JobStatus).filter(JobStatus.job_id == job_id).first()
     
+    @staticmethod
+    def get_by_idempotency_key(db: Session, idempotency_key: str) -> Optional[JobStatus]:
+        """Get the job created by the request with this Idempotency-Key."""
+        return db.query(JobStatus).filter(JobStatus.idempotency_key == idempotency_key).first()
+    
+    @staticmethod
+    def release_idempotency_key(db: Session, job_id: str) -> bool:
+        """Detach a job from its Idempotency-Key, so the key can start a new job."""
+        count = db.query(JobStatus).filter(JobStatus.job_id == job_id).update(
+            {JobStatus.idempotency_key: None}, synchronize_session=False
+        )
+        db.commit()
+        return count > 0
+    
     @staticmethod
     def get_by_file_id(db: Session, file_id: int) -> Optional[JobStatus]:
         """Get job status by file ID."""
@@ -231,6 +467,265 @@ class JobStatusService:
         if status:
             query = query.filter(JobStatus.status == status)
         return query.order_by(JobStatus.created_at.desc()).offset(skip).limit(limit).all()
+    
+    @staticmethod
+    def claim(
+        db: Session,
+        worker_id: str,
+        lease_expires_at: datetime,
+        job_id: Optional[str] = None
+    ) -> Optional[JobStatus]:
+        """
+        Claim the oldest pending job (or the given one) for a worker.
+        The pending row is selected with FOR UPDATE SKIP LOCKED, so concurrent
+        workers on PostgreSQL each get a different job without waiting; the
+        conditional update makes the claim safe where row locks are not
+        supported (SQLite).
+        
+        Returns:
+            The claimed job, or None if no pending job is available
+        """
+        query = db.query(JobStatus.id).filter(JobStatus.status == JobStatusEnum.PENDING)
+        if job_id:
+            query = query.filter(JobStatus.job_id == job_id)
+        row = query.order_by(JobStatus.created_at, JobStatus.id).with_for_update(skip_locked=True).first()
+        if row is None:
+            db.rollback()
+            return None
+        
+        now = datetime.utcnow()
+        claimed = db.query(JobStatus).filter(
+            JobStatus.id == row.id,
+            JobStatus.status == JobStatusEnum.PENDING
+        ).update({
+            JobStatus.status: JobStatusEnum.PROCESSING,
+            JobStatus.current_step: "claimed",
+            JobStatus.worker_id: worker_id,
+            JobStatus.heartbeat_at: now,
+            JobStatus.lease_expires_at: lease_expires_at,
+            JobStatus.started_at: now,
+            JobStatus.completed_at: None,
+            JobStatus.error_message: None
+        }, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return None
+        return db.query(JobStatus).filter(JobStatus.id == row.id).first()
+    
+    @staticmethod
+    def renew_lease(db: Session, job_id: str, worker_id: str, lease_expires_at: datetime) -> bool:
+        """
+        Extend the lease of a job still held by the worker (heartbeat).
+        
+        Returns:
+            False if the worker no longer holds the job
+        """
+        renewed = db.query(JobStatus).filter(
+            JobStatus.job_id == job_id,
+            JobStatus.worker_id == worker_id,
+            JobStatus.status == JobStatusEnum.PROCESSING
+        ).update({
+            JobStatus.heartbeat_at: datetime.utcnow(),
+            JobStatus.lease_expires_at: lease_expires_at
+        }, synchronize_session=False)
+        db.commit()
+        return renewed == 1
+    
+    @staticmethod
+    def release_lease(db: Session, job_id: str, worker_id: str) -> bool:
+        """Clear the lease of a job the worker has finished with."""
+        released = db.query(JobStatus).filter(
+            JobStatus.job_id == job_id,
+            JobStatus.worker_id == worker_id
+        ).update({JobStatus.lease_expires_at: None}, synchronize_session=False)
+        db.commit()
+        return released == 1
+    
+    @staticmethod
+    def update_progress(
+        db: Session,
+        job_id: str,
+        worker_id: Optional[str],
+        current_step: str,
+        progress_percentage: int
+    ) -> bool:
+        """
+        Record the progress of a job still processed by the worker.
+        
+        Returns:
+            False if the job is no longer processing (cancelled or requeued)
+            or is now held by another worker
+        """
+        updated = db.query(JobStatus).filter(
+            JobStatus.job_id == job_id,
+            JobStatus.worker_id == worker_id,
+            JobStatus.status == JobStatusEnum.PROCESSING
+        ).update({
+            JobStatus.current_step: current_step,
+            JobStatus.progress_percentage: progress_percentage
+        }, synchronize_session=False)
+        db.commit()
+        return updated == 1
+    
+    @staticmethod
+    def complete(db: Session, job_id: str, worker_id: Optional[str], commit: bool = True) -> bool:
+        """
+        Mark a job completed if the worker still holds it.
+        With commit=False the update is only flushed, so it is committed
+        together with the job's result: a cancellation either happens before
+        it (and the result is never stored) or finds the job completed.
+        
+        Returns:
+            False if the job was cancelled, requeued or taken over by another worker
+        """
+        completed = db.query(JobStatus).filter(
+            JobStatus.job_id == job_id,
+            JobStatus.worker_id == worker_id,
+            JobStatus.status == JobStatusEnum.PROCESSING
+        ).update({
+            JobStatus.status: JobStatusEnum.COMPLETED,
+            JobStatus.current_step: "completed",
+            JobStatus.progress_percentage: 100,
+            JobStatus.completed_at: datetime.utcnow()
+        }, synchronize_session=False)
+        if commit:
+            db.commit()
+        return completed == 1
+    
+    @staticmethod
+    def fail(db: Session, job_id: str, worker_id: Optional[str], error_message: str) -> bool:
+        """
+        Mark a job failed if the worker still holds it.
+        
+        Returns:
+            False if the job was cancelled, requeued or taken over by another worker
+        """
+        failed = db.query(JobStatus).filter(
+            JobStatus.job_id == job_id,
+            JobStatus.worker_id == worker_id,
+            JobStatus.status == JobStatusEnum.PROCESSING
+        ).update({
+            JobStatus.status: JobStatusEnum.FAILED,
+            JobStatus.error_message: error_message,
+            JobStatus.completed_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+        return failed == 1
+    
+    @staticmethod
+    def mark_cancelled(db: Session, job_id: str, worker_id: Optional[str]) -> bool:
+        """
+        Record that the worker stopped a cancelled job (or cancel it, if it is
+        still processing).
+        
+        Returns:
+            False if the job is held by another worker or has already finished
+        """
+        cancelled = db.query(JobStatus).filter(
+            JobStatus.job_id == job_id,
+            JobStatus.worker_id == worker_id,
+            JobStatus.status.in_([JobStatusEnum.PROCESSING, JobStatusEnum.CANCELLED])
+        ).update({
+            JobStatus.status: JobStatusEnum.CANCELLED,
+            JobStatus.current_step: "cancelled",
+            JobStatus.completed_at: func.coalesce(JobStatus.completed_at, datetime.utcnow())
+        }, synchronize_session=False)
+        db.commit()
+        return cancelled == 1
+    
+    @staticmethod
+    def get_status(db: Session, job_id: str) -> Optional[JobStatusEnum]:
+        """Get only the status of a job (polled by running jobs)."""
+        return db.query(JobStatus.status).filter(JobStatus.job_id == job_id).scalar()
+    
+    @staticmethod
+    def cancel(db: Session, job_id: str) -> bool:
+        """
+        Mark a pending or processing job as cancelled.
+        
+        Returns:
+            False if the job does not exist or has already finished
+        """
+        cancelled = db.query(JobStatus).filter(
+            JobStatus.job_id == job_id,
+            JobStatus.status.in_([JobStatusEnum.PENDING, JobStatusEnum.PROCESSING])
+        ).update({
+            JobStatus.status: JobStatusEnum.CANCELLED,
+            JobStatus.current_step: "cancelled",
+            JobStatus.completed_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+        return cancelled == 1
+    
+    @staticmethod
+    def requeue_expired(db: Session, now: datetime, max_attempts: int) -> Tuple[int, int]:
+        """
+        Return jobs whose lease expired (their worker died or hung) to the queue.
+        Jobs that already used max_attempts leases are failed instead.
+        
+        Returns:
+            Tuple of (requeued jobs, failed jobs)
+        """
+        expired = db.query(JobStatus).filter(
+            JobStatus.status == JobStatusEnum.PROCESSING,
+            JobStatus.lease_expires_at.isnot(None),
+            JobStatus.lease_expires_at < now
+        )
+        failed = expired.filter(JobStatus.retry_count + 1 >= max_attempts).update({
+            JobStatus.status: JobStatusEnum.FAILED,
+            JobStatus.retry_count: JobStatus.retry_count + 1,
+            JobStatus.lease_expires_at: None,
+            JobStatus.completed_at: now,
+            JobStatus.error_message: f"Worker lease expired {max_attempts} times"
+        }, synchronize_session=False)
+        requeued = expired.update({
+            JobStatus.status: JobStatusEnum.PENDING,
+            JobStatus.current_step: "queued",
+            JobStatus.progress_percentage: 0,
+            JobStatus.retry_count: JobStatus.retry_count + 1,
+            JobStatus.worker_id: None,
+            JobStatus.heartbeat_at: None,
+            JobStatus.lease_expires_at: None
+        }, synchronize_session=False)
+        db.commit()
+        return requeued, failed
+    
+    @staticmethod
+    def get_unfinished_file_ids(db: Session) -> Set[int]:
+        """
+        IDs of the uploaded files still needed by pending or processing jobs:
+        their own upload and the prior report of an incremental extraction.
+        """
+        rows = db.query(JobStatus.file_id, JobStatus.prior_file_id).filter(
+            JobStatus.status.in_([JobStatusEnum.PENDING, JobStatusEnum.PROCESSING])
+        ).all()
+        return {file_id for row in rows for file_id in row if file_id is not None}
+    
+    @staticmethod
+    def count_finished_since(db: Session, since: datetime) -> int:
+        """Number of jobs completed, failed or cancelled since the given time."""
+        return db.query(func.count(JobStatus.id)).filter(
+            JobStatus.status.in_([JobStatusEnum.COMPLETED, JobStatusEnum.FAILED, JobStatusEnum.CANCELLED]),
+            JobStatus.completed_at >= since
+        ).scalar() or 0
+    
+    @staticmethod
+    def average_duration_seconds(db: Session, sample: int = 50) -> Optional[float]:
+        """Average processing time of the most recently completed jobs, if any."""
+        rows = db.query(JobStatus.started_at, JobStatus.completed_at).filter(
+            JobStatus.status == JobStatusEnum.COMPLETED,
+            JobStatus.started_at.isnot(None),
+            JobStatus.completed_at.isnot(None)
+        ).order_by(JobStatus.completed_at.desc()).limit(sample).all()
+        if not rows:
+            return None
+        return sum((row.completed_at - row.started_at).total_seconds() for row in rows) / len(rows)
+    
+    @staticmethod
+    def count_by_status(db: Session) -> Dict[str, int]:
+        """Number of jobs per status."""
+        rows = db.query(JobStatus.status, func.count(JobStatus.id)).group_by(JobStatus.status).all()
+        return {status.value: count for status, count in rows}
 
 
 class ExtractionLogService:
@@ -293,3 +788,329 @@ class ExtractionLogService:
         count = db.query(ExtractionLog).filter(ExtractionLog.file_id == file_id).delete()
         db.commit()
         return count
+
+
+class PortfolioService:
+    """Service for the normalized portfolio tables derived from extraction results."""
+    
+    @staticmethod
+    def replace_for_result(
+        db: Session,
+        result_id: int,
+        summary: Dict[str, Any],
+        investments: List[Dict[str, Any]],
+        profiles: List[Dict[str, Any]],
+        financials: List[Dict[str, Any]]
+    ) -> Dict[str, int]:
+        """
+        Replace the portfolio rows of a result, in one transaction.
+        Rows are inserted in bulk (one executemany per table). The summary row
+        is always written, so it also marks the result as indexed.
+        """
+        tables = [
+            (FundSummary, [summary]),
+            (PortfolioInvestment, investments),
+            (PortfolioCompanyProfile, profiles),
+            (PortfolioCompanyFinancial, financials),
+        ]
+        for model, _ in tables:
+            db.query(model).filter(model.result_id == result_id).delete(synchronize_session=False)
+        for model, rows in tables:
+            if rows:
+                db.execute(insert(model), [dict(row, result_id=result_id) for row in rows])
+        db.commit()
+        return {"investments": len(investments), "profiles": len(profiles), "financials": len(financials)}
+    
+    @staticmethod
+    def get_fund_key(db: Session, result_id: int) -> Optional[str]:
+        """Get the fund key of a result's summary, if it has been indexed."""
+        return db.query(FundSummary.fund_key).filter(FundSummary.result_id == result_id).scalar()
+    
+    @staticmethod
+    def get_fund_key_by_file_id(db: Session, file_id: int) -> Optional[str]:
+        """Get the fund key of the summary of a file's result, if it has been indexed."""
+        return db.query(FundSummary.fund_key).join(
+            ExtractionResult, ExtractionResult.id == FundSummary.result_id
+        ).filter(ExtractionResult.file_id == file_id).scalar()
+    
+    @staticmethod
+    def get_unindexed_result_ids(db: Session, limit: Optional[int] = None) -> List[int]:
+        """Get the IDs of results with stored data but no portfolio rows yet."""
+        query = db.query(ExtractionResult.id).outerjoin(
+            FundSummary, FundSummary.result_id == ExtractionResult.id
+        ).filter(
+            ExtractionResult.extracted_data.isnot(None),
+            FundSummary.id.is_(None)
+        ).order_by(ExtractionResult.id)
+        if limit:
+            query = query.limit(limit)
+        return [row.id for row in query.all()]
+    
+    @staticmethod
+    def get_holdings(
+        db: Session,
+        company_key: Optional[str] = None,
+        fund: Optional[str] = None,
+        industry: Optional[str] = None,
+        reported_since: Optional[date] = None,
+        reported_until: Optional[date] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[PortfolioInvestment]:
+        """Get holdings matching the filters, most recently reported first."""
+        query = db.query(PortfolioInvestment)
+        if company_key:
+            query = query.filter(PortfolioInvestment.company_key == company_key)
+        if fund:
+            query = query.filter(PortfolioInvestment.fund == fund)
+        if industry:
+            query = query.filter(PortfolioInvestment.industry == industry)
+        if reported_since:
+            query = query.filter(PortfolioInvestment.reported_date >= reported_since)
+        if reported_until:
+            query = query.filter(PortfolioInvestment.reported_date <= reported_until)
+        return query.order_by(
+            PortfolioInvestment.reported_date.desc(), PortfolioInvestment.id
+        ).offset(skip).limit(limit).all()
+
+
+class AnalyticsService:
+    """Service for the cross-fund analytics rollup tables."""
+    
+    @staticmethod
+    def get_fund_summaries(db: Session, fund_key: str) -> List[FundSummary]:
+        """Get every indexed report of a fund."""
+        return db.query(FundSummary).filter(FundSummary.fund_key == fund_key).all()
+    
+    @staticmethod
+    def get_fund_keys(db: Session) -> List[str]:
+        """Get the keys of every fund with an indexed report."""
+        rows = db.query(FundSummary.fund_key).filter(FundSummary.fund_key.isnot(None)).distinct().all()
+        return [row.fund_key for row in rows]
+    
+    @staticmethod
+    def fill_fund_keys(db: Session, key_of: Callable[[Optional[str]], str]) -> int:
+        """Set the fund key of summaries indexed without one."""
+        summaries = db.query(FundSummary).filter(
+            FundSummary.fund_key.is_(None), FundSummary.fund_name.isnot(None)
+        ).all()
+        for summary in summaries:
+            summary.fund_key = key_of(summary.fund_name) or None
+        db.commit()
+        return len(summaries)
+    
+    @staticmethod
+    def holdings_value_by_industry(db: Session, result_id: int) -> List[Tuple[Optional[str], float]]:
+        """Sum the reported value of a result's holdings by industry."""
+        return db.query(
+            PortfolioInvestment.industry, func.sum(PortfolioInvestment.reported_value)
+        ).filter(
+            PortfolioInvestment.result_id == result_id,
+            PortfolioInvestment.reported_value.isnot(None)
+        ).group_by(PortfolioInvestment.industry).all()
+    
+    @staticmethod
+    def replace_fund_rollups(
+        db: Session,
+        fund_key: str,
+        latest: Optional[Dict[str, Any]],
+        quarters: List[Dict[str, Any]],
+        exposures: List[Dict[str, Any]]
+    ):
+        """Replace the rollup rows of one fund, in one transaction."""
+        for model in (FundLatestReport, FundQuarterMetric, FundExposure):
+            db.query(model).filter(model.fund_key == fund_key).delete(synchronize_session=False)
+        if latest:
+            db.execute(insert(FundLatestReport), [dict(latest, fund_key=fund_key, refreshed_at=datetime.utcnow())])
+        for model, rows in ((FundQuarterMetric, quarters), (FundExposure, exposures)):
+            if rows:
+                db.execute(insert(model), [dict(row, fund_key=fund_key) for row in rows])
+        db.commit()
+    
+    @staticmethod
+    def clear_rollups(db: Session):
+        """Delete every rollup row."""
+        for model in (FundLatestReport, FundQuarterMetric, FundExposure):
+            db.query(model).delete(synchronize_session=False)
+        db.commit()
+    
+    @staticmethod
+    def exposure_totals(
+        db: Session,
+        dimension: str,
+        currency: Optional[str] = None
+    ) -> List[Tuple[str, Optional[str], float, int]]:
+        """Sum the exposure of all funds by bucket and currency, largest first."""
+        amount = func.sum(FundExposure.amount)
+        query = db.query(
+            FundExposure.bucket,
+            FundExposure.currency,
+            amount,
+            func.count(func.distinct(FundExposure.fund_key))
+        ).filter(FundExposure.dimension == dimension)
+        if currency:
+            query = query.filter(FundExposure.currency == currency)
+        return query.group_by(FundExposure.bucket, FundExposure.currency).order_by(amount.desc()).all()
+    
+    @staticmethod
+    def get_fund_trends(db: Session, fund_key: Optional[str] = None) -> List[FundQuarterMetric]:
+        """Get the quarterly metrics of one or all funds, by fund and quarter."""
+        query = db.query(FundQuarterMetric)
+        if fund_key:
+            query = query.filter(FundQuarterMetric.fund_key == fund_key)
+        return query.order_by(FundQuarterMetric.fund_key, FundQuarterMetric.quarter).all()
+    
+    @staticmethod
+    def get_latest_reports(db: Session) -> List[FundLatestReport]:
+        """Get the latest report of every fund."""
+        return db.query(FundLatestReport).order_by(FundLatestReport.fund_key).all()
+    
+    @staticmethod
+    def get_top_holdings(
+        db: Session,
+        limit: int = 20,
+        fund_key: Optional[str] = None,
+        industry: Optional[str] = None
+    ) -> List[Tuple[PortfolioInvestment, FundLatestReport]]:
+        """Get the holdings of each fund's latest report with the largest reported value."""
+        query = db.query(PortfolioInvestment, FundLatestReport).join(
+            FundLatestReport, FundLatestReport.result_id == PortfolioInvestment.result_id
+        ).filter(PortfolioInvestment.reported_value.isnot(None))
+        if fund_key:
+            query = query.filter(FundLatestReport.fund_key == fund_key)
+        if industry:
+            query = query.filter(PortfolioInvestment.industry == industry)
+        return query.order_by(
+            PortfolioInvestment.reported_value.desc(), PortfolioInvestment.id
+        ).limit(limit).all()
+
+
+class SearchService:
+    """Service for the full-text search documents of uploaded files."""
+    
+    @staticmethod
+    def replace_for_file(
+        db: Session,
+        file_id: int,
+        documents: Iterator[Dict[str, Any]],
+        batch_size: int = 500
+    ) -> Dict[str, int]:
+        """
+        Replace the search documents of a file, in one transaction.
+        Documents are consumed and inserted in batches, so the pages of a long
+        document are never all held in memory.
+        
+        Returns:
+            Number of documents written per source
+        """
+        db.query(SearchDocument).filter(SearchDocument.file_id == file_id).delete(synchronize_session=False)
+        counts: Dict[str, int] = {}
+        batch = []
+        for document in documents:
+            batch.append(dict(document, file_id=file_id))
+            counts[document["source"]] = counts.get(document["source"], 0) + 1
+            if len(batch) >= batch_size:
+                db.execute(insert(SearchDocument), batch)
+                batch = []
+        if batch:
+            db.execute(insert(SearchDocument), batch)
+        db.commit()
+        return counts
+    
+    @staticmethod
+    def get_result_file_ids(db: Session, unindexed_only: bool = True, limit: Optional[int] = None) -> List[int]:
+        """Get the IDs of files with an extraction result (by default, only those with no search documents yet)."""
+        query = db.query(ExtractionResult.file_id)
+        if unindexed_only:
+            query = query.filter(ExtractionResult.file_id.notin_(db.query(SearchDocument.file_id).distinct()))
+        query = query.order_by(ExtractionResult.file_id)
+        if limit:
+            query = query.limit(limit)
+        return [row.file_id for row in query.all()]
+    
+    @staticmethod
+    def search(
+        db: Session,
+        query: str,
+        source: Optional[str] = None,
+        file_id: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Run a full-text query, best matches first.
+        
+        Args:
+            db: Database session
+            query: FTS5 MATCH expression on SQLite, websearch_to_tsquery() text on PostgreSQL
+            source: Only documents of this source
+            file_id: Only documents of this file
+            skip: Number of hits to skip
+            limit: Maximum number of hits
+        
+        Returns:
+            Hits with file, page, title, an HTML-escaped snippet with matches
+            in <mark> tags, and a relevance score (higher is better)
+        """
+        filters = ""
+        params: Dict[str, Any] = {
+            "query": query, "skip": skip, "limit": limit,
+            "match_start": SNIPPET_MATCH_START, "match_end": SNIPPET_MATCH_END
+        }
+        if source:
+            filters += " AND d.source = :source"
+            params["source"] = source
+        if file_id:
+            filters += " AND d.file_id = :file_id"
+            params["file_id"] = file_id
+        
+        if db.get_bind().dialect.name == "postgresql":
+            # Headlines are only computed for the page of hits returned
+            statement = f"""
+                SELECT d.id, d.file_id, d.source, d.page_number, d.title, ranked.score,
+                       ts_headline('{PG_TS_CONFIG}', d.content, websearch_to_tsquery('{PG_TS_CONFIG}', :query),
+                                   'StartSel=' || :match_start || ', StopSel=' || :match_end
+                                   || ', MaxWords=30, MinWords=10, MaxFragments=2')
+                       AS snippet
+                FROM (
+                    SELECT d.id, ts_rank_cd({PG_DOCUMENT_VECTOR}, websearch_to_tsquery('{PG_TS_CONFIG}', :query))
+                           AS score
+                    FROM search_documents d
+                    WHERE {PG_DOCUMENT_VECTOR} @@ websearch_to_tsquery('{PG_TS_CONFIG}', :query){filters}
+                    ORDER BY score DESC, d.id
+                    LIMIT :limit OFFSET :skip
+                ) ranked
+                JOIN search_documents d ON d.id = ranked.id
+                ORDER BY ranked.score DESC, d.id
+            """
+        else:
+            # bm25() is lower for better matches; titles weigh twice as much as content
+            statement = f"""
+                SELECT d.id, d.file_id, d.source, d.page_number, d.title,
+                       -bm25({FULLTEXT_PREFIX}, 2.0, 1.0) AS score,
+                       snippet({FULLTEXT_PREFIX}, -1, :match_start, :match_end, '…', 24) AS snippet
+                FROM {FULLTEXT_PREFIX}
+                JOIN search_documents d ON d.id = {FULLTEXT_PREFIX}.rowid
+                WHERE {FULLTEXT_PREFIX} MATCH :query{filters}
+                ORDER BY score DESC, d.id
+                LIMIT :limit OFFSET :skip
+            """
+        
+        hits = [dict(row._mapping) for row in db.execute(text(statement), params)]
+        if not hits:
+            return hits
+        
+        files = {
+            row.id: row
+            for row in db.query(
+                UploadedFile.id, UploadedFile.original_filename, ExtractionResult.id.label("result_id")
+            ).outerjoin(
+                ExtractionResult, ExtractionResult.file_id == UploadedFile.id
+            ).filter(UploadedFile.id.in_({hit["file_id"] for hit in hits})).all()
+        }
+        for hit in hits:
+            hit["snippet"] = _snippet_html(hit["snippet"])
+            file = files.get(hit["file_id"])
+            hit["filename"] = file.original_filename if file else None
+            hit["result_id"] = file.result_id if file else None
+        return hits
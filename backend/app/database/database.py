@@ -2,17 +2,25 @@
 Database connection and session management.
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 import logging
-from typing import Generator
+import os
+from typing import Generator, Optional
 
 from app.config import settings
+from .fulltext import drop_fulltext_index
 from .models import Base
 
 logger = logging.getLogger(__name__)
 
+# Latest Alembic revision in migrations/versions; bump with every new migration
+SCHEMA_REVISION = "0007"
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 # Create database engine
 # For Neon PostgreSQL, use the connection string from settings
 if settings.DATABASE_URL:
@@ -63,19 +71,87 @@ def get_db() -> Generator[Session, None, None]:
 
 def init_db() -> None:
     """
-    Initialize database - create all tables.
+    Initialize database - bring the schema to the current revision.
     
-    This should be called on application startup.
+    This should be called on application startup. An up-to-date database
+    costs a single query; Alembic is only loaded when migrations must run.
     """
     try:
-        logger.info("Initializing database...")
-        Base.metadata.create_all(bind=engine)
+        current = get_schema_revision()
+        if current == SCHEMA_REVISION:
+            logger.info(f"Database schema is up to date (revision {current})")
+            return
+        
+        logger.info(f"Migrating database schema from revision {current} to {SCHEMA_REVISION}...")
+        _migrate(current)
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
         raise
 
 
+def get_schema_revision() -> Optional[str]:
+    """
+    Get the Alembic revision of the database.
+    
+    Returns:
+        Revision ID, or None if the database has never been migrated
+    """
+    try:
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except DBAPIError:
+        return None
+
+
+def _alembic_config():
+    """Alembic configuration pointing at the migrations of this backend."""
+    from alembic.config import Config
+    
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    return config
+
+
+def _migrate(current: Optional[str]) -> None:
+    """Upgrade the schema to the latest migration."""
+    from alembic import command
+    
+    config = _alembic_config()
+    if current is None and inspect(engine).has_table("uploaded_files"):
+        # Created by create_all() before migrations existed: record it as the
+        # initial schema so the later migrations (and their indexes) run, then
+        # add what older databases still miss from the initial schema
+        command.stamp(config, "0001")
+        command.upgrade(config, "head")
+        Base.metadata.create_all(bind=engine)
+        _add_missing_columns()
+    else:
+        command.upgrade(config, "head")
+
+
+def _add_missing_columns() -> None:
+    """
+    Add nullable columns that exist in the models but not in the database.
+    create_all() only creates missing tables, so columns added to an existing
+    model would otherwise be absent from databases created earlier.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            logger.info(f"Adding column {table.name}.{column.name} ({column_type})")
+            with engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
 def drop_all_tables() -> None:
     """
     Drop all tables from database.
@@ -83,7 +159,11 @@ def drop_all_tables() -> None:
     WARNING: This will delete all data. Use only for development/testing.
     """
     logger.warning("Dropping all tables from database...")
+    with engine.begin() as connection:
+        drop_fulltext_index(connection)
     Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
     logger.info("All tables dropped")
 
 
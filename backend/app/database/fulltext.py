@@ -0,0 +1,83 @@
+"""
+Full-text index over search_documents.
+SQLite gets an FTS5 table that indexes search_documents as external content
+and is kept in sync by triggers; PostgreSQL gets a GIN index on the
+tsvector of title and content. Neither can be expressed on the model, so
+the index is created here, by migrations.
+
+Note that on SQLite, recreating search_documents (e.g. in a batch
+migration) drops the triggers: call create_fulltext_index() afterwards.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Every object of the index is named with this prefix (FTS5 adds shadow
+# tables such as search_documents_fts_data); migrations/env.py leaves them
+# out of autogenerate
+FULLTEXT_PREFIX = "search_documents_fts"
+
+# Text search configuration of the PostgreSQL index (stemming as in FTS5's porter tokenizer)
+PG_TS_CONFIG = "english"
+
+# Expression indexed on PostgreSQL; queries must use it verbatim to hit the index
+PG_DOCUMENT_VECTOR = f"to_tsvector('{PG_TS_CONFIG}', coalesce(title, '') || ' ' || content)"
+
+_SQLITE_CREATE = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FULLTEXT_PREFIX} USING fts5(
+        title, content,
+        content='search_documents', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FULLTEXT_PREFIX}_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO {FULLTEXT_PREFIX}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FULLTEXT_PREFIX}_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO {FULLTEXT_PREFIX}({FULLTEXT_PREFIX}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FULLTEXT_PREFIX}_au AFTER UPDATE ON search_documents BEGIN
+        INSERT INTO {FULLTEXT_PREFIX}({FULLTEXT_PREFIX}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {FULLTEXT_PREFIX}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    # Index rows written while the triggers did not exist
+    f"INSERT INTO {FULLTEXT_PREFIX}({FULLTEXT_PREFIX}) VALUES ('rebuild')",
+]
+
+_SQLITE_DROP = [
+    f"DROP TRIGGER IF EXISTS {FULLTEXT_PREFIX}_au",
+    f"DROP TRIGGER IF EXISTS {FULLTEXT_PREFIX}_ad",
+    f"DROP TRIGGER IF EXISTS {FULLTEXT_PREFIX}_ai",
+    f"DROP TABLE IF EXISTS {FULLTEXT_PREFIX}",
+]
+
+_PG_CREATE = [
+    f"CREATE INDEX IF NOT EXISTS {FULLTEXT_PREFIX}_gin ON search_documents USING GIN ({PG_DOCUMENT_VECTOR})",
+]
+
+_PG_DROP = [
+    f"DROP INDEX IF EXISTS {FULLTEXT_PREFIX}_gin",
+]
+
+
+def create_fulltext_index(connection: Connection) -> None:
+    """Create the full-text index of search_documents, if missing."""
+    statements = _PG_CREATE if connection.dialect.name == "postgresql" else _SQLITE_CREATE
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def drop_fulltext_index(connection: Connection) -> None:
+    """Drop the full-text index of search_documents, if present."""
+    statements = _PG_DROP if connection.dialect.name == "postgresql" else _SQLITE_DROP
+    for statement in statements:
+        connection.execute(text(statement))
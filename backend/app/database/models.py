@@ -2,7 +2,7 @@
 Database models for PDF extraction system.
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Enum, JSON
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Float, ForeignKey, Enum, JSON, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -41,11 +41,14 @@ class UploadedFile(Base):
     file_size = Column(Integer, nullable=False)  # Size in bytes
     mime_type = Column(String(100), default="application/pdf")
     upload_timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    evicted_at = Column(DateTime, nullable=True)  # Set when the retention manager removes the PDF
+    page_hashes = Column(JSON, nullable=True)  # Fingerprint of each page's content, for incremental re-extraction
     
     # Relationships
     extraction_result = relationship("ExtractionResult", back_populates="uploaded_file", uselist=False, cascade="all, delete-orphan")
     job_status = relationship("JobStatus", back_populates="uploaded_file", uselist=False, cascade="all, delete-orphan")
     logs = relationship("ExtractionLog", back_populates="uploaded_file", cascade="all, delete-orphan")
+    search_documents = relationship("SearchDocument", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<UploadedFile(id={self.id}, filename='{self.filename}')>"
@@ -66,6 +69,7 @@ class ExtractionResult(Base):
     
     # Metadata
     extraction_timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+    excel_evicted_at = Column(DateTime, nullable=True)  # Set when the Excel file is evicted; cleared on regeneration
     processing_time = Column(Float, nullable=True)  # Time in seconds
     
     # Statistics
@@ -73,8 +77,16 @@ class ExtractionResult(Base):
     total_sheets_generated = Column(Integer, nullable=True)
     gemini_model_used = Column(String(100), nullable=True)
     
+    # Incremental re-extraction
+    base_file_id = Column(Integer, nullable=True)  # Prior upload whose data unchanged pages were taken from
+    inherited_sections = Column(JSON, nullable=True)  # Sections copied unchanged from the prior result
+    
     # Relationships
     uploaded_file = relationship("UploadedFile", back_populates="extraction_result")
+    fund_summary = relationship("FundSummary", uselist=False, cascade="all, delete-orphan")
+    investments = relationship("PortfolioInvestment", cascade="all, delete-orphan")
+    company_profiles = relationship("PortfolioCompanyProfile", cascade="all, delete-orphan")
+    company_financials = relationship("PortfolioCompanyFinancial", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<ExtractionResult(id={self.id}, file_id={self.file_id}, excel_filename='{self.excel_filename}')>"
@@ -97,12 +109,25 @@ class JobStatus(Base):
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     started_at = Column(DateTime, nullable=True)
-    completed_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True, index=True)
     
     # Error handling
     error_message = Column(Text, nullable=True)
     retry_count = Column(Integer, default=0, nullable=False)
     
+    # Job parameters, read by whichever worker claims the job
+    template_id = Column(String(100), nullable=True)
+    prior_file_id = Column(Integer, nullable=True)  # Previous report for incremental extraction
+    
+    # Lease held by the worker processing the job; requeued when it expires
+    worker_id = Column(String(255), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True, index=True)
+    
+    # Idempotency-Key of the upload request, so client retries get this job back
+    idempotency_key = Column(String(255), nullable=True, unique=True, index=True)
+    request_fingerprint = Column(String(64), nullable=True)  # SHA-256 of the upload and its parameters
+    
     # Relationships
     uploaded_file = relationship("UploadedFile", back_populates="job_status")
     
@@ -135,3 +160,218 @@ class ExtractionLog(Base):
     
     def __repr__(self):
         return f"<ExtractionLog(id={self.id}, file_id={self.file_id}, level='{self.log_level}', message='{self.message[:50]}...')>"
+
+
+class FundSummary(Base):
+    """Fund-level metrics of one extraction result (portfolio_summary section)."""
+    
+    __tablename__ = "fund_summaries"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    result_id = Column(Integer, ForeignKey("extraction_results.id", ondelete="CASCADE"), nullable=False, unique=True, index=True)
+    
+    general_partner = Column(String(255), nullable=True)
+    fund_name = Column(String(255), nullable=True, index=True)
+    fund_key = Column(String(255), nullable=True, index=True)  # Fund name matched across reports
+    fund_currency = Column(String(20), nullable=True)
+    reporting_period = Column(String(100), nullable=True)
+    report_date = Column(Date, nullable=True, index=True)
+    
+    # Amounts in the fund currency
+    total_commitments = Column(Float, nullable=True)
+    total_drawdowns = Column(Float, nullable=True)
+    remaining_commitments = Column(Float, nullable=True)
+    total_distributions = Column(Float, nullable=True)
+    net_contributions = Column(Float, nullable=True)
+    assets_under_management = Column(Float, nullable=True)
+    nav = Column(Float, nullable=True)
+    fair_value = Column(Float, nullable=True)
+    
+    # Counts and performance
+    total_investments = Column(Float, nullable=True)
+    realized_investments = Column(Float, nullable=True)
+    unrealized_investments = Column(Float, nullable=True)
+    dpi = Column(Float, nullable=True)
+    rvpi = Column(Float, nullable=True)
+    tvpi = Column(Float, nullable=True)
+    irr = Column(Float, nullable=True)
+    moic = Column(Float, nullable=True)
+    
+    # Portfolio breakdowns, in percent
+    region_breakdown = Column(JSON, nullable=True)  # e.g. {"north_america": 60.0, "europe": 40.0}
+    industry_breakdown = Column(JSON, nullable=True)  # e.g. {"it": 30.0, "healthcare": 20.0}
+    
+    def __repr__(self):
+        return f"<FundSummary(id={self.id}, result_id={self.result_id}, fund_name='{self.fund_name}')>"
+
+
+class PortfolioInvestment(Base):
+    """One holding of the schedule of investments of an extraction result."""
+    
+    __tablename__ = "portfolio_investments"
+    __table_args__ = (
+        Index("ix_portfolio_investments_company_key_reported_date", "company_key", "reported_date"),
+        Index("ix_portfolio_investments_fund_reported_date", "fund", "reported_date"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    result_id = Column(Integer, ForeignKey("extraction_results.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    company = Column(String(255), nullable=False)
+    company_key = Column(String(255), nullable=False)  # Case- and punctuation-insensitive company name
+    fund = Column(String(255), nullable=True)  # Falls back to the fund name of the summary
+    industry = Column(String(255), nullable=True, index=True)  # From the company profile of the same report
+    reported_date = Column(Date, nullable=True, index=True)
+    investment_status = Column(String(100), nullable=True)
+    security_type = Column(String(255), nullable=True)
+    initial_investment_date = Column(Date, nullable=True)
+    
+    total_invested = Column(Float, nullable=True)
+    current_cost = Column(Float, nullable=True)
+    reported_value = Column(Float, nullable=True)
+    realized_proceeds = Column(Float, nullable=True)
+    fund_ownership_percent = Column(Float, nullable=True)
+    investment_multiple = Column(Float, nullable=True)
+    irr = Column(Float, nullable=True)
+    
+    def __repr__(self):
+        return f"<PortfolioInvestment(id={self.id}, result_id={self.result_id}, company='{self.company}')>"
+
+
+class PortfolioCompanyProfile(Base):
+    """Profile of a portfolio company as described in an extraction result."""
+    
+    __tablename__ = "portfolio_company_profiles"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    result_id = Column(Integer, ForeignKey("extraction_results.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    company_name = Column(String(255), nullable=False)
+    company_key = Column(String(255), nullable=False, index=True)
+    fund = Column(String(255), nullable=True, index=True)  # Fund name of the summary
+    industry = Column(String(255), nullable=True, index=True)
+    headquarters = Column(String(255), nullable=True)
+    securities_held = Column(String(255), nullable=True)
+    initial_investment_date = Column(Date, nullable=True)
+    
+    fund_ownership_percent = Column(Float, nullable=True)
+    investment_commitment = Column(Float, nullable=True)
+    invested_capital = Column(Float, nullable=True)
+    reported_value = Column(Float, nullable=True)
+    realized_proceeds = Column(Float, nullable=True)
+    investment_multiple = Column(Float, nullable=True)
+    gross_irr = Column(Float, nullable=True)
+    
+    def __repr__(self):
+        return f"<PortfolioCompanyProfile(id={self.id}, result_id={self.result_id}, company_name='{self.company_name}')>"
+
+
+class PortfolioCompanyFinancial(Base):
+    """Operating metrics of a portfolio company as reported in an extraction result."""
+    
+    __tablename__ = "portfolio_company_financials"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    result_id = Column(Integer, ForeignKey("extraction_results.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    company = Column(String(255), nullable=False)
+    company_key = Column(String(255), nullable=False, index=True)
+    fund = Column(String(255), nullable=True, index=True)  # Fund name of the summary
+    company_currency = Column(String(20), nullable=True)
+    operating_data_date = Column(Date, nullable=True, index=True)
+    
+    ltm_revenue = Column(Float, nullable=True)
+    ltm_ebitda = Column(Float, nullable=True)
+    cash = Column(Float, nullable=True)
+    gross_debt = Column(Float, nullable=True)
+    yoy_revenue_growth = Column(Float, nullable=True)
+    ebitda_margin = Column(Float, nullable=True)
+    total_enterprise_value = Column(Float, nullable=True)
+    tev_multiple = Column(Float, nullable=True)
+    
+    def __repr__(self):
+        return f"<PortfolioCompanyFinancial(id={self.id}, result_id={self.result_id}, company='{self.company}')>"
+
+
+class FundLatestReport(Base):
+    """Rollup: the most recent report of each fund."""
+    
+    __tablename__ = "analytics_fund_latest"
+    
+    fund_key = Column(String(255), primary_key=True)
+    fund_name = Column(String(255), nullable=True)
+    result_id = Column(Integer, nullable=False, index=True)
+    report_date = Column(Date, nullable=True)
+    fund_currency = Column(String(20), nullable=True)
+    nav = Column(Float, nullable=True)
+    tvpi = Column(Float, nullable=True)
+    dpi = Column(Float, nullable=True)
+    irr = Column(Float, nullable=True)
+    refreshed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<FundLatestReport(fund_key='{self.fund_key}', result_id={self.result_id})>"
+
+
+class FundQuarterMetric(Base):
+    """Rollup: fund metrics of the last report of each calendar quarter."""
+    
+    __tablename__ = "analytics_fund_quarters"
+    __table_args__ = (
+        UniqueConstraint("fund_key", "quarter", name="uq_analytics_fund_quarters_fund_key_quarter"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    fund_key = Column(String(255), nullable=False, index=True)
+    fund_name = Column(String(255), nullable=True)
+    quarter = Column(String(7), nullable=False, index=True)  # e.g. "2024-Q1"
+    report_date = Column(Date, nullable=False)
+    result_id = Column(Integer, nullable=False)
+    nav = Column(Float, nullable=True)
+    tvpi = Column(Float, nullable=True)
+    dpi = Column(Float, nullable=True)
+    rvpi = Column(Float, nullable=True)
+    irr = Column(Float, nullable=True)
+    total_commitments = Column(Float, nullable=True)
+    
+    def __repr__(self):
+        return f"<FundQuarterMetric(fund_key='{self.fund_key}', quarter='{self.quarter}')>"
+
+
+class FundExposure(Base):
+    """Rollup: exposure of each fund's latest report by industry and by region."""
+    
+    __tablename__ = "analytics_exposures"
+    __table_args__ = (
+        Index("ix_analytics_exposures_dimension_bucket", "dimension", "bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    fund_key = Column(String(255), nullable=False, index=True)
+    dimension = Column(String(20), nullable=False)  # "industry" or "region"
+    bucket = Column(String(255), nullable=False)
+    currency = Column(String(20), nullable=True)
+    amount = Column(Float, nullable=False)  # Reported value in the fund currency
+    
+    def __repr__(self):
+        return f"<FundExposure(fund_key='{self.fund_key}', {self.dimension}='{self.bucket}', amount={self.amount})>"
+
+
+class SearchDocument(Base):
+    """
+    Searchable text of an uploaded file: one row per PDF page, footnote or
+    company description. The full-text index over title and content is
+    created by app.database.fulltext, not from this model.
+    """
+    
+    __tablename__ = "search_documents"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    file_id = Column(Integer, ForeignKey("uploaded_files.id", ondelete="CASCADE"), nullable=False, index=True)
+    source = Column(String(30), nullable=False)  # "page", "footnote" or "company_description"
+    page_number = Column(Integer, nullable=True)  # 1-based, for pages
+    title = Column(String(255), nullable=True)  # Footnote header or company name
+    content = Column(Text, nullable=False)
+    
+    def __repr__(self):
+        return f"<SearchDocument(id={self.id}, file_id={self.file_id}, source='{self.source}')>"
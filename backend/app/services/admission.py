@@ -0,0 +1,249 @@
+"""
+Admission control and backpressure for extraction jobs.
+Uploads are rejected with 429 once the number of pending and processing
+jobs reaches MAX_QUEUED_JOBS, with a Retry-After estimated from the recent
+completion rate. Admitted jobs then take a slot of each pipeline stage
+(PDF parsing, Gemini calls, Excel generation) in turn, so a burst of jobs
+does not run the CPU-bound stages all at once.
+
+The cap is exact for the uploads of one API process, whose admissions are
+serialized until their job is created. Uploads being admitted by other API
+processes are only counted once their job exists, so with several API
+processes a burst can exceed the cap by up to one upload per process.
+"""
+
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.crud import JobStatusService
+from app.database.models import JobStatusEnum
+from app.services.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("parsing", "llm", "excel")
+
+# Longest single wait for a stage slot, so cancelled jobs stop waiting promptly
+SLOT_WAIT_SLICE = 1.0
+
+# Bounds of the Retry-After of rejected uploads, in seconds
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 3600
+
+# Without the job queue each job runs in a thread of the API's threadpool
+# (anyio's default of 40) and keeps it while waiting for stage slots, so the
+# queue is capped to leave threads for the other requests
+INLINE_THREADPOOL_SIZE = 40
+INLINE_RESERVED_THREADS = 8
+
+
+class QueueFullError(Exception):
+    """Raised when an upload is rejected because the job queue is full."""
+    
+    def __init__(self, queue_depth: int, retry_after: int):
+        super().__init__(f"Extraction queue is full ({queue_depth} jobs); retry in {retry_after}s")
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+
+
+class StageLimiter:
+    """Cap on the number of jobs running one pipeline stage at a time."""
+    
+    def __init__(self, name: str, limit: int):
+        """
+        Args:
+            name: Stage name
+            limit: Concurrent jobs allowed in the stage (0 = unlimited)
+        """
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self.total_entered = 0
+        self.total_wait_seconds = 0.0
+        self._condition = threading.Condition()
+    
+    @contextmanager
+    def slot(self, cancel_token: Optional[CancellationToken] = None):
+        """
+        Hold a slot of the stage for the duration of the block.
+        
+        Args:
+            cancel_token: Stop waiting if the job is cancelled
+        
+        Raises:
+            JobCancelledError: If the job is cancelled while waiting
+        """
+        start = time.time()
+        with self._condition:
+            self.waiting += 1
+            try:
+                while self.limit > 0 and self.active >= self.limit:
+                    if cancel_token:
+                        cancel_token.check()
+                    self._condition.wait(SLOT_WAIT_SLICE)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.total_entered += 1
+            self.total_wait_seconds += time.time() - start
+        
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                self._condition.notify()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "total_entered": self.total_entered,
+            "total_wait_seconds": round(self.total_wait_seconds, 2)
+        }
+
+
+class AdmissionController:
+    """Bounded job queue and per-stage concurrency caps of this process."""
+    
+    def __init__(
+        self,
+        max_queued_jobs: Optional[int] = None,
+        stage_limits: Optional[Dict[str, int]] = None,
+        throughput_window_seconds: Optional[float] = None
+    ):
+        """
+        Initialize the controller.
+        
+        Args:
+            max_queued_jobs: Pending and processing jobs at which uploads are
+                rejected (0 = unbounded; uses settings if not provided). Without
+                the job queue it is capped to the threads jobs may hold
+            stage_limits: Concurrent jobs per stage (uses settings if not provided)
+            throughput_window_seconds: Period over which the completion rate is measured
+        """
+        self.max_queued_jobs = settings.MAX_QUEUED_JOBS if max_queued_jobs is None else max_queued_jobs
+        if not settings.JOB_QUEUE_ENABLED:
+            inline_limit = INLINE_THREADPOOL_SIZE - INLINE_RESERVED_THREADS
+            if self.max_queued_jobs <= 0 or self.max_queued_jobs > inline_limit:
+                logger.info(f"Jobs run inline: capping the job queue to {inline_limit} jobs")
+                self.max_queued_jobs = inline_limit
+        limits = stage_limits or {
+            "parsing": settings.STAGE_PARSING_CONCURRENCY,
+            "llm": settings.STAGE_LLM_CONCURRENCY,
+            "excel": settings.STAGE_EXCEL_CONCURRENCY,
+        }
+        self.stages = {name: StageLimiter(name, limits.get(name, 0)) for name in STAGES}
+        self.throughput_window_seconds = (
+            settings.ADMISSION_THROUGHPUT_WINDOW_SECONDS
+            if throughput_window_seconds is None else throughput_window_seconds
+        )
+        self.admitted = 0
+        self.rejected = 0
+        self.last_retry_after: Optional[int] = None
+        self._reserved = 0
+        self._lock = threading.Lock()
+    
+    def stage(self, name: str, cancel_token: Optional[CancellationToken] = None):
+        """Context manager holding a slot of a pipeline stage (see StageLimiter.slot)."""
+        return self.stages[name].slot(cancel_token)
+    
+    @staticmethod
+    def queue_depth(db: Session) -> int:
+        """Number of jobs pending or processing, in every process."""
+        counts = JobStatusService.count_by_status(db)
+        return counts.get(JobStatusEnum.PENDING.value, 0) + counts.get(JobStatusEnum.PROCESSING.value, 0)
+    
+    def throughput(self, db: Session, now: Optional[datetime] = None) -> float:
+        """Jobs finished per second over the throughput window."""
+        since = (now or datetime.utcnow()) - timedelta(seconds=self.throughput_window_seconds)
+        return JobStatusService.count_finished_since(db, since) / self.throughput_window_seconds
+    
+    def retry_after(self, db: Session, queue_depth: int) -> int:
+        """
+        Seconds until the queue is expected to have room again.
+        The jobs in excess of the cap must finish first; at the recent
+        completion rate that takes excess / throughput seconds. Without any
+        recent completion, the queue is assumed to drain at the rate of the
+        stage with the fewest slots, one job per average processing time.
+        """
+        excess = queue_depth - self.max_queued_jobs + 1
+        throughput = self.throughput(db)
+        if throughput <= 0:
+            average = JobStatusService.average_duration_seconds(db) or settings.ADMISSION_DEFAULT_JOB_SECONDS
+            slots = min((stage.limit for stage in self.stages.values() if stage.limit > 0), default=1)
+            throughput = slots / average
+        return int(min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(excess / throughput))))
+    
+    @contextmanager
+    def admit(self, db: Session):
+        """
+        Admit a new upload for the duration of the block, or reject it if the
+        queue is full. The block must create the upload's job: until it
+        exits, the upload counts towards the queue depth of this process.
+        
+        Raises:
+            QueueFullError: With the queue depth and the Retry-After to send
+        """
+        with self._lock:
+            depth = self.queue_depth(db) + self._reserved if self.max_queued_jobs > 0 else 0
+            admitted = self.max_queued_jobs <= 0 or depth < self.max_queued_jobs
+            if admitted:
+                self._reserved += 1
+                self.admitted += 1
+        
+        if not admitted:
+            retry_after = self.retry_after(db, depth)
+            with self._lock:
+                self.rejected += 1
+                self.last_retry_after = retry_after
+            logger.warning(f"Rejected upload: {depth} jobs queued (max {self.max_queued_jobs}), retry in {retry_after}s")
+            raise QueueFullError(depth, retry_after)
+        
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reserved -= 1
+    
+    def stats(self, db: Session) -> Dict[str, Any]:
+        """Queue depth and bound, admission counters, throughput and stage usage."""
+        return {
+            "max_queued_jobs": self.max_queued_jobs,
+            "queue_depth": self.queue_depth(db),
+            "admitting": self._reserved,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "last_retry_after": self.last_retry_after,
+            "jobs_finished_per_minute": round(self.throughput(db) * 60, 2),
+            "stages": {name: stage.stats() for name, stage in self.stages.items()}
+        }
+
+
+_admission_controller: Optional[AdmissionController] = None
+_admission_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Get the admission controller of this process.
+    
+    Returns:
+        Shared AdmissionController instance
+    """
+    global _admission_controller
+    if _admission_controller is None:
+        with _admission_controller_lock:
+            if _admission_controller is None:
+                _admission_controller = AdmissionController()
+    return _admission_controller
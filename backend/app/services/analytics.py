@@ -0,0 +1,164 @@
+"""
+Cross-fund analytics rollups.
+Three small tables are maintained from the portfolio tables: the latest
+report of each fund, fund metrics per calendar quarter, and the industry
+and region exposure of each fund's latest report. They are refreshed one
+fund at a time whenever one of its results is indexed or deleted, so the
+analytics endpoints only aggregate a few rows per fund instead of every
+stored report.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Any, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.database.crud import AnalyticsService
+from app.database.models import FundSummary
+
+logger = logging.getLogger(__name__)
+
+EXPOSURE_DIMENSIONS = ("industry", "region")
+
+# Bucket of holdings whose company profile gives no industry
+UNCLASSIFIED = "Unclassified"
+
+
+def quarter_of(day: date) -> str:
+    """Calendar quarter of a date, e.g. "2024-Q1"."""
+    return f"{day.year}-Q{(day.month - 1) // 3 + 1}"
+
+
+def _report_order(summary: FundSummary):
+    """Sort key of a fund's reports: by report date (undated first), then by upload order."""
+    return (summary.report_date or date.min, summary.result_id)
+
+
+def _breakdown_exposures(summary: FundSummary, dimension: str, breakdown: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Exposure amounts from a percentage breakdown of the fund's NAV."""
+    if not breakdown or summary.nav is None:
+        return []
+    return [
+        {"dimension": dimension, "bucket": bucket, "currency": summary.fund_currency, "amount": summary.nav * percent / 100}
+        for bucket, percent in breakdown.items()
+        if percent
+    ]
+
+
+def _fund_rollups(db: Session, summaries: List[FundSummary]) -> Dict[str, Any]:
+    """Compute the rollup rows of one fund from all of its reports."""
+    latest = max(summaries, key=_report_order)
+    
+    quarters: Dict[str, FundSummary] = {}
+    for summary in summaries:
+        if summary.report_date:
+            quarter = quarter_of(summary.report_date)
+            if quarter not in quarters or _report_order(summary) > _report_order(quarters[quarter]):
+                quarters[quarter] = summary
+    
+    # Industry exposure is the reported value of the holdings; funds that
+    # list no holding values fall back to the summary's breakdown of NAV
+    industry = [
+        {"dimension": "industry", "bucket": bucket or UNCLASSIFIED, "currency": latest.fund_currency, "amount": amount}
+        for bucket, amount in AnalyticsService.holdings_value_by_industry(db, latest.result_id)
+        if amount
+    ]
+    if not industry:
+        industry = _breakdown_exposures(latest, "industry", latest.industry_breakdown)
+    region = _breakdown_exposures(latest, "region", latest.region_breakdown)
+    
+    return {
+        "latest": {
+            "fund_name": latest.fund_name,
+            "result_id": latest.result_id,
+            "report_date": latest.report_date,
+            "fund_currency": latest.fund_currency,
+            "nav": latest.nav,
+            "tvpi": latest.tvpi,
+            "dpi": latest.dpi,
+            "irr": latest.irr
+        },
+        "quarters": [
+            {
+                "fund_name": summary.fund_name,
+                "quarter": quarter,
+                "report_date": summary.report_date,
+                "result_id": summary.result_id,
+                "nav": summary.nav,
+                "tvpi": summary.tvpi,
+                "dpi": summary.dpi,
+                "rvpi": summary.rvpi,
+                "irr": summary.irr,
+                "total_commitments": summary.total_commitments
+            }
+            for quarter, summary in quarters.items()
+        ],
+        "exposures": industry + region
+    }
+
+
+def refresh_funds(db: Session, fund_keys: Iterable[Optional[str]]):
+    """
+    Recompute the rollups of the given funds from their stored reports.
+    Funds without any report left have their rollups removed.
+    
+    Args:
+        db: Database session
+        fund_keys: Keys of the funds whose reports changed (None is ignored)
+    """
+    for fund_key in {key for key in fund_keys if key}:
+        summaries = AnalyticsService.get_fund_summaries(db, fund_key)
+        rollups = _fund_rollups(db, summaries) if summaries else {"latest": None, "quarters": [], "exposures": []}
+        AnalyticsService.replace_fund_rollups(
+            db, fund_key, rollups["latest"], rollups["quarters"], rollups["exposures"]
+        )
+
+
+def rebuild_rollups(db: Session) -> int:
+    """
+    Recompute the rollups of every fund, e.g. after a backfill.
+    Fund keys missing from summaries indexed before they existed are filled in.
+    
+    Returns:
+        Number of funds with rollups
+    """
+    from app.services.portfolio_tables import company_key
+    
+    AnalyticsService.fill_fund_keys(db, company_key)
+    fund_keys = AnalyticsService.get_fund_keys(db)
+    AnalyticsService.clear_rollups(db)
+    refresh_funds(db, fund_keys)
+    logger.info(f"Rebuilt analytics rollups of {len(fund_keys)} funds")
+    return len(fund_keys)
+
+
+def exposure(db: Session, dimension: str, currency: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Exposure across all funds, from each fund's latest report.
+    Amounts are only summed within a currency.
+    
+    Args:
+        db: Database session
+        dimension: "industry" or "region"
+        currency: Only funds reporting in this currency
+    
+    Returns:
+        Buckets with amount, share of the currency total and number of funds,
+        largest first
+    """
+    rows = AnalyticsService.exposure_totals(db, dimension, currency)
+    totals: Dict[Optional[str], float] = defaultdict(float)
+    for _, row_currency, amount, _ in rows:
+        totals[row_currency] += amount
+    return [
+        {
+            "bucket": bucket,
+            "currency": row_currency,
+            "amount": amount,
+            "percent": round(amount / totals[row_currency] * 100, 2) if totals[row_currency] else None,
+            "funds": funds
+        }
+        for bucket, row_currency, amount, funds in rows
+    ]
@@ -0,0 +1,45 @@
+"""
+Cooperative cancellation of extraction jobs.
+Long-running steps call check() on the job's CancellationToken at safe points
+(between PDF pages, before each Gemini call, between Excel sheets) and stop
+with JobCancelledError once the job has been cancelled.
+"""
+
+import threading
+from typing import Optional
+
+
+class JobCancelledError(Exception):
+    """Raised at a checkpoint of a job that was cancelled."""
+    pass
+
+
+class CancellationToken:
+    """Thread-safe flag shared by the steps of one job."""
+    
+    def __init__(self):
+        self._event = threading.Event()
+        self._error: Optional[JobCancelledError] = None
+    
+    def cancel(self, error: Optional[JobCancelledError] = None):
+        """
+        Cancel the job; its next checkpoint raises the error.
+        
+        Args:
+            error: Exception raised by check() (JobCancelledError if not provided)
+        """
+        if not self._event.is_set():
+            self._error = error or JobCancelledError("Job was cancelled")
+            self._event.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+    
+    def check(self):
+        """
+        Raises:
+            JobCancelledError: If the job has been cancelled
+        """
+        if self._event.is_set():
+            raise self._error
@@ -0,0 +1,73 @@
+"""
+Incremental planning of the text chunks sent to Gemini.
+Pages are added one at a time and grouped into chunks of at most max_chars,
+cut at page boundaries, so a long document is never held in memory whole.
+"""
+
+from typing import Iterable, Iterator, List, Optional
+
+
+class ChunkPlanner:
+    """Group rendered pages into chunks as they arrive."""
+    
+    def __init__(self, max_chars: int):
+        """
+        Initialize the planner.
+        
+        Args:
+            max_chars: Maximum size of a chunk; a single page larger than this
+                becomes a chunk of its own (split further by the extractor)
+        """
+        self.max_chars = max(1, max_chars)
+        self.chunks_planned = 0
+        self._parts: List[str] = []
+        self._size = 0
+    
+    def add(self, page_text: str) -> Optional[str]:
+        """
+        Add the rendered text of the next page.
+        
+        Returns:
+            The completed chunk if the page did not fit in the current one
+        """
+        if not page_text:
+            return None
+        chunk = None
+        if self._parts and self._size + len(page_text) > self.max_chars:
+            chunk = self.flush()
+        self._parts.append(page_text)
+        self._size += len(page_text)
+        return chunk
+    
+    def flush(self) -> Optional[str]:
+        """
+        Complete the current chunk.
+        
+        Returns:
+            The chunk, or None if no page was added since the last one
+        """
+        if not self._parts:
+            return None
+        chunk = "".join(self._parts)
+        self._parts = []
+        self._size = 0
+        self.chunks_planned += 1
+        return chunk
+    
+    @classmethod
+    def plan(cls, pages: Iterable[str], max_chars: int) -> Iterator[str]:
+        """
+        Yield the chunks of a stream of rendered pages.
+        
+        Args:
+            pages: Rendered text of each page, in page order
+            max_chars: Maximum size of a chunk
+        """
+        planner = cls(max_chars)
+        for page_text in pages:
+            chunk = planner.add(page_text)
+            if chunk:
+                yield chunk
+        chunk = planner.flush()
+        if chunk:
+            yield chunk
@@ -0,0 +1,277 @@
+"""
+Streaming export of extracted data for downstream ETL.
+Turns one section of each result's extracted_data into flat records and
+encodes them as CSV, JSON Lines or Parquet chunk by chunk, so the full
+export is never held in memory.
+"""
+
+import csv
+import io
+import json
+import logging
+from typing import Dict, Any, Iterable, Iterator, List, Tuple
+
+from app.config import settings
+from app.services.sheet_specs import (
+    TABLE_SHEETS,
+    LINE_ITEM_SHEETS,
+    PORTFOLIO_SUMMARY_FIELDS
+)
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Encoded output is yielded once this many bytes have been buffered
+CHUNK_BYTES = 64 * 1024
+
+_TABLE_SPECS = {spec.section: spec for spec in TABLE_SHEETS}
+_LINE_ITEM_SPECS = {spec.section: spec for spec in LINE_ITEM_SHEETS}
+
+EXPORT_SECTIONS = (
+    ["portfolio_summary"]
+    + [spec.section for spec in TABLE_SHEETS]
+    + [spec.section for spec in LINE_ITEM_SHEETS]
+    + ["reference_values"]
+)
+
+
+class ParquetUnavailableError(Exception):
+    """Raised when Parquet export is requested but pyarrow is not installed."""
+    pass
+
+
+def section_columns(section: str) -> List[str]:
+    """
+    Column names of a section's export records.
+    
+    Args:
+        section: Section key of extracted_data
+    
+    Returns:
+        Ordered column names, starting with result_id
+    
+    Raises:
+        KeyError: If the section is unknown
+    """
+    if section == "portfolio_summary":
+        return ["result_id"] + [key for _, key in PORTFOLIO_SUMMARY_FIELDS if key]
+    if section in _TABLE_SPECS:
+        return ["result_id"] + [column.key for column in _TABLE_SPECS[section].columns]
+    if section in _LINE_ITEM_SPECS:
+        return ["result_id", "period", "line_item_number", "line_item", "value"]
+    if section == "reference_values":
+        return ["result_id", "reference_type", "value"]
+    raise KeyError(section)
+
+
+def iter_section_records(result_id: int, data: Dict[str, Any], section: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield flat records for one section of a result's extracted data.
+    List sections give one record per item; statements are unpivoted to one
+    record per (period, line item); the summary is a single record.
+    
+    Args:
+        result_id: Result ID added to every record
+        data: Structured extraction data
+        section: Section key
+    """
+    value = data.get(section) if isinstance(data, dict) else None
+    
+    if section == "portfolio_summary":
+        if isinstance(value, dict):
+            record = {"result_id": result_id}
+            for _, key in PORTFOLIO_SUMMARY_FIELDS:
+                if key:
+                    record[key] = value.get(key)
+            yield record
+    
+    elif section in _TABLE_SPECS:
+        keys = [column.key for column in _TABLE_SPECS[section].columns]
+        for item in value if isinstance(value, list) else []:
+            if isinstance(item, dict):
+                record = {"result_id": result_id}
+                for key in keys:
+                    record[key] = item.get(key)
+                yield record
+    
+    elif section in _LINE_ITEM_SPECS:
+        spec = _LINE_ITEM_SPECS[section]
+        if isinstance(value, dict):
+            for label, suffix in spec.periods:
+                for idx, line_item in enumerate(spec.line_items, start=1):
+                    amount = value.get(f"row_{idx}_{suffix}")
+                    if amount in (None, ""):
+                        continue
+                    yield {
+                        "result_id": result_id,
+                        "period": label,
+                        "line_item_number": idx,
+                        "line_item": line_item,
+                        "value": amount
+                    }
+    
+    elif section == "reference_values":
+        if isinstance(value, dict):
+            for reference_type, values in value.items():
+                for item in values if isinstance(values, list) else []:
+                    yield {"result_id": result_id, "reference_type": reference_type, "value": item}
+    
+    else:
+        raise KeyError(section)
+
+
+def iter_records(results: Iterable[Tuple[int, Dict[str, Any]]], section: str) -> Iterator[Dict[str, Any]]:
+    """Concatenate the section records of many (result_id, data) pairs."""
+    for result_id, data in results:
+        yield from iter_section_records(result_id, data, section)
+
+
+def stream_csv(records: Iterable[Dict[str, Any]], columns: List[str]) -> Iterator[bytes]:
+    """Encode records as CSV (with a header row), in chunks of roughly CHUNK_BYTES."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    
+    for record in records:
+        writer.writerow(record)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def stream_jsonl(records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Encode records as JSON Lines, in chunks of roughly CHUNK_BYTES."""
+    lines = []
+    size = 0
+    
+    for record in records:
+        line = json.dumps(record, default=str, ensure_ascii=False) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(lines).encode("utf-8")
+            lines = []
+            size = 0
+    
+    if lines:
+        yield "".join(lines).encode("utf-8")
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose buffered bytes can be taken out between writes."""
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def check_parquet_available():
+    """
+    Ensure pyarrow can be imported.
+    
+    Raises:
+        ParquetUnavailableError: If pyarrow is not installed
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ParquetUnavailableError("Parquet export requires the pyarrow package")
+
+
+def stream_parquet(records: Iterable[Dict[str, Any]], columns: List[str]) -> Iterator[bytes]:
+    """
+    Encode records as Parquet, one row group per EXPORT_PARQUET_ROW_GROUP records.
+    result_id is stored as int64 and every other column as nullable strings,
+    since extracted values mix numbers and text.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = pa.schema(
+        [pa.field("result_id", pa.int64())]
+        + [pa.field(column, pa.string()) for column in columns if column != "result_id"]
+    )
+    row_group_size = settings.EXPORT_PARQUET_ROW_GROUP
+    sink = _DrainableSink()
+    
+    def to_table(batch: List[Dict[str, Any]]):
+        arrays = [pa.array([record["result_id"] for record in batch], type=pa.int64())]
+        for column in columns[1:]:
+            arrays.append(pa.array(
+                [_to_text(record.get(column)) for record in batch],
+                type=pa.string()
+            ))
+        return pa.Table.from_arrays(arrays, schema=schema)
+    
+    with pq.ParquetWriter(sink, schema) as writer:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= row_group_size:
+                writer.write_table(to_table(batch))
+                batch = []
+                yield sink.drain()
+        if batch:
+            writer.write_table(to_table(batch))
+    
+    # Closing the writer appends the footer
+    yield sink.drain()
+
+
+def _to_text(value: Any):
+    if value is None or value == "":
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def stream_export(
+    results: Iterable[Tuple[int, Dict[str, Any]]],
+    section: str,
+    export_format: str
+) -> Iterator[bytes]:
+    """
+    Stream one section of many results in the requested format.
+    
+    Args:
+        results: Iterable of (result_id, extracted_data), consumed lazily
+        section: Section key
+        export_format: "csv", "jsonl" or "parquet"
+    
+    Returns:
+        Iterator of encoded chunks
+    """
+    columns = section_columns(section)
+    records = iter_records(results, section)
+    
+    if export_format == "csv":
+        return stream_csv(records, columns)
+    if export_format == "jsonl":
+        return stream_jsonl(records)
+    if export_format == "parquet":
+        return stream_parquet(records, columns)
+    raise ValueError(f"Unsupported export format: {export_format}")
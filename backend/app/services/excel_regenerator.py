@@ -0,0 +1,121 @@
+"""
+Excel regeneration service.
+Rebuilds workbooks from the structured data stored with each extraction
+result, without re-running PDF parsing or Gemini.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional
+
+from app.config import settings
+from app.services.excel_generator import ExcelGenerator
+from app.services.output_files import record_output_file
+
+logger = logging.getLogger(__name__)
+
+
+def render_workbook(data: Dict[str, Any], output_path: str) -> Dict[str, Any]:
+    """
+    Render a workbook from structured data, replacing the target atomically.
+    Module-level so it can run in a worker process.
+    
+    Args:
+        data: Structured extraction data
+        output_path: Path of the workbook to (re)write
+    
+    Returns:
+        Dictionary with the output path, content hash and render time in milliseconds
+    """
+    start = time.time()
+    base, ext = os.path.splitext(output_path)
+    tmp_path = f"{base}.regen-{os.getpid()}{ext}"
+    
+    try:
+        ExcelGenerator().generate_excel(data, tmp_path)
+        os.replace(tmp_path, output_path)
+        metadata = record_output_file(output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    return {
+        "output_path": output_path,
+        "sha256": metadata["sha256"],
+        "duration_ms": int((time.time() - start) * 1000)
+    }
+
+
+def regenerate_many(
+    tasks: List[Dict[str, Any]],
+    max_workers: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Regenerate several workbooks in a pool of worker processes.
+    
+    Args:
+        tasks: List of {"result_id", "data", "output_path"} dictionaries
+        max_workers: Pool size (uses settings if not provided)
+    
+    Returns:
+        One outcome per task with result_id, success, duration_ms and error
+    """
+    max_workers = max_workers or settings.REGENERATE_WORKERS
+    outcomes = []
+    
+    if not tasks:
+        return outcomes
+    
+    # A pool is only worth starting for more than one workbook
+    if len(tasks) == 1 or max_workers <= 1:
+        for task in tasks:
+            outcomes.append(_run_inline(task))
+        return outcomes
+    
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+        futures = {
+            pool.submit(render_workbook, task["data"], task["output_path"]): task
+            for task in tasks
+        }
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                rendered = future.result()
+                outcomes.append({
+                    "result_id": task["result_id"],
+                    "success": True,
+                    "duration_ms": rendered["duration_ms"],
+                    "error": None
+                })
+            except Exception as e:
+                logger.error(f"Failed to regenerate workbook for result {task['result_id']}: {str(e)}")
+                outcomes.append({
+                    "result_id": task["result_id"],
+                    "success": False,
+                    "duration_ms": None,
+                    "error": str(e)
+                })
+    
+    return outcomes
+
+
+def _run_inline(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Regenerate a single workbook in the current process."""
+    try:
+        rendered = render_workbook(task["data"], task["output_path"])
+        return {
+            "result_id": task["result_id"],
+            "success": True,
+            "duration_ms": rendered["duration_ms"],
+            "error": None
+        }
+    except Exception as e:
+        logger.error(f"Failed to regenerate workbook for result {task['result_id']}: {str(e)}")
+        return {
+            "result_id": task["result_id"],
+            "success": False,
+            "duration_ms": None,
+            "error": str(e)
+        }
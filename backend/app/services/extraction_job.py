@@ -0,0 +1,440 @@
+"""
+Extraction pipeline of one queued job: PDF text, Gemini, Excel.
+Run by worker processes for the jobs they claim, or by the API itself when
+the job queue is disabled.
+"""
+
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.crud import (
+    UploadedFileService,
+    ExtractionResultService,
+    ExtractionLogService,
+    JobStatusService
+)
+from app.database.models import JobStatus, JobStatusEnum, LogLevelEnum
+from app.services.admission import get_admission_controller
+from app.services.cancellation import JobCancelledError
+from app.services.excel_generator import ExcelGenerator
+from app.services.gemini_extractor import GeminiExtractor
+from app.services.incremental_extraction import IncrementalExtractor
+from app.services.job_queue import JobLease, LeaseLostError
+from app.services.llm_client_pool import GeminiClientPool
+from app.services.output_files import record_output_file, get_output_metadata, remove_output_metadata
+from app.services.pdf_extractor import PDFExtractor
+from app.services.portfolio_tables import index_result
+from app.services.search_index import index_file
+
+logger = logging.getLogger(__name__)
+
+_TIMESTAMPED_STEM = re.compile(r"^(.*)_(\d{8}_\d{6})$")
+
+
+def upload_filenames(original_filename: str, timestamp: Optional[datetime] = None) -> Tuple[str, str]:
+    """
+    Storage names of an uploaded PDF and of the Excel file generated from it.
+    
+    Returns:
+        Tuple of (PDF filename, Excel filename)
+    """
+    stamp = (timestamp or datetime.now()).strftime("%Y%m%d_%H%M%S")
+    safe_filename = original_filename.replace(" ", "_").replace(".pdf", "")
+    return f"{safe_filename}_{stamp}.pdf", f"{safe_filename}_extracted_{stamp}.xlsx"
+
+
+def excel_filename_for(pdf_filename: str) -> str:
+    """Excel filename of a stored PDF (see upload_filenames)."""
+    stem = os.path.splitext(pdf_filename)[0]
+    match = _TIMESTAMPED_STEM.match(stem)
+    if match:
+        return f"{match.group(1)}_extracted_{match.group(2)}.xlsx"
+    return f"{stem}_extracted.xlsx"
+
+
+def prior_page_hashes(db: Session, prior_file) -> Optional[list]:
+    """
+    Page fingerprints of a prior upload.
+    Files uploaded before fingerprints were stored are fingerprinted from their
+    PDF (mostly served by the page cache) while it is still on disk.
+    """
+    if prior_file.page_hashes:
+        return prior_file.page_hashes
+    if not os.path.exists(prior_file.file_path):
+        return None
+    
+    try:
+        # Only the fingerprints are needed, so the pages are never held in memory
+        prior_extractor = PDFExtractor()
+        prior_extractor.scan_pdf(prior_file.file_path)
+    except Exception as e:
+        logger.warning(f"Could not fingerprint prior file {prior_file.id}: {str(e)}")
+        return None
+    page_hashes = prior_extractor.page_hashes()
+    UploadedFileService.set_page_hashes(db, prior_file.id, page_hashes)
+    return page_hashes
+
+
+def run_extraction_job(
+    db: Session,
+    job: JobStatus,
+    client_pool: GeminiClientPool,
+    lease: Optional[JobLease] = None
+) -> Dict[str, Any]:
+    """
+    Process a claimed job and store its result.
+    The lease's cancellation token is checked between steps, PDF pages,
+    Gemini calls and Excel sheets. On failure or cancellation the job's files
+    are removed; if the lease is lost the job is left to the worker that now
+    holds it. Progress, completion, failure and cancellation are only
+    recorded (and files only removed) while this worker holds the job, and
+    the job is completed in the transaction that stores its result.
+    
+    Args:
+        db: Database session
+        job: Claimed job
+        client_pool: Shared Gemini client pool
+        lease: Lease of the job
+    
+    Returns:
+        Summary of the result (as returned by /api/extract)
+    
+    Raises:
+        LeaseLostError: If the lease was lost while processing
+        JobCancelledError: If the job was cancelled
+        Exception: Any error of the pipeline, after the job was marked failed
+    """
+    start_time = time.time()
+    job_id = job.job_id
+    db_file = UploadedFileService.get_by_id(db, job.file_id)
+    pdf_path = db_file.file_path if db_file else None
+    excel_filename = excel_filename_for(db_file.filename) if db_file else None
+    excel_path = os.path.join(settings.OUTPUT_DIR, excel_filename) if db_file else None
+    cancel_token = lease.token if lease else None
+    worker_id = job.worker_id
+    
+    def no_longer_held() -> Exception:
+        # Cancelled, requeued or taken over since the lease last polled the job
+        if JobStatusService.get_status(db, job_id) == JobStatusEnum.CANCELLED:
+            return JobCancelledError(f"Job {job_id} was cancelled")
+        return LeaseLostError(f"Job {job_id} is no longer processed by {worker_id}")
+    
+    def advance(current_step: str, progress_percentage: int):
+        if cancel_token:
+            cancel_token.check()
+        if not JobStatusService.update_progress(db, job_id, worker_id, current_step, progress_percentage):
+            raise no_longer_held()
+    
+    def stop_cancelled():
+        # Only the worker holding the job cleans up after it
+        if not JobStatusService.mark_cancelled(db, job_id, worker_id):
+            return
+        if db_file:
+            ExtractionLogService.create(
+                db, db_file.id,
+                f"Extraction cancelled after {time.time() - start_time:.2f}s",
+                LogLevelEnum.WARNING, "cancelled"
+            )
+        remove_job_files(pdf_path, excel_path)
+    
+    try:
+        if not db_file or not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"Uploaded PDF for file {job.file_id} is missing")
+        
+        existing_result = ExtractionResultService.get_by_file_id(db, db_file.id)
+        if existing_result:
+            # A previous attempt stored its result before its lease expired
+            if not JobStatusService.complete(db, job_id, worker_id):
+                raise no_longer_held()
+            return result_summary(existing_result, job_id)
+        
+        prior_file = None
+        prior_result = None
+        if job.prior_file_id is not None:
+            prior_file = UploadedFileService.get_by_id(db, job.prior_file_id)
+            prior_result = ExtractionResultService.get_by_file_id(db, job.prior_file_id) if prior_file else None
+            if not prior_result or not isinstance(prior_result.extracted_data, dict):
+                ExtractionLogService.create(
+                    db, db_file.id,
+                    f"Prior file {job.prior_file_id} has no extracted data anymore; running a full extraction",
+                    LogLevelEnum.WARNING, "incremental_extraction"
+                )
+                prior_file = None
+        
+        advance("extracting_text", 20)
+        
+        # Step 1: Extract text from PDF
+        logger.info(f"[{job_id}] Step 1: Extracting text from PDF...")
+        admission = get_admission_controller()
+        with admission.stage("parsing", cancel_token):
+            step_start = time.time()
+            pdf_extractor = PDFExtractor(cancel_token=cancel_token)
+            # Incremental extraction renders selected pages, so it keeps them in memory
+            streaming = (
+                prior_file is None
+                and settings.PDF_STREAMING_MIN_PAGES > 0
+                and pdf_extractor.page_count(pdf_path) >= settings.PDF_STREAMING_MIN_PAGES
+            )
+            if streaming:
+                extracted_chars = pdf_extractor.scan_pdf(pdf_path)
+            else:
+                extracted_chars = len(pdf_extractor.extract_text_from_pdf(pdf_path))
+        step_duration = int((time.time() - step_start) * 1000)
+        
+        logger.info(f"[{job_id}] Extracted {extracted_chars} characters from PDF")
+        ExtractionLogService.create(
+            db, db_file.id,
+            f"Extracted {extracted_chars} characters from PDF"
+            + (" (streaming mode)" if streaming else ""),
+            LogLevelEnum.INFO, "text_extraction", step_duration
+        )
+        
+        normalization_stats = pdf_extractor.normalization_stats
+        if normalization_stats:
+            ExtractionLogService.create(
+                db, db_file.id,
+                f"Text normalization removed {normalization_stats['removed_chars']} characters "
+                f"({normalization_stats['boilerplate_lines_removed']} repeated lines across "
+                f"{normalization_stats['pages']} pages)",
+                LogLevelEnum.INFO, "text_normalization"
+            )
+        
+        page_hashes = pdf_extractor.page_hashes()
+        UploadedFileService.set_page_hashes(db, db_file.id, page_hashes)
+        
+        advance("processing_with_ai", 40)
+        
+        # Step 2: Send to Gemini for data extraction
+        logger.info(f"[{job_id}] Step 2: Sending text to Gemini API for data extraction...")
+        with admission.stage("llm", cancel_token):
+            step_start = time.time()
+            gemini_extractor = GeminiExtractor(client_pool=client_pool, cancel_token=cancel_token)
+            incremental_info = None
+            prior_hashes = prior_page_hashes(db, prior_file) if prior_file else None
+            if prior_hashes:
+                structured_data, incremental_info = IncrementalExtractor(gemini_extractor).extract(
+                    pdf_extractor, prior_result.extracted_data, prior_hashes, max_retries=2
+                )
+            else:
+                if prior_file:
+                    ExtractionLogService.create(
+                        db, db_file.id,
+                        f"Prior file {prior_file.id} has no page fingerprints and its PDF is gone; "
+                        "running a full extraction",
+                        LogLevelEnum.WARNING, "incremental_extraction"
+                    )
+                if streaming:
+                    structured_data = gemini_extractor.extract_data_streaming(pdf_extractor.iter_chunks())
+                else:
+                    structured_data = gemini_extractor.extract_with_retry(pdf_extractor.extracted_text, max_retries=2)
+        step_duration = int((time.time() - step_start) * 1000)
+        
+        logger.info(f"[{job_id}] Successfully extracted structured data from Gemini")
+        ExtractionLogService.create(
+            db, db_file.id,
+            f"AI extraction completed using {settings.GEMINI_MODEL}",
+            LogLevelEnum.INFO, "ai_processing", step_duration
+        )
+        
+        incremental_mode = incremental_info is not None and incremental_info["mode"] == "incremental"
+        if incremental_info:
+            if incremental_mode:
+                message = (
+                    f"Incremental extraction from file {prior_file.id}: "
+                    f"{len(incremental_info['changed_pages'])} of {len(page_hashes)} pages changed, "
+                    f"{incremental_info['characters_sent']} of {extracted_chars} characters sent, "
+                    f"inherited sections: {', '.join(incremental_info['inherited_sections']) or 'none'}"
+                )
+            else:
+                message = f"Too many pages changed since file {prior_file.id}; ran a full extraction"
+            ExtractionLogService.create(
+                db, db_file.id, message,
+                LogLevelEnum.INFO, "incremental_extraction",
+                extra_data=incremental_info
+            )
+        
+        advance("generating_excel", 70)
+        
+        # Step 3: Generate Excel file
+        logger.info(f"[{job_id}] Step 3: Generating Excel file...")
+        with admission.stage("excel", cancel_token):
+            step_start = time.time()
+            excel_generator = ExcelGenerator(cancel_token=cancel_token)
+            output_path = excel_generator.generate_excel(structured_data, excel_path)
+            record_output_file(output_path)
+        step_duration = int((time.time() - step_start) * 1000)
+        
+        logger.info(f"[{job_id}] Excel file generated: {output_path}")
+        ExtractionLogService.create(
+            db, db_file.id,
+            f"Excel file generated: {excel_filename}",
+            LogLevelEnum.INFO, "excel_generation", step_duration
+        )
+        
+        # Calculate processing time
+        total_processing_time = time.time() - start_time
+        
+        # Count sheets if structured_data is available
+        total_sheets = 0
+        if isinstance(structured_data, dict):
+            total_sheets = len(structured_data.get("sheets", []))
+        
+        advance("saving_result", 90)
+        
+        # Update job status: Completed, committed with the result
+        if not JobStatusService.complete(db, job_id, worker_id, commit=False):
+            db.rollback()
+            raise no_longer_held()
+        try:
+            db_result = ExtractionResultService.create(
+                db=db,
+                file_id=db_file.id,
+                excel_filename=excel_filename,
+                excel_path=excel_path,
+                extracted_data=structured_data if isinstance(structured_data, dict) else None,
+                processing_time=total_processing_time,
+                total_characters_extracted=extracted_chars,
+                total_sheets_generated=total_sheets,
+                gemini_model_used=settings.GEMINI_MODEL,
+                base_file_id=prior_file.id if incremental_mode else None,
+                inherited_sections=incremental_info["inherited_sections"] if incremental_mode else None
+            )
+        except IntegrityError:
+            # Another attempt of the job stored its result first; its files are kept
+            db.rollback()
+            raise LeaseLostError(f"Job {job_id} already has a result stored by another attempt")
+    
+    except LeaseLostError:
+        logger.warning(f"[{job_id}] Stopped: the job was requeued or taken over by another worker")
+        raise
+    
+    except JobCancelledError:
+        logger.info(f"[{job_id}] Extraction cancelled")
+        db.rollback()
+        stop_cancelled()
+        raise
+    
+    except Exception as e:
+        logger.error(f"[{job_id}] Error during extraction: {str(e)}", exc_info=True)
+        db.rollback()
+        
+        if not JobStatusService.fail(db, job_id, worker_id, str(e)):
+            # Cancelled or taken over meanwhile: the failure is not this worker's to record
+            error = no_longer_held()
+            if not isinstance(error, LeaseLostError):
+                stop_cancelled()
+            raise error from e
+        
+        if db_file:
+            ExtractionLogService.create(
+                db, db_file.id,
+                f"Extraction failed: {str(e)}",
+                LogLevelEnum.ERROR, "error"
+            )
+        
+        # Clean up files on error
+        remove_job_files(pdf_path, excel_path)
+        raise
+    
+    # The job is completed: derived data is best effort from here on
+    if isinstance(structured_data, dict):
+        index_portfolio(db, db_result.id, db_file.id, structured_data)
+    index_search(db, db_file.id, pdf_extractor, structured_data)
+    
+    ExtractionLogService.create(
+        db, db_file.id,
+        f"Extraction completed successfully in {total_processing_time:.2f}s",
+        LogLevelEnum.INFO, "completion"
+    )
+    
+    summary = result_summary(db_result, job_id)
+    summary["incremental"] = incremental_info
+    return summary
+
+
+def remove_job_files(pdf_path: Optional[str], excel_path: Optional[str]):
+    """Remove the uploaded PDF and any (partial) Excel file of a job that did not complete."""
+    if pdf_path and os.path.exists(pdf_path):
+        os.remove(pdf_path)
+    if excel_path and os.path.exists(excel_path):
+        os.remove(excel_path)
+        remove_output_metadata(excel_path)
+
+
+def index_portfolio(db: Session, result_id: int, file_id: int, data: Dict[str, Any]):
+    """
+    Populate the portfolio tables from a new result.
+    A failure is logged but does not fail the job: the tables are derived
+    data, rebuilt by backfill_portfolio_tables.py.
+    """
+    try:
+        counts = index_result(db, result_id, data)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Could not index result {result_id} into the portfolio tables: {str(e)}")
+        ExtractionLogService.create(
+            db, file_id, f"Portfolio tables not updated: {str(e)}",
+            LogLevelEnum.WARNING, "portfolio_index"
+        )
+        return
+    ExtractionLogService.create(
+        db, file_id,
+        f"Portfolio tables updated: {counts['investments']} holdings, {counts['profiles']} company profiles, "
+        f"{counts['financials']} company financials",
+        LogLevelEnum.INFO, "portfolio_index"
+    )
+
+
+def index_search(db: Session, file_id: int, pdf_extractor: PDFExtractor, data: Any):
+    """
+    Store the page text, footnotes and company descriptions of a new result
+    for full-text search. Like index_portfolio(), a failure does not fail the
+    job: backfill_search_index.py indexes files that were missed.
+    """
+    try:
+        counts = index_file(db, file_id, pdf_extractor.iter_page_texts(), data)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Could not index file {file_id} for search: {str(e)}")
+        ExtractionLogService.create(
+            db, file_id, f"Search index not updated: {str(e)}",
+            LogLevelEnum.WARNING, "search_index"
+        )
+        return
+    ExtractionLogService.create(
+        db, file_id,
+        f"Search index updated: {counts.get('page', 0)} pages, {counts.get('footnote', 0)} footnotes, "
+        f"{counts.get('company_description', 0)} company descriptions",
+        LogLevelEnum.INFO, "search_index"
+    )
+
+
+def result_summary(db_result, job_id: Optional[str] = None) -> Dict[str, Any]:
+    """Summary of a stored result with its download and preview links."""
+    version = (get_output_metadata(db_result.excel_path) or {}).get("sha256")
+    query = f"?v={version}" if version else ""
+    total_characters = db_result.total_characters_extracted or 0
+    return {
+        "success": True,
+        "message": "Data extracted successfully",
+        "job_id": job_id,
+        "file_id": db_result.file_id,
+        "result_id": db_result.id,
+        "output_file": db_result.excel_filename,
+        "download_url": f"/api/download/{db_result.excel_filename}{query}",
+        "preview_url": f"/api/preview/{db_result.excel_filename}{query}",
+        "sheets_url": f"/api/results/{db_result.id}/sheets",
+        "processing_time": f"{db_result.processing_time or 0:.2f}s",
+        "characters_extracted": total_characters,
+        "sheets_generated": db_result.total_sheets_generated or 0,
+        "base_file_id": db_result.base_file_id,
+        "inherited_sections": db_result.inherited_sections
+    }
@@ -4,34 +4,144 @@ Handles communication with Google's Gemini API and processes responses.
 Uses progressive chunking to extract complete data from large PDFs.
 """
 
-import google.generativeai as genai
 import json
 import logging
-from typing import Dict, Any, Optional, List
+import re
+import time
+from typing import Dict, Any, Iterable, Optional, List
 from app.config import settings
 from app.templates.prompt_template import EXTRACTION_PROMPT_TEMPLATE, VALIDATION_PROMPT
+from app.services.json_repair import repair_json
+from app.services.rate_limiter import get_rate_limiter, PRIORITY_INTERACTIVE
+from app.services.cancellation import CancellationToken, JobCancelledError
+from app.services.llm_client_pool import GeminiClientPool, get_client_pool
+from app.services.hedging import get_latency_tracker, hedged_call
 
 logger = logging.getLogger(__name__)
 
+# Page markers inserted by PDFExtractor, used as preferred split points
+PAGE_MARKER_PATTERN = re.compile(r"\n--- Page \d+ ---\n")
+
+# Chunks smaller than this are never split on overflow
+MIN_SPLIT_CHARS = 2000
+
+# Rough characters-per-token ratio used to estimate prompt size for rate limiting
+CHARS_PER_TOKEN = 4
+
 
 class GeminiExtractor:
     """Extract structured data using Google Gemini API."""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        client_pool: Optional[GeminiClientPool] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ):
         """
-        Initialize Gemini API client.
+        Initialize the extractor on top of a pool of Gemini API clients.
         
         Args:
             api_key: Gemini API key (uses settings if not provided)
+            priority: Rate limiter priority (PRIORITY_INTERACTIVE or PRIORITY_BATCH)
+            client_pool: Client pool to lease clients from (the shared pool if not
+                provided; a private single-client pool for a non-default api_key)
+            cancel_token: Checked before every API call; a cancelled job makes no
+                further calls
         """
         self.api_key = api_key or settings.GEMINI_API_KEY
         if not self.api_key:
             raise ValueError("Gemini API key is required")
         
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+        if client_pool is None:
+            if self.api_key == settings.GEMINI_API_KEY:
+                client_pool = get_client_pool()
+            else:
+                client_pool = GeminiClientPool(size=1, api_key=self.api_key)
+        self.client_pool = client_pool
+        self.priority = priority
+        self.cancel_token = cancel_token
+        self.rate_limiter = get_rate_limiter()
+        self.latency = get_latency_tracker()
         logger.info(f"Initialized Gemini model: {settings.GEMINI_MODEL}")
     
+    def _generate_content(self, prompt: str, **kwargs):
+        """
+        Call the Gemini API through the shared rate limiter.
+        With GEMINI_HEDGING_ENABLED, a call still running past the usual
+        latency of calls of its size is hedged (see hedging.hedged_call).
+        
+        Args:
+            prompt: Prompt text
+            **kwargs: Extra arguments for generate_content
+        
+        Returns:
+            Gemini response
+        
+        Raises:
+            JobCancelledError: If the job was cancelled
+        """
+        if self.cancel_token:
+            self.cancel_token.check()
+        estimated_tokens = len(prompt) // CHARS_PER_TOKEN
+        self.rate_limiter.acquire(estimated_tokens, self.priority, cancel_token=self.cancel_token)
+        self.latency.start_call()
+        
+        delay = self.latency.hedge_delay(estimated_tokens) if settings.GEMINI_HEDGING_ENABLED else None
+        if delay is None or delay >= (settings.GEMINI_CALL_TIMEOUT_SECONDS or float("inf")):
+            return self._send(prompt, estimated_tokens, kwargs)
+        
+        def send(hedge_token: Optional[CancellationToken]):
+            if hedge_token is not None:
+                # A hedge takes its own share of the quota
+                self.rate_limiter.acquire(estimated_tokens, self.priority, cancel_token=hedge_token)
+            return self._send(prompt, estimated_tokens, kwargs, hedge_token)
+        
+        return hedged_call(send, delay, self.latency, cancel_token=self.cancel_token)
+    
+    def _send(
+        self,
+        prompt: str,
+        estimated_tokens: int,
+        kwargs: Dict[str, Any],
+        hedge_token: Optional[CancellationToken] = None
+    ):
+        """
+        Make one API call on a leased client and record its usage and latency.
+        
+        Args:
+            prompt: Prompt text
+            estimated_tokens: Tokens taken from the rate limiter for the call
+            kwargs: Extra arguments for generate_content
+            hedge_token: For a hedge, cancelled once the primary call has
+                answered; the hedge is then dropped before it is sent
+        
+        Returns:
+            Gemini response
+        """
+        from google.api_core import exceptions as google_exceptions
+        
+        try:
+            with self.client_pool.lease(cancel_token=hedge_token or self.cancel_token) as model:
+                if hedge_token is not None:
+                    hedge_token.check()
+                start = time.monotonic()
+                response = model.generate_content(prompt, **kwargs)
+                elapsed = time.monotonic() - start
+        except google_exceptions.ResourceExhausted:
+            self.rate_limiter.report_rate_limited()
+            raise
+        except google_exceptions.DeadlineExceeded:
+            logger.warning(f"Gemini call exceeded its deadline of {settings.GEMINI_CALL_TIMEOUT_SECONDS}s")
+            raise
+        
+        self.latency.record(estimated_tokens, elapsed)
+        usage = getattr(response, "usage_metadata", None)
+        self.rate_limiter.record_usage(estimated_tokens, getattr(usage, "total_token_count", None))
+        self.rate_limiter.report_success()
+        return response
+    
     def extract_data(self, pdf_text: str, max_retries: int = 2) -> Dict[str, Any]:
         """
         Extract structured data from PDF text using progressive chunking.
@@ -41,10 +151,10 @@ class GeminiExtractor:
         Args:
             pdf_text: Extracted text from PDF
             max_retries: Maximum number of retry attempts
-            
+        
         Returns:
             Structured data as a dictionary
-            
+        
         Raises:
             Exception: If extraction fails
         """
@@ -70,7 +180,7 @@ class GeminiExtractor:
             pdf_text: Full PDF text
             chunk_size: Size of each chunk in characters (1/4 of total)
             max_retries: Maximum retry attempts
-            
+        
         Returns:
             Merged structured data from all chunks
         """
@@ -87,17 +197,7 @@ class GeminiExtractor:
         logger.info("")
         
         # Initialize merged result with all 9 section structures
-        merged_result = {
-            "portfolio_summary": {},
-            "schedule_of_investments": [],
-            "statement_of_operations": [],
-            "statement_of_cashflows": {},
-            "pcap_statement": {},
-            "portfolio_company_profile": [],
-            "portfolio_company_financials": [],
-            "footnotes": [],
-            "reference_values": {}  # 9th section
-        }
+        merged_result = self._empty_result()
         
         # Process each chunk and extract all 9 sections
         for chunk_idx, chunk_text in enumerate(chunks, 1):
@@ -126,7 +226,9 @@ class GeminiExtractor:
                     self._log_merge_status(merged_result, chunk_idx, total_chunks)
                 else:
                     logger.warning(f"   ⚠️  No data extracted from chunk {chunk_idx}")
-                    
+            
+            except JobCancelledError:
+                raise
             except Exception as e:
                 logger.error(f"   ❌ Failed to process chunk {chunk_idx}: {str(e)}")
                 logger.info(f"   ➡️  Continuing with next chunk...")
@@ -146,6 +248,73 @@ class GeminiExtractor:
         
         return validated_data
     
+    def extract_data_streaming(self, chunks: Iterable[str], max_retries: int = 2) -> Dict[str, Any]:
+        """
+        Extract data from a stream of text chunks, merging each chunk's result
+        as soon as it is extracted. Used for long documents, whose text is
+        never held in memory whole (see PDFExtractor.iter_chunks).
+        
+        Args:
+            chunks: Text chunks in document order, produced lazily
+            max_retries: Maximum retry attempts per chunk
+        
+        Returns:
+            Merged structured data from all chunks
+        
+        Raises:
+            JobCancelledError: If the job was cancelled
+            Exception: If no chunk could be extracted
+        """
+        logger.info("="*80)
+        logger.info("STREAMING CHUNK EXTRACTION")
+        logger.info("="*80)
+        
+        merged_result = self._empty_result()
+        total_chars = 0
+        extracted_chunks = 0
+        last_error = None
+        chunk_idx = 0
+        
+        for chunk_idx, chunk_text in enumerate(chunks, 1):
+            total_chars += len(chunk_text)
+            logger.info(f"📊 CHUNK {chunk_idx}: {len(chunk_text)} characters (offset {total_chars - len(chunk_text)})")
+            
+            try:
+                chunk_data = self._extract_data_single(chunk_text, max_retries)
+            except JobCancelledError:
+                raise
+            except Exception as e:
+                last_error = e
+                logger.error(f"   ❌ Failed to process chunk {chunk_idx}: {str(e)}")
+                continue
+            
+            if chunk_data:
+                merged_result = self._progressive_merge(merged_result, chunk_data, chunk_idx)
+                extracted_chunks += 1
+                self._log_merge_status(merged_result, chunk_idx, chunk_idx)
+            else:
+                logger.warning(f"   ⚠️  No data extracted from chunk {chunk_idx}")
+        
+        if chunk_idx and not extracted_chunks and last_error is not None:
+            raise Exception(f"Failed to extract any of {chunk_idx} chunks: {str(last_error)}")
+        
+        logger.info(f"✓ Streamed {chunk_idx} chunks ({total_chars} characters), {extracted_chunks} with data")
+        return self._validate_data(merged_result)
+    
+    def _empty_result(self) -> Dict[str, Any]:
+        """Create an empty result with all 9 section structures."""
+        return {
+            "portfolio_summary": {},
+            "schedule_of_investments": [],
+            "statement_of_operations": [],
+            "statement_of_cashflows": {},
+            "pcap_statement": {},
+            "portfolio_company_profile": [],
+            "portfolio_company_financials": [],
+            "footnotes": [],
+            "reference_values": {}  # 9th section
+        }
+    
     def _split_into_chunks(self, text: str, chunk_size: int) -> List[str]:
         """
         Split text into chunks of specified size.
@@ -154,7 +323,7 @@ class GeminiExtractor:
         Args:
             text: Full text to split
             chunk_size: Maximum size of each chunk
-            
+        
         Returns:
             List of text chunks
         """
@@ -195,14 +364,14 @@ class GeminiExtractor:
             accumulated: Accumulated data from previous chunks
             new_data: New data from current chunk
             chunk_num: Current chunk number
-            
+        
         Returns:
             Updated accumulated data
         """
         for key, value in new_data.items():
             if key not in accumulated:
                 accumulated[key] = value
-                
+            
             elif isinstance(value, dict) and isinstance(accumulated[key], dict):
                 # For dictionaries (portfolio_summary, cashflows, pcap, reference_values)
                 # Merge new keys, but keep existing values for duplicate keys
@@ -210,7 +379,7 @@ class GeminiExtractor:
                     if sub_key not in accumulated[key] or accumulated[key][sub_key] is None or accumulated[key][sub_key] == 0:
                         # Only update if not already set or is null/zero
                         accumulated[key][sub_key] = sub_value
-                
+            
             elif isinstance(value, list) and isinstance(accumulated[key], list):
                 # For lists (investments, operations, companies, footnotes)
                 # Append new items, avoiding duplicates
@@ -238,7 +407,7 @@ class GeminiExtractor:
         Args:
             item1: First item
             item2: Second item
-            
+        
         Returns:
             True if items are duplicates
         """
@@ -274,29 +443,47 @@ class GeminiExtractor:
                     non_null_count = len([v for v in value.values() if v is not None and v != 0 and v != ""])
                     logger.info(f"      - {key}: {non_null_count} fields populated")
     
-    def _extract_data_single(self, pdf_text: str, max_retries: int = 2) -> Dict[str, Any]:
+    def _extract_data_single(self, pdf_text: str, max_retries: int = 2, depth: int = 0) -> Dict[str, Any]:
         """
         Extract data from PDF text using a single API call.
         Extracts all 9 sections from the provided text.
         
+        If the text exceeds the input budget, or the response is cut off at
+        GEMINI_MAX_TOKENS, the text is split in half at a page boundary and
+        both halves are extracted recursively and merged.
+        
         Args:
             pdf_text: Extracted text from PDF (or chunk)
             max_retries: Maximum number of retry attempts
-            
+            depth: Current split depth (0 for the original chunk)
+        
         Returns:
             Structured data as a dictionary with all 9 sections
+        
+        Raises:
+            ValueError: If max_retries is less than 1
         """
-        # Truncate text if too long (Gemini has token limits)
-        # Gemini 2.0 Flash has larger context window - can handle more
-        max_chars = 100000  # Increased limit for Gemini 2.0 Flash
+        if max_retries < 1:
+            raise ValueError(f"max_retries must be at least 1 (got {max_retries})")
+        
+        max_chars = settings.GEMINI_MAX_INPUT_CHARS
         if len(pdf_text) > max_chars:
-            logger.warning(f"PDF text too long ({len(pdf_text)} chars), truncating to {max_chars}")
+            halves = self._split_in_half(pdf_text, depth)
+            if halves:
+                logger.info(
+                    f"[split depth {depth}] Input of {len(pdf_text)} chars exceeds budget of "
+                    f"{max_chars} chars - splitting into {len(halves[0])} + {len(halves[1])} chars"
+                )
+                return self._extract_split(halves, max_retries, depth)
+            
+            logger.warning(f"PDF text too long ({len(pdf_text)} chars) and cannot be split, truncating to {max_chars}")
             pdf_text = pdf_text[:max_chars] + "\n\n[... text truncated ...]"
         
         # Create prompt with extracted text
         prompt = EXTRACTION_PROMPT_TEMPLATE.format(extracted_text=pdf_text)
         
         # Try extraction with retries
+        halves = None
         for attempt in range(1, max_retries + 1):
             try:
                 logger.info(f"Extraction attempt {attempt}/{max_retries}")
@@ -310,7 +497,7 @@ class GeminiExtractor:
                     "max_output_tokens": settings.GEMINI_MAX_TOKENS,
                 }
                 
-                response = self.model.generate_content(
+                response = self._generate_content(
                     prompt,
                     generation_config=generation_config,
                     safety_settings={
@@ -321,6 +508,21 @@ class GeminiExtractor:
                     }
                 )
                 
+                # Output cut off at max tokens - split the input instead of parsing partial JSON
+                if self._hit_max_tokens(response):
+                    halves = self._split_in_half(pdf_text, depth)
+                    if halves:
+                        logger.warning(
+                            f"[split depth {depth}] Response hit GEMINI_MAX_TOKENS "
+                            f"({settings.GEMINI_MAX_TOKENS}) - splitting {len(pdf_text)} chars into "
+                            f"{len(halves[0])} + {len(halves[1])} chars"
+                        )
+                        break
+                    logger.warning(
+                        f"[split depth {depth}] Response hit GEMINI_MAX_TOKENS but chunk cannot be split further, "
+                        f"salvaging partial response"
+                    )
+                
                 # Extract text from response
                 response_text = response.text
                 logger.info(f"Received response from Gemini ({len(response_text)} chars)")
@@ -336,13 +538,96 @@ class GeminiExtractor:
                 
                 logger.info("Successfully extracted and validated data")
                 return validated_data
-                
+            
+            except JobCancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Extraction attempt {attempt} failed: {str(e)}")
                 if attempt == max_retries:
                     logger.error(f"All {max_retries} extraction attempts failed")
                     raise Exception(f"Failed to extract data after {max_retries} attempts: {str(e)}")
                 logger.info(f"Retrying... ({attempt + 1}/{max_retries})")
+        
+        # Only reached when the response overflowed and the chunk was split
+        if not halves:
+            raise Exception(f"Failed to extract data: no attempt completed in {max_retries} attempts")
+        return self._extract_split(halves, max_retries, depth)
+    
+    def _extract_split(self, halves: List[str], max_retries: int, depth: int) -> Dict[str, Any]:
+        """
+        Extract each half of a split chunk and merge the results.
+        
+        Args:
+            halves: The two halves of the chunk
+            max_retries: Maximum retry attempts per half
+            depth: Split depth of the parent chunk
+        
+        Returns:
+            Merged structured data from both halves
+        """
+        merged_result = self._empty_result()
+        
+        for part_idx, part_text in enumerate(halves, 1):
+            logger.info(f"[split depth {depth + 1}] Extracting part {part_idx}/{len(halves)} ({len(part_text)} chars)")
+            part_data = self._extract_data_single(part_text, max_retries, depth + 1)
+            merged_result = self._progressive_merge(merged_result, part_data, part_idx)
+        
+        return self._validate_data(merged_result)
+    
+    def _split_in_half(self, text: str, depth: int) -> Optional[List[str]]:
+        """
+        Split text into two halves, preferring a page boundary near the middle.
+        
+        Args:
+            text: Chunk text to split
+            depth: Current split depth
+        
+        Returns:
+            List with two halves, or None if the text should not be split further
+        """
+        if depth >= settings.GEMINI_MAX_SPLIT_DEPTH:
+            logger.info(f"[split depth {depth}] Maximum split depth reached, not splitting")
+            return None
+        if len(text) < MIN_SPLIT_CHARS:
+            logger.info(f"[split depth {depth}] Chunk of {len(text)} chars is too small to split")
+            return None
+        
+        middle = len(text) // 2
+        
+        # Page markers come from PDFExtractor ("\n--- Page N ---\n")
+        boundaries = [m.start() for m in PAGE_MARKER_PATTERN.finditer(text) if m.start() > 0]
+        if boundaries:
+            split_at = min(boundaries, key=lambda pos: abs(pos - middle))
+        else:
+            # Single page - fall back to the nearest line break
+            split_at = text.rfind("\n", 0, middle)
+            if split_at <= 0:
+                split_at = middle
+        
+        return [text[:split_at], text[split_at:]]
+    
+    def _hit_max_tokens(self, response) -> bool:
+        """
+        Check whether Gemini stopped generating because of the output token limit.
+        
+        Args:
+            response: Response returned by generate_content
+        
+        Returns:
+            True if any candidate finished with MAX_TOKENS
+        """
+        try:
+            candidates = response.candidates or []
+        except Exception:
+            return False
+        
+        for candidate in candidates:
+            finish_reason = getattr(candidate, "finish_reason", None)
+            if finish_reason is None:
+                continue
+            if getattr(finish_reason, "name", str(finish_reason)) == "MAX_TOKENS":
+                return True
+        return False
     
     def _parse_json_response(self, response_text: str) -> Dict[str, Any]:
         """
@@ -350,7 +635,7 @@ class GeminiExtractor:
         
         Args:
             response_text: Raw response text from Gemini
-            
+        
         Returns:
             Parsed JSON data
         """
@@ -381,12 +666,25 @@ class GeminiExtractor:
             # Parse JSON
             data = json.loads(cleaned_text)
             return data
-            
+        
         except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {str(e)}")
+            logger.warning(f"Failed to parse JSON response: {str(e)}")
             logger.debug(f"Response text (first 1000 chars): {response_text[:1000]}...")
             
-            # Try to salvage data by asking Gemini to fix it
+            # Try a local repair first (truncation, trailing commas, quotes, markdown)
+            data, report = repair_json(response_text)
+            if data is not None:
+                logger.info(f"Repaired JSON response locally ({report.summary()})")
+                if report.truncated:
+                    logger.warning(
+                        f"Response was truncated - salvaged {report.kept_chars} chars, "
+                        f"dropped {report.dropped_chars} chars of partial data"
+                    )
+                return data
+            
+            logger.warning(f"Local JSON repair failed ({report.summary()}), asking Gemini to fix it")
+            
+            # Last resort: ask Gemini to fix it
             try:
                 fix_prompt = f"""The following text should be valid JSON but has errors. Fix it and return ONLY valid JSON (no explanations, no markdown):
 
@@ -394,29 +692,15 @@ class GeminiExtractor:
 
 Return ONLY the corrected JSON starting with {{ and ending with }}"""
                 
-                response = self.model.generate_content(fix_prompt)
+                response = self._generate_content(fix_prompt)
                 fixed_text = response.text.strip()
                 
-                # Clean again
-                if "```json" in fixed_text:
-                    start = fixed_text.find("```json") + 7
-                    end = fixed_text.rfind("```")
-                    fixed_text = fixed_text[start:end].strip()
-                elif "```" in fixed_text:
-                    start = fixed_text.find("```") + 3
-                    end = fixed_text.rfind("```")
-                    fixed_text = fixed_text[start:end].strip()
-                
-                # Find JSON boundaries
-                start_idx = fixed_text.find("{")
-                end_idx = fixed_text.rfind("}")
-                if start_idx != -1 and end_idx != -1:
-                    fixed_text = fixed_text[start_idx:end_idx + 1]
-                
-                data = json.loads(fixed_text)
+                data, _ = repair_json(fixed_text)
+                if data is None:
+                    raise ValueError("Gemini repair response is not valid JSON")
                 logger.info("Successfully repaired JSON response")
                 return data
-                
+            
             except Exception as repair_error:
                 logger.error(f"Failed to repair JSON: {str(repair_error)}")
                 raise Exception(f"Invalid JSON response from Gemini: {str(e)}")
@@ -427,7 +711,7 @@ Return ONLY the corrected JSON starting with {{ and ending with }}"""
         
         Args:
             data: Extracted data dictionary
-            
+        
         Returns:
             Validated data
         """
@@ -482,7 +766,7 @@ Return ONLY the corrected JSON starting with {{ and ending with }}"""
         Args:
             pdf_text: Extracted text from PDF
             max_retries: Maximum number of retry attempts
-            
+        
         Returns:
             Structured data
         """
@@ -492,6 +776,8 @@ Return ONLY the corrected JSON starting with {{ and ending with }}"""
             try:
                 logger.info(f"Extraction attempt {attempt + 1}/{max_retries}")
                 return self.extract_data(pdf_text)
+            except JobCancelledError:
+                raise
             except Exception as e:
                 last_error = e
                 logger.warning(f"Attempt {attempt + 1} failed: {str(e)}")
@@ -0,0 +1,263 @@
+"""
+Latency history and hedged requests for Gemini calls.
+Successful call durations are kept per prompt-size class. A call still
+running past the GEMINI_HEDGE_PERCENTILE latency of calls of its size gets a
+duplicate request and the first response wins, so a few stuck connections
+do not set the p99 of every job. Hedges are capped to a fraction of the
+calls made over the last hour.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Deque, Dict, Optional
+
+from app.config import settings
+from app.services.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+# Window over which hedges are capped to a fraction of the calls
+HEDGE_BUDGET_WINDOW_SECONDS = 3600
+
+# Never hedge a call sooner than this, whatever the history says
+MIN_HEDGE_DELAY_SECONDS = 1.0
+
+
+def size_class(tokens: int) -> int:
+    """
+    Prompt-size class of a call: calls within a factor of two of each other
+    in estimated tokens share a latency history.
+    """
+    return max(0, int(tokens)).bit_length()
+
+
+def run_in_thread(func: Callable[[], Any], name: str) -> Future:
+    """
+    Run func in a daemon thread.
+    A call that loses the race keeps running there until its response (or
+    deadline) arrives, then returns its client to the pool.
+    
+    Returns:
+        Future set to func's result or exception
+    """
+    future: Future = Future()
+    
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=target, name=name, daemon=True).start()
+    return future
+
+
+class LatencyTracker:
+    """Per-size latency history of Gemini calls and the hedge budget."""
+    
+    def __init__(
+        self,
+        percentile: Optional[float] = None,
+        min_samples: Optional[int] = None,
+        history_size: Optional[int] = None,
+        max_extra_fraction: Optional[float] = None
+    ):
+        """
+        Initialize the tracker.
+        
+        Args:
+            percentile: Latency percentile of a size class after which a call is hedged
+            min_samples: Calls of a size class needed before its calls are hedged
+            history_size: Latest calls kept per size class
+            max_extra_fraction: Hedges allowed per call over the budget window
+        """
+        self.percentile = settings.GEMINI_HEDGE_PERCENTILE if percentile is None else percentile
+        self.min_samples = settings.GEMINI_HEDGE_MIN_SAMPLES if min_samples is None else min_samples
+        self.history_size = settings.GEMINI_LATENCY_HISTORY if history_size is None else history_size
+        self.max_extra_fraction = (
+            settings.GEMINI_HEDGE_MAX_EXTRA_FRACTION if max_extra_fraction is None else max_extra_fraction
+        )
+        
+        self._history: Dict[int, Deque[float]] = {}
+        self._calls: Deque[float] = deque()
+        self._hedges: Deque[float] = deque()
+        self._lock = threading.Lock()
+        
+        # Statistics
+        self.total_calls = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.hedges_over_budget = 0
+    
+    def record(self, tokens: int, seconds: float):
+        """
+        Add the duration of a successful call to the history of its size class.
+        
+        Args:
+            tokens: Estimated prompt tokens
+            seconds: Time from sending the request to receiving the response
+        """
+        with self._lock:
+            history = self._history.get(size_class(tokens))
+            if history is None:
+                history = self._history[size_class(tokens)] = deque(maxlen=max(1, self.history_size))
+            history.append(seconds)
+    
+    def _quantile(self, samples) -> float:
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(len(ordered) * self.percentile / 100.0) - 1))
+        return ordered[index]
+    
+    def hedge_delay(self, tokens: int) -> Optional[float]:
+        """
+        Seconds after which a call of this size is hedged.
+        
+        Args:
+            tokens: Estimated prompt tokens
+        
+        Returns:
+            The percentile latency of the size class, or None while it has
+            fewer than min_samples calls
+        """
+        with self._lock:
+            history = self._history.get(size_class(tokens))
+            if history is None or len(history) < max(1, self.min_samples):
+                return None
+            samples = list(history)
+        return max(MIN_HEDGE_DELAY_SECONDS, self._quantile(samples))
+    
+    def _trim(self, events: Deque[float], now: float):
+        while events and events[0] <= now - HEDGE_BUDGET_WINDOW_SECONDS:
+            events.popleft()
+    
+    def start_call(self):
+        """Count a call (not a hedge) towards the hedge budget."""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(self._calls, now)
+            self._calls.append(now)
+            self.total_calls += 1
+    
+    def reserve_hedge(self) -> bool:
+        """
+        Take one hedge from the budget.
+        
+        Returns:
+            True if a hedge may be sent, False if the hedges of the budget
+            window already reach max_extra_fraction of its calls
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._trim(self._calls, now)
+            self._trim(self._hedges, now)
+            if len(self._hedges) + 1 > len(self._calls) * self.max_extra_fraction:
+                self.hedges_over_budget += 1
+                return False
+            self._hedges.append(now)
+            self.hedges_sent += 1
+            return True
+    
+    def record_hedge_won(self):
+        with self._lock:
+            self.hedges_won += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Settings, hedge counters and the hedge delay of each size class."""
+        with self._lock:
+            histories = {size: list(history) for size, history in sorted(self._history.items())}
+            calls_in_window = len(self._calls)
+            hedges_in_window = len(self._hedges)
+        
+        size_classes = {}
+        for size, samples in histories.items():
+            label = f"<{2 ** size} tokens"
+            size_classes[label] = {
+                "samples": len(samples),
+                "p50_seconds": round(sorted(samples)[len(samples) // 2], 2),
+                f"p{self.percentile:g}_seconds": round(self._quantile(samples), 2),
+                "hedging": len(samples) >= max(1, self.min_samples)
+            }
+        return {
+            "hedging_enabled": settings.GEMINI_HEDGING_ENABLED,
+            "hedge_percentile": self.percentile,
+            "min_samples": self.min_samples,
+            "max_extra_fraction": self.max_extra_fraction,
+            "total_calls": self.total_calls,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "hedges_over_budget": self.hedges_over_budget,
+            "calls_last_hour": calls_in_window,
+            "hedges_last_hour": hedges_in_window,
+            "size_classes": size_classes
+        }
+
+
+def hedged_call(
+    send: Callable[[Optional[CancellationToken]], Any],
+    delay: float,
+    tracker: LatencyTracker,
+    cancel_token: Optional[CancellationToken] = None
+) -> Any:
+    """
+    Make a call, and a duplicate of it if it is still running after delay.
+    
+    Args:
+        send: Makes the call; the hedge gets a token cancelled once the
+            primary call has answered, so it leaves the rate limiter or client
+            pool queue without calling Gemini
+        delay: Seconds to wait for the primary call before hedging
+        tracker: Hedge budget and statistics
+        cancel_token: The job's token; a cancelled job sends no hedge
+    
+    Returns:
+        The first successful response
+    
+    Raises:
+        Exception: The primary call's error if no call succeeds
+    """
+    primary = run_in_thread(lambda: send(None), "gemini-call")
+    done, _ = wait([primary], timeout=delay)
+    if done or (cancel_token is not None and cancel_token.cancelled) or not tracker.reserve_hedge():
+        return primary.result()
+    
+    logger.info(f"Gemini call still running after {delay:.1f}s - sending a hedged request")
+    hedge_token = CancellationToken()
+    hedge = run_in_thread(lambda: send(hedge_token), "gemini-hedge")
+    pending = {primary, hedge}
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in (primary, hedge):
+                if future in done and future.exception() is None:
+                    if future is hedge:
+                        tracker.record_hedge_won()
+                        logger.info("Hedged Gemini request answered first")
+                    return future.result()
+        return primary.result()
+    finally:
+        hedge_token.cancel()
+
+
+_latency_tracker: Optional[LatencyTracker] = None
+_latency_tracker_lock = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """
+    Get the process-wide Gemini latency tracker.
+    
+    Returns:
+        Shared LatencyTracker instance
+    """
+    global _latency_tracker
+    if _latency_tracker is None:
+        with _latency_tracker_lock:
+            if _latency_tracker is None:
+                _latency_tracker = LatencyTracker()
+    return _latency_tracker
@@ -0,0 +1,94 @@
+"""
+Idempotency keys for /api/extract.
+A client that retries an upload with the same Idempotency-Key gets the job
+created by its first attempt back instead of starting a duplicate
+extraction. The key is stored on the job together with a fingerprint of
+the request, and honoured for IDEMPOTENCY_KEY_TTL_HOURS.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.crud import JobStatusService
+from app.database.models import JobStatus, JobStatusEnum
+
+logger = logging.getLogger(__name__)
+
+# Length of job_statuses.idempotency_key
+MAX_KEY_LENGTH = 255
+
+# Jobs whose key is released when it is repeated, so the retry runs again
+_RETRYABLE_STATUSES = (JobStatusEnum.FAILED, JobStatusEnum.CANCELLED)
+
+
+class IdempotencyKeyReusedError(Exception):
+    """Raised when an Idempotency-Key is repeated with a different request."""
+
+
+def request_fingerprint(stream: BinaryIO, *params: Any) -> str:
+    """
+    Fingerprint an upload and the parameters sent with it.
+    
+    Args:
+        stream: Uploaded file; read in chunks and rewound
+        *params: Form parameters that change the job
+    
+    Returns:
+        SHA-256 hex digest
+    """
+    digest = hashlib.sha256(json.dumps(params, default=str).encode("utf-8"))
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def find_job(
+    db: Session,
+    idempotency_key: str,
+    fingerprint: str,
+    now: Optional[datetime] = None
+) -> Optional[JobStatus]:
+    """
+    Get the job an earlier request with this Idempotency-Key created.
+    Keys older than the TTL, and keys of jobs that failed or were cancelled,
+    are released instead, so the request starts a new job.
+    
+    Args:
+        db: Database session
+        idempotency_key: Idempotency-Key header of the request
+        fingerprint: request_fingerprint() of the request
+        now: Current UTC time (for tests)
+    
+    Returns:
+        The existing job, or None if the request should create one
+    
+    Raises:
+        IdempotencyKeyReusedError: If the key belongs to a different request
+    """
+    db_job = JobStatusService.get_by_idempotency_key(db, idempotency_key)
+    if db_job is None:
+        return None
+    
+    ttl_hours = settings.IDEMPOTENCY_KEY_TTL_HOURS
+    expired = ttl_hours > 0 and db_job.created_at < (now or datetime.utcnow()) - timedelta(hours=ttl_hours)
+    if expired or db_job.status in _RETRYABLE_STATUSES:
+        logger.info(
+            f"[{db_job.job_id}] Released Idempotency-Key of "
+            f"{'expired' if expired else db_job.status.value} job for a new request"
+        )
+        JobStatusService.release_idempotency_key(db, db_job.job_id)
+        return None
+    
+    if db_job.request_fingerprint and db_job.request_fingerprint != fingerprint:
+        raise IdempotencyKeyReusedError(
+            "Idempotency-Key was already used for a different upload or different parameters"
+        )
+    return db_job
@@ -0,0 +1,291 @@
+"""
+Incremental re-extraction of a fund's next report.
+Compares the page fingerprints of a new PDF with those of the previous
+report of the same fund, sends only new or changed pages to Gemini and
+merges the resulting sections over the previous result's extracted data.
+"""
+
+import copy
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.config import settings
+from app.services.gemini_extractor import GeminiExtractor
+from app.services.pdf_extractor import PDFExtractor
+
+logger = logging.getLogger(__name__)
+
+# Field identifying an item of each list section, and fields that must also
+# match when both items have them (a company can hold several securities)
+ITEM_KEYS = {
+    "schedule_of_investments": ("company", ("fund", "security_type")),
+    "statement_of_operations": ("period", ()),
+    "portfolio_company_profile": ("company_name", ()),
+    "portfolio_company_financials": ("company", ()),
+    "footnotes": ("note_number", ()),
+}
+
+# Identifying fields tried, in order, for sections of custom templates
+FALLBACK_ITEM_KEYS = ("company", "company_name", "note_number", "line_item", "period", "name")
+
+
+def diff_pages(page_hashes: List[str], prior_page_hashes: List[str]) -> Tuple[List[int], List[int]]:
+    """
+    Split the pages of a document into changed and unchanged pages.
+    A page is unchanged if a page with the same fingerprint exists anywhere in
+    the prior document, so inserted or reordered pages do not shift the diff.
+    
+    Args:
+        page_hashes: Fingerprints of the new document's pages
+        prior_page_hashes: Fingerprints of the prior document's pages
+    
+    Returns:
+        Tuple of (changed page numbers, unchanged page numbers), 1-based
+    """
+    prior = set(prior_page_hashes)
+    changed, unchanged = [], []
+    for page_num, page_hash in enumerate(page_hashes, start=1):
+        (unchanged if page_hash in prior else changed).append(page_num)
+    return changed, unchanged
+
+
+def has_values(value: Any) -> bool:
+    """Whether an extracted section (or part of one) holds any data."""
+    if isinstance(value, dict):
+        return any(has_values(item) for item in value.values())
+    if isinstance(value, list):
+        return any(has_values(item) for item in value)
+    return value not in (None, "")
+
+
+def _key_value(item: Dict[str, Any], field: str) -> Optional[str]:
+    """Comparable value of an identifying field (note 1 and "1" match), or None if empty."""
+    value = item.get(field)
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    text = str(value).strip().casefold()
+    return text or None
+
+
+def _item_field(section: str, item: Dict[str, Any]) -> Optional[str]:
+    """Identifying field of an item of a list section."""
+    if section in ITEM_KEYS:
+        return ITEM_KEYS[section][0]
+    return next((key for key in FALLBACK_ITEM_KEYS if _key_value(item, key) is not None), None)
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def same_item(section: str, item: Dict[str, Any], new_item: Dict[str, Any]) -> bool:
+    """
+    Whether two items of a list section describe the same entry.
+    
+    Args:
+        section: Section key (see ITEM_KEYS)
+        item: Prior item
+        new_item: Newly extracted item
+    
+    Returns:
+        True if their identifying field matches (and their qualifying fields,
+        where both have them)
+    """
+    field = _item_field(section, new_item)
+    qualifiers = ITEM_KEYS[section][1] if section in ITEM_KEYS else ()
+    
+    if field is None or _key_value(new_item, field) is None:
+        return False
+    if _key_value(item, field) != _key_value(new_item, field):
+        return False
+    for qualifier in qualifiers:
+        prior_value, new_value = _key_value(item, qualifier), _key_value(new_item, qualifier)
+        if prior_value is not None and new_value is not None and prior_value != new_value:
+            return False
+    return True
+
+
+def shown_in(section: str, item: Any, text: str) -> bool:
+    """
+    Whether an item of a list section appears in a text.
+    
+    Args:
+        section: Section key (see ITEM_KEYS)
+        item: Item of the section
+        text: Text normalized with _normalize_text()
+    
+    Returns:
+        True if the item's identifying value (or the item itself, for plain
+        values) occurs in the text, or if the item has nothing to look for
+    """
+    if isinstance(item, dict):
+        field = _item_field(section, item)
+        value = _key_value(item, field) if field else None
+    else:
+        value = _key_value({"value": item}, "value")
+    if value is None:
+        return True
+    return _normalize_text(value) in text
+
+
+class IncrementalExtractor:
+    """Re-extract only the changed pages of a document and reuse the rest."""
+    
+    def __init__(self, gemini_extractor: GeminiExtractor, max_changed_ratio: Optional[float] = None):
+        """
+        Initialize the incremental extractor.
+        
+        Args:
+            gemini_extractor: Extractor used for the changed pages
+            max_changed_ratio: Above this fraction of changed pages a full
+                extraction is done instead (uses settings if not provided)
+        """
+        self.gemini_extractor = gemini_extractor
+        self.max_changed_ratio = (
+            settings.INCREMENTAL_MAX_CHANGED_RATIO if max_changed_ratio is None else max_changed_ratio
+        )
+    
+    def extract(
+        self,
+        pdf_extractor: PDFExtractor,
+        prior_data: Dict[str, Any],
+        prior_page_hashes: List[str],
+        max_retries: int = 2
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Extract structured data, reusing the prior result for unchanged pages.
+        
+        Args:
+            pdf_extractor: Extractor that has already extracted the new PDF
+            prior_data: extracted_data of the prior result
+            prior_page_hashes: Page fingerprints of the prior upload
+            max_retries: Retry attempts for the Gemini extraction
+        
+        Returns:
+            Tuple of (structured data, incremental info with mode, changed_pages,
+            unchanged_pages, characters_sent, inherited_sections and updated_sections)
+        """
+        changed, unchanged = diff_pages(pdf_extractor.page_hashes(), prior_page_hashes)
+        page_count = len(changed) + len(unchanged)
+        info = {
+            "mode": "incremental",
+            "changed_pages": changed,
+            "unchanged_pages": unchanged,
+            "characters_sent": 0,
+            "inherited_sections": [],
+            "updated_sections": []
+        }
+        
+        if not page_count or len(changed) > page_count * self.max_changed_ratio:
+            logger.info(
+                f"{len(changed)}/{page_count} pages changed, above the incremental limit - "
+                "running a full extraction"
+            )
+            info["mode"] = "full"
+            info["characters_sent"] = len(pdf_extractor.extracted_text)
+            data = self.gemini_extractor.extract_with_retry(pdf_extractor.extracted_text, max_retries=max_retries)
+            info["updated_sections"] = [key for key, value in data.items() if has_values(value)]
+            return data, info
+        
+        logger.info(f"Incremental extraction: {len(changed)}/{page_count} pages changed")
+        
+        new_data = {}
+        unchanged_text = pdf_extractor.render_pages(unchanged) if unchanged else ""
+        if changed:
+            changed_text = pdf_extractor.render_pages(changed)
+            info["characters_sent"] = len(changed_text)
+            if changed_text.strip():
+                new_data = self.gemini_extractor.extract_with_retry(changed_text, max_retries=max_retries)
+        
+        data, inherited, updated = self.merge_sections(prior_data, new_data, unchanged_text)
+        info["inherited_sections"] = inherited
+        info["updated_sections"] = updated
+        return data, info
+    
+    def merge_sections(
+        self,
+        prior_data: Dict[str, Any],
+        new_data: Dict[str, Any],
+        unchanged_text: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], List[str], List[str]]:
+        """
+        Merge sections extracted from the changed pages over the prior data.
+        Sections without new data are inherited as they are. In dictionary
+        sections every new value that is not None or "" replaces the prior one
+        (so a value that dropped to 0 is updated); in list sections new items
+        replace the prior item with the same key (see ITEM_KEYS: company,
+        period, footnote number). Other prior items are kept if they still
+        appear on an unchanged page; the rest were on the changed pages and
+        are no longer in the report (e.g. an exited holding).
+        
+        Args:
+            prior_data: extracted_data of the prior result
+            new_data: Data extracted from the changed pages
+            unchanged_text: Rendered text of the unchanged pages (if None,
+                every prior item is kept)
+        
+        Returns:
+            Tuple of (merged data, inherited section keys, updated section keys)
+        """
+        merged = copy.deepcopy(prior_data) if isinstance(prior_data, dict) else {}
+        inherited, updated = [], []
+        unchanged_text = None if unchanged_text is None else _normalize_text(unchanged_text)
+        
+        for key in list(merged.keys()) + [key for key in new_data if key not in merged]:
+            new_value = new_data.get(key)
+            prior_value = merged.get(key)
+            
+            if not has_values(new_value):
+                if key in merged:
+                    inherited.append(key)
+                else:
+                    merged[key] = new_value
+                continue
+            
+            updated.append(key)
+            if isinstance(new_value, dict) and isinstance(prior_value, dict):
+                for sub_key, sub_value in new_value.items():
+                    if has_values(sub_value):
+                        prior_value[sub_key] = sub_value
+            elif isinstance(new_value, list) and isinstance(prior_value, list):
+                merged[key] = self._merge_items(key, prior_value, new_value, unchanged_text)
+            else:
+                merged[key] = new_value
+        
+        return merged, inherited, updated
+    
+    def _merge_items(
+        self,
+        section: str,
+        prior_items: List[Any],
+        new_items: List[Any],
+        unchanged_text: Optional[str] = None
+    ) -> List[Any]:
+        """Replace prior list items by their new version, append new items and drop vanished ones."""
+        items = list(prior_items)
+        extracted = [False] * len(items)
+        for new_item in new_items:
+            if isinstance(new_item, dict):
+                for idx, item in enumerate(items):
+                    if isinstance(item, dict) and same_item(section, item, new_item):
+                        items[idx] = new_item
+                        extracted[idx] = True
+                        break
+                else:
+                    items.append(new_item)
+                    extracted.append(True)
+            elif new_item in items:
+                extracted[items.index(new_item)] = True
+            else:
+                items.append(new_item)
+                extracted.append(True)
+        
+        if unchanged_text is None:
+            return items
+        kept = [
+            item for item, is_new in zip(items, extracted)
+            if is_new or shown_in(section, item, unchanged_text)
+        ]
+        if len(kept) < len(items):
+            logger.info(f"Dropped {len(items) - len(kept)} {section} items no longer in the report")
+        return kept
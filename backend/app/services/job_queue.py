@@ -0,0 +1,276 @@
+"""
+Database-backed queue of extraction jobs.
+Uploads are enqueued as PENDING rows of job_statuses; worker processes (see
+worker.py) claim them, hold a lease renewed by heartbeats while they work,
+and jobs whose lease expires are returned to the queue. On PostgreSQL claims
+use SELECT ... FOR UPDATE SKIP LOCKED; on SQLite they are serialized with a
+file lock, which covers the worker processes of one machine.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.database.crud import JobStatusService
+from app.database.models import JobStatus, JobStatusEnum
+from app.services.cancellation import CancellationToken, JobCancelledError
+
+try:
+    import fcntl
+except ImportError:  # Windows: claims are only serialized within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLostError(JobCancelledError):
+    """Raised when a worker no longer holds the lease of the job it is processing."""
+    pass
+
+
+def default_worker_id() -> str:
+    """Identify this process across machines (host name and PID)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobLease:
+    """
+    Lease of one claimed job, renewed by a heartbeat thread.
+    The same thread polls the job's status so a cancellation requested from
+    any process reaches the job's CancellationToken. The pipeline checks the
+    token between steps and stops once the job is cancelled or the lease is
+    lost, so a job requeued after a stall is never finished twice.
+    """
+    
+    def __init__(self, queue: "JobQueue", job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.token = CancellationToken()
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def __enter__(self) -> "JobLease":
+        self.queue._register(self)
+        self._thread = threading.Thread(
+            target=self._heartbeat_loop, name=f"lease-{self.job_id[:8]}", daemon=True
+        )
+        self._thread.start()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.queue._unregister(self)
+        if not self.lost.is_set():
+            db = SessionLocal()
+            try:
+                JobStatusService.release_lease(db, self.job_id, self.queue.worker_id)
+            finally:
+                db.close()
+        return False
+    
+    def _heartbeat_loop(self):
+        poll_interval = min(self.queue.heartbeat_seconds, self.queue.cancel_poll_seconds)
+        last_heartbeat = time.monotonic()
+        while not self._stop.wait(poll_interval):
+            db = SessionLocal()
+            try:
+                if time.monotonic() - last_heartbeat >= self.queue.heartbeat_seconds:
+                    if JobStatusService.renew_lease(
+                        db, self.job_id, self.queue.worker_id, self.queue.lease_deadline()
+                    ):
+                        last_heartbeat = time.monotonic()
+                        continue
+                    status = JobStatusService.get_status(db, self.job_id)
+                else:
+                    status = JobStatusService.get_status(db, self.job_id)
+                    if status == JobStatusEnum.PROCESSING:
+                        continue
+                
+                if status == JobStatusEnum.COMPLETED:
+                    # Completed by this lease (a stale worker is stopped by its
+                    # own progress and completion updates, which check the lease)
+                    return
+                if status == JobStatusEnum.CANCELLED:
+                    logger.info(f"[{self.job_id}] Cancellation requested")
+                    self.token.cancel()
+                else:
+                    logger.warning(f"[{self.job_id}] Lease lost by worker {self.queue.worker_id}")
+                    self.lost.set()
+                    self.token.cancel(
+                        LeaseLostError(f"Job {self.job_id} is no longer leased by {self.queue.worker_id}")
+                    )
+                return
+            except Exception as e:
+                # A missed heartbeat is retried; the lease only expires after lease_seconds
+                logger.warning(f"[{self.job_id}] Heartbeat failed: {str(e)}")
+            finally:
+                db.close()
+    
+    def check(self):
+        """
+        Raises:
+            JobCancelledError: If the job was cancelled
+            LeaseLostError: If the job was requeued or taken over by another worker
+        """
+        self.token.check()
+
+
+class JobQueue:
+    """Claim, lease and requeue extraction jobs stored in job_statuses."""
+    
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        lease_seconds: Optional[float] = None,
+        heartbeat_seconds: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        lock_path: Optional[str] = None,
+        cancel_poll_seconds: Optional[float] = None
+    ):
+        """
+        Initialize the queue for one worker.
+        
+        Args:
+            worker_id: Identifier recorded on claimed jobs (host:pid if not provided)
+            lease_seconds: Lease duration without heartbeat (uses settings if not provided)
+            heartbeat_seconds: Interval of lease renewals (uses settings if not provided)
+            max_attempts: Expired leases after which a job fails (uses settings if not provided)
+            lock_path: Lock file serializing claims without row locks (uses settings if not provided)
+            cancel_poll_seconds: Interval of cancellation checks of running jobs
+                (uses settings if not provided)
+        """
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+        self.heartbeat_seconds = heartbeat_seconds or settings.JOB_HEARTBEAT_SECONDS
+        self.max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+        self.lock_path = lock_path or settings.JOB_QUEUE_LOCK_FILE
+        self.cancel_poll_seconds = cancel_poll_seconds or settings.JOB_CANCEL_POLL_SECONDS
+        self.uses_row_locks = engine.dialect.name == "postgresql"
+        self._thread_lock = threading.Lock()
+        self._active_leases: Dict[str, JobLease] = {}
+        self._leases_lock = threading.Lock()
+    
+    def lease_deadline(self) -> datetime:
+        """Expiry of a lease taken or renewed now."""
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+    
+    @contextmanager
+    def _claim_lock(self):
+        """Serialize claims where the database cannot skip locked rows."""
+        if self.uses_row_locks:
+            yield
+            return
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def claim(self, db: Session, job_id: Optional[str] = None) -> Optional[JobStatus]:
+        """
+        Claim the oldest pending job, or a specific one.
+        
+        Args:
+            db: Database session
+            job_id: Claim only this job (used by the web process in inline mode)
+        
+        Returns:
+            The claimed job, or None if nothing is pending
+        """
+        with self._claim_lock():
+            job = JobStatusService.claim(db, self.worker_id, self.lease_deadline(), job_id=job_id)
+        if job:
+            logger.info(f"[{job.job_id}] Claimed by worker {self.worker_id} (attempt {job.retry_count + 1})")
+        return job
+    
+    def lease(self, job: JobStatus) -> JobLease:
+        """Heartbeat the lease of a claimed job for the duration of a with block."""
+        return JobLease(self, job.job_id)
+    
+    def _register(self, lease: JobLease):
+        with self._leases_lock:
+            self._active_leases[lease.job_id] = lease
+    
+    def _unregister(self, lease: JobLease):
+        with self._leases_lock:
+            if self._active_leases.get(lease.job_id) is lease:
+                del self._active_leases[lease.job_id]
+    
+    def cancel(self, db: Session, job_id: str) -> bool:
+        """
+        Cancel a pending or running job.
+        A pending job is never claimed; a running job stops at its next
+        checkpoint - immediately if it runs in this process, otherwise once its
+        worker polls the job status.
+        
+        Returns:
+            False if the job had already finished
+        """
+        if not JobStatusService.cancel(db, job_id):
+            return False
+        with self._leases_lock:
+            lease = self._active_leases.get(job_id)
+        if lease:
+            lease.token.cancel()
+        return True
+    
+    def requeue_expired(self, db: Session) -> Tuple[int, int]:
+        """
+        Requeue jobs whose worker stopped renewing its lease.
+        
+        Returns:
+            Tuple of (requeued jobs, failed jobs)
+        """
+        with self._claim_lock():
+            requeued, failed = JobStatusService.requeue_expired(db, datetime.utcnow(), self.max_attempts)
+        if requeued or failed:
+            logger.warning(f"Expired job leases: {requeued} requeued, {failed} failed after {self.max_attempts} attempts")
+        return requeued, failed
+    
+    def stats(self, db: Session) -> Dict[str, Any]:
+        """Queue depth per status and lease settings."""
+        return {
+            "enabled": settings.JOB_QUEUE_ENABLED,
+            "claim_locking": "skip_locked" if self.uses_row_locks else "file_lock",
+            "lease_seconds": self.lease_seconds,
+            "heartbeat_seconds": self.heartbeat_seconds,
+            "max_attempts": self.max_attempts,
+            "active_leases": len(self._active_leases),
+            "jobs": JobStatusService.count_by_status(db)
+        }
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Get the job queue of this process.
+    
+    Returns:
+        Shared JobQueue instance
+    """
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    return _job_queue
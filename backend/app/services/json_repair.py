@@ -0,0 +1,319 @@
+"""
+Local JSON repair for malformed Gemini responses.
+Fixes the common failure modes (truncation at max tokens, trailing commas,
+unescaped quotes, stray markdown) without another round-trip to the API.
+"""
+
+import json
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bare words Gemini occasionally emits instead of JSON literals
+LITERAL_FIXES = {
+    "None": "null",
+    "True": "true",
+    "False": "false",
+    "NaN": "null",
+    "Infinity": "null",
+    "null": "null",
+    "true": "true",
+    "false": "false",
+}
+
+# Maximum number of cut points tried when salvaging a truncated response
+MAX_TRUNCATION_ATTEMPTS = 200
+
+
+class JSONRepairReport:
+    """Summary of what the repair parser changed and salvaged."""
+    
+    def __init__(self, total_chars: int):
+        self.total_chars = total_chars
+        self.kept_chars = 0
+        self.truncated = False
+        self.fixes: Dict[str, int] = {}
+    
+    def add_fix(self, fix: str, count: int = 1):
+        """Record that a fix was applied `count` times."""
+        self.fixes[fix] = self.fixes.get(fix, 0) + count
+    
+    @property
+    def dropped_chars(self) -> int:
+        """Number of characters discarded from the end of the response."""
+        return max(0, self.total_chars - self.kept_chars) if self.truncated else 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form of the report (used for logs)."""
+        return {
+            "total_chars": self.total_chars,
+            "kept_chars": self.kept_chars,
+            "dropped_chars": self.dropped_chars,
+            "truncated": self.truncated,
+            "fixes": dict(self.fixes),
+        }
+    
+    def summary(self) -> str:
+        """Human readable one-line summary."""
+        fixes = ", ".join(f"{name} x{count}" for name, count in self.fixes.items()) or "none"
+        text = f"fixes: {fixes}"
+        if self.truncated:
+            text += f"; truncated response, kept {self.kept_chars}/{self.total_chars} chars"
+        return text
+
+
+def strip_markdown(text: str) -> Tuple[str, bool]:
+    """
+    Remove markdown code fences around a JSON payload.
+    Handles a missing closing fence (common when the response is truncated).
+    
+    Args:
+        text: Raw response text
+    
+    Returns:
+        Tuple of (text without fences, whether a fence was removed)
+    """
+    cleaned = text.strip()
+    fence = cleaned.find("```")
+    if fence == -1:
+        return cleaned, False
+    
+    # Skip the fence and an optional language tag on the same line
+    start = fence + 3
+    line_end = cleaned.find("\n", start)
+    if line_end != -1 and cleaned[start:line_end].strip().isalpha():
+        start = line_end + 1
+    
+    end = cleaned.rfind("```")
+    if end < start:
+        end = len(cleaned)
+    
+    return cleaned[start:end].strip(), True
+
+
+def _next_non_space(text: str, pos: int) -> Tuple[int, str]:
+    """Return (index, char) of the next non-whitespace character at or after pos."""
+    length = len(text)
+    while pos < length and text[pos] in " \t\r\n":
+        pos += 1
+    return pos, (text[pos] if pos < length else "")
+
+
+def _scan(text: str, report: JSONRepairReport):
+    """
+    Single pass over the text that fixes syntax errors and records cut points.
+    
+    Args:
+        text: JSON-like text starting at the first '{'
+        report: Report that collects applied fixes
+    
+    Returns:
+        Tuple of (cleaned text, open bracket stack, still inside a string,
+        number of characters of text consumed, list of (cleaned length,
+        stack snapshot, text length) cut points after complete elements)
+    """
+    out: List[str] = []
+    size = 0
+    stack: List[str] = []
+    cut_points: List[Tuple[int, Tuple[str, ...], int]] = []
+    in_string = False
+    escape = False
+    length = len(text)
+    i = 0
+    
+    def emit(value: str):
+        nonlocal size
+        out.append(value)
+        size += len(value)
+    
+    while i < length:
+        ch = text[i]
+        
+        if in_string:
+            if escape:
+                emit(ch)
+                escape = False
+            elif ch == "\\":
+                emit(ch)
+                escape = True
+            elif ch == '"':
+                nxt_pos, nxt = _next_non_space(text, i + 1)
+                if nxt in (",", ":", "}", "]", ""):
+                    emit(ch)
+                    in_string = False
+                elif nxt == '"' and "\n" in text[i + 1:nxt_pos]:
+                    # Closing quote followed by the next element on a new line: missing comma
+                    emit(ch)
+                    in_string = False
+                    cut_points.append((size, tuple(stack), i + 1))
+                    emit(",")
+                    report.add_fix("inserted missing comma")
+                else:
+                    emit('\\"')
+                    report.add_fix("escaped inner quote")
+            elif ch == "\n":
+                emit("\\n")
+                report.add_fix("escaped control character")
+            elif ch == "\t":
+                emit("\\t")
+                report.add_fix("escaped control character")
+            elif ch == "\r":
+                report.add_fix("escaped control character")
+            else:
+                emit(ch)
+            i += 1
+            continue
+        
+        if ch == '"':
+            in_string = True
+            emit(ch)
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            emit(ch)
+        elif ch in "}]":
+            if not stack:
+                # Stray closer after the root object - everything after is junk
+                break
+            removed = _strip_trailing_comma(out)
+            if removed:
+                size -= removed
+                report.add_fix("removed trailing comma")
+            expected = stack.pop()
+            if ch != expected:
+                report.add_fix("fixed mismatched bracket")
+            emit(expected)
+            cut_points.append((size, tuple(stack), i + 1))
+            if not stack:
+                i += 1
+                break
+        elif ch == ",":
+            cut_points.append((size, tuple(stack), i))
+            emit(ch)
+        elif ch.isdigit() or ch == "-":
+            # Consume the whole number so exponents are not mistaken for bare words
+            j = i + 1
+            while j < length and (text[j].isdigit() or text[j] in ".eE+-"):
+                j += 1
+            emit(text[i:j])
+            i = j
+            continue
+        elif ch.isalpha():
+            j = i
+            while j < length and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            replacement = LITERAL_FIXES.get(word)
+            if replacement is None:
+                # Unquoted key or value - quote it
+                replacement = json.dumps(word)
+                report.add_fix("quoted bare word")
+            elif replacement != word:
+                report.add_fix("replaced non-JSON literal")
+            emit(replacement)
+            i = j
+            continue
+        elif ch == "/" and i + 1 < length and text[i + 1] == "/":
+            # Line comment
+            j = text.find("\n", i)
+            i = length if j == -1 else j
+            report.add_fix("removed comment")
+            continue
+        else:
+            emit(ch)
+        i += 1
+    
+    if i < length and text[i:].strip():
+        report.add_fix("removed trailing text")
+    
+    return "".join(out), stack, in_string, i, cut_points
+
+
+def _strip_trailing_comma(out: List[str]) -> int:
+    """
+    Remove a dangling comma (and whitespace after it) from the output buffer.
+    
+    Returns:
+        Number of characters removed (0 if there was no dangling comma)
+    """
+    idx = len(out) - 1
+    while idx >= 0 and out[idx] in (" ", "\t", "\r", "\n"):
+        idx -= 1
+    if idx >= 0 and out[idx] == ",":
+        removed = sum(len(piece) for piece in out[idx:])
+        del out[idx:]
+        return removed
+    return 0
+
+
+def _close(prefix: str, stack: Tuple[str, ...]) -> str:
+    """Close every open bracket in the stack after dropping a dangling comma."""
+    prefix = prefix.rstrip()
+    if prefix.endswith(","):
+        prefix = prefix[:-1]
+    return prefix + "".join(reversed(stack))
+
+
+def repair_json(response_text: str) -> Tuple[Optional[Dict[str, Any]], JSONRepairReport]:
+    """
+    Repair and parse a malformed JSON object locally.
+    
+    Steps:
+    1. Strip markdown fences and any text before the first '{'
+    2. Fix trailing commas, unescaped quotes, raw control characters,
+       Python literals and missing commas between elements
+    3. If the response was truncated, drop the trailing partial element
+       and close all open brackets; only whole elements (followed by a
+       comma or a closing bracket) are kept, so a number or literal that
+       was cut off mid-way is never returned
+    
+    Args:
+        response_text: Raw (possibly broken) response text
+    
+    Returns:
+        Tuple of (parsed dictionary or None if unrepairable, repair report)
+    """
+    report = JSONRepairReport(total_chars=len(response_text))
+    
+    text, had_fence = strip_markdown(response_text)
+    if had_fence:
+        report.add_fix("stripped markdown fence")
+    
+    start_idx = text.find("{")
+    if start_idx == -1:
+        return None, report
+    if start_idx > 0:
+        report.add_fix("removed leading text")
+    # Position of the payload in the response, for kept_chars
+    offset = response_text.find(text) + start_idx
+    text = text[start_idx:]
+    
+    cleaned, stack, in_string, consumed, cut_points = _scan(text, report)
+    
+    if not stack and not in_string:
+        try:
+            data = json.loads(cleaned)
+            report.kept_chars = offset + consumed
+            return (data if isinstance(data, dict) else None), report
+        except json.JSONDecodeError:
+            pass
+    
+    # Truncated (or still broken): walk back over the ends of complete elements until it parses
+    report.truncated = bool(stack) or in_string
+    for cut, snapshot, source_cut in list(reversed(cut_points))[:MAX_TRUNCATION_ATTEMPTS]:
+        if not snapshot:
+            continue
+        candidate = _close(cleaned[:cut], snapshot)
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            report.kept_chars = offset + source_cut
+            if report.truncated:
+                report.add_fix("closed open bracket", len(snapshot))
+            else:
+                report.add_fix("dropped unparseable element")
+            return data, report
+    
+    return None, report
@@ -0,0 +1,301 @@
+"""
+Application-scoped pool of Gemini API clients.
+Clients are created once (at startup) with their own client options instead
+of the process-global genai.configure(), so their connections are kept alive
+and reused across jobs. Each API call leases a client for its duration.
+"""
+
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+from app.config import settings
+from app.services.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+# Longest single wait for a free client, so cancelled jobs stop waiting promptly
+ACQUIRE_WAIT_SLICE = 1.0
+
+
+class ClientPoolTimeoutError(Exception):
+    """Raised when no pooled client becomes available in time."""
+    pass
+
+
+class _PooledClient:
+    """A GenerativeModel bound to its own long-lived service client."""
+    
+    def __init__(self, slot: int, model, client):
+        self.slot = slot
+        self.model = model
+        self.client = client
+        self.created_at = time.time()
+        self.calls = 0
+        self.ready = False
+    
+    def close(self):
+        try:
+            self.client.transport.close()
+        except Exception:
+            pass
+
+
+class _DeadlineClient:
+    """
+    Service client whose generate_content calls have a deadline.
+    GenerativeModel.generate_content() does not take a timeout, so it is
+    applied here, on the client the model calls.
+    """
+    
+    def __init__(self, client, timeout: float):
+        self._client = client
+        self._timeout = timeout
+    
+    def generate_content(self, request=None, **kwargs):
+        kwargs.setdefault("timeout", self._timeout)
+        return self._client.generate_content(request, **kwargs)
+    
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class GeminiClientPool:
+    """Fixed-size pool of Gemini clients shared by all extraction jobs."""
+    
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        api_key: Optional[str] = None,
+        model_name: Optional[str] = None,
+        transport: Optional[str] = None,
+        call_timeout: Optional[float] = None
+    ):
+        """
+        Initialize the pool. Clients are created lazily or by warm_up().
+        
+        Args:
+            size: Number of clients (uses settings if not provided)
+            api_key: Gemini API key (uses settings if not provided)
+            model_name: Gemini model name (uses settings if not provided)
+            transport: "grpc" or "rest" (library default if not provided)
+            call_timeout: Deadline of each API call in seconds, after which it
+                fails with DeadlineExceeded and its client is replaced (uses
+                settings if not provided; 0 for none)
+        """
+        self.size = max(1, size or settings.GEMINI_CLIENT_POOL_SIZE)
+        self.api_key = api_key or settings.GEMINI_API_KEY
+        self.model_name = model_name or settings.GEMINI_MODEL
+        self.transport = transport or settings.GEMINI_TRANSPORT or None
+        self.call_timeout = settings.GEMINI_CALL_TIMEOUT_SECONDS if call_timeout is None else call_timeout
+        
+        self._available: "queue.LifoQueue[_PooledClient]" = queue.LifoQueue()
+        self._clients: List[_PooledClient] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        
+        # Statistics
+        self.total_leases = 0
+        self.total_wait_seconds = 0.0
+        self.recycled_clients = 0
+        self.last_error: Optional[str] = None
+        self.warmed_up_at: Optional[float] = None
+    
+    def _create_client(self, slot: int) -> _PooledClient:
+        """Create a service client and a model bound to it."""
+        if not self.api_key:
+            raise ValueError("Gemini API key is required")
+        
+        # The Google client libraries are imported on first use to keep start-up fast
+        import google.ai.generativelanguage as glm
+        import google.generativeai as genai
+        from google.api_core import client_options as client_options_lib
+        from google.api_core import gapic_v1
+        
+        client_config = {
+            "client_options": client_options_lib.ClientOptions(api_key=self.api_key),
+            "client_info": gapic_v1.client_info.ClientInfo(user_agent=f"genai-py/{genai.__version__}")
+        }
+        if self.transport:
+            client_config["transport"] = self.transport
+        client = glm.GenerativeServiceClient(**client_config)
+        
+        model = genai.GenerativeModel(self.model_name)
+        # GenerativeModel otherwise picks the client configured by genai.configure()
+        model._client = _DeadlineClient(client, self.call_timeout) if self.call_timeout > 0 else client
+        return _PooledClient(slot, model, client)
+    
+    def _fill(self):
+        """Create the clients of every empty slot."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Client pool is closed")
+            while len(self._clients) < self.size:
+                pooled = self._create_client(len(self._clients))
+                self._clients.append(pooled)
+                self._available.put(pooled)
+    
+    def warm_up(self, timeout: Optional[float] = None) -> int:
+        """
+        Create all clients and open their connections ahead of the first job.
+        gRPC channels are connected (including the TLS handshake); REST clients
+        connect on their first request.
+        
+        Args:
+            timeout: Seconds to wait for each connection (uses settings if not provided)
+        
+        Returns:
+            Number of clients whose connection is ready
+        """
+        timeout = settings.GEMINI_WARMUP_TIMEOUT if timeout is None else timeout
+        try:
+            self._fill()
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {str(e)}"
+            logger.warning(f"Gemini client pool warm-up failed: {self.last_error}")
+            return 0
+        
+        ready = 0
+        for pooled in list(self._clients):
+            if self._connect(pooled, timeout):
+                ready += 1
+        self.warmed_up_at = time.time()
+        logger.info(f"Gemini client pool warmed up: {ready}/{self.size} clients connected")
+        return ready
+    
+    def _connect(self, pooled: _PooledClient, timeout: float) -> bool:
+        """Open a client's gRPC channel; REST clients count as ready."""
+        channel = getattr(pooled.client.transport, "grpc_channel", None)
+        if channel is None:
+            pooled.ready = True
+            return True
+        
+        import grpc
+        try:
+            grpc.channel_ready_future(channel).result(timeout=timeout)
+            pooled.ready = True
+        except grpc.FutureTimeoutError:
+            pooled.ready = False
+            self.last_error = f"Connection to Gemini not ready after {timeout}s"
+        return pooled.ready
+    
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None, cancel_token: Optional[CancellationToken] = None):
+        """
+        Lease a model for one API call.
+        A client whose call fails with a connection error is replaced.
+        
+        Args:
+            timeout: Seconds to wait for a free client (uses settings if not provided)
+            cancel_token: Stop waiting if the job is cancelled
+        
+        Yields:
+            GenerativeModel bound to a pooled client
+        
+        Raises:
+            ClientPoolTimeoutError: If no client becomes available in time
+            JobCancelledError: If the job is cancelled while waiting
+        """
+        if len(self._clients) < self.size:
+            self._fill()
+        
+        timeout = settings.GEMINI_CLIENT_ACQUIRE_TIMEOUT if timeout is None else timeout
+        start = time.time()
+        pooled = None
+        while pooled is None:
+            if cancel_token:
+                cancel_token.check()
+            remaining = timeout - (time.time() - start)
+            if remaining <= 0:
+                raise ClientPoolTimeoutError(f"No Gemini client available after {timeout}s")
+            try:
+                pooled = self._available.get(timeout=min(remaining, ACQUIRE_WAIT_SLICE))
+            except queue.Empty:
+                pass
+        
+        with self._lock:
+            self.total_leases += 1
+            self.total_wait_seconds += time.time() - start
+        
+        from google.api_core import exceptions as google_exceptions
+        
+        try:
+            yield pooled.model
+            pooled.calls += 1
+            pooled.ready = True
+        except (google_exceptions.ServiceUnavailable, google_exceptions.DeadlineExceeded) as e:
+            self.last_error = f"{type(e).__name__}: {str(e)}"
+            pooled = self._recycle(pooled)
+            raise
+        finally:
+            self._available.put(pooled)
+    
+    def _recycle(self, pooled: _PooledClient) -> _PooledClient:
+        """Replace a client after a connection error."""
+        logger.warning(f"Recreating Gemini client {pooled.slot} after a connection error")
+        pooled.close()
+        replacement = self._create_client(pooled.slot)
+        with self._lock:
+            self._clients[pooled.slot] = replacement
+            self.recycled_clients += 1
+        return replacement
+    
+    def close(self):
+        """Close every client's connection."""
+        with self._lock:
+            self._closed = True
+            clients, self._clients = self._clients, []
+        for pooled in clients:
+            pooled.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, usage counters and client health."""
+        clients = list(self._clients)
+        return {
+            "configured": bool(self.api_key),
+            "model": self.model_name,
+            "transport": self.transport or "grpc",
+            "call_timeout_seconds": self.call_timeout or None,
+            "size": self.size,
+            "created": len(clients),
+            "available": self._available.qsize(),
+            "in_use": len(clients) - self._available.qsize(),
+            "ready": sum(1 for pooled in clients if pooled.ready),
+            "warmed_up": self.warmed_up_at is not None,
+            "total_leases": self.total_leases,
+            "total_wait_seconds": round(self.total_wait_seconds, 2),
+            "recycled_clients": self.recycled_clients,
+            "last_error": self.last_error
+        }
+
+
+_client_pool: Optional[GeminiClientPool] = None
+_client_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> GeminiClientPool:
+    """
+    Get the application-wide Gemini client pool.
+    Also usable as a FastAPI dependency.
+    
+    Returns:
+        Shared GeminiClientPool instance
+    """
+    global _client_pool
+    if _client_pool is None:
+        with _client_pool_lock:
+            if _client_pool is None:
+                _client_pool = GeminiClientPool()
+    return _client_pool
+
+
+def close_client_pool():
+    """Close the application-wide pool (on shutdown)."""
+    global _client_pool
+    with _client_pool_lock:
+        if _client_pool is not None:
+            _client_pool.close()
+            _client_pool = None
@@ -0,0 +1,123 @@
+"""
+Metadata for generated output files.
+Each workbook gets a small sidecar file holding its SHA-256, size and
+modification time, written when the workbook is generated. Download and
+preview endpoints use it as a strong ETag without re-reading the workbook.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from app.services.page_cache import compute_file_hash
+
+logger = logging.getLogger(__name__)
+
+METADATA_SUFFIX = ".meta.json"
+
+# Number of output files whose metadata is kept in memory
+MAX_CACHED_ENTRIES = 1024
+
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def metadata_path(file_path: str) -> str:
+    """Path of the sidecar metadata file of an output file."""
+    return file_path + METADATA_SUFFIX
+
+
+def _matches(metadata: Optional[Dict[str, Any]], stat: os.stat_result) -> bool:
+    """Whether metadata still describes the file on disk."""
+    return (
+        metadata is not None
+        and metadata.get("size") == stat.st_size
+        and metadata.get("mtime_ns") == stat.st_mtime_ns
+    )
+
+
+def _remember(file_path: str, metadata: Dict[str, Any]):
+    with _cache_lock:
+        _cache[file_path] = metadata
+        _cache.move_to_end(file_path)
+        while len(_cache) > MAX_CACHED_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def record_output_file(file_path: str) -> Dict[str, Any]:
+    """
+    Hash a freshly written output file and store its metadata sidecar.
+    
+    Args:
+        file_path: Path to the output file
+    
+    Returns:
+        Metadata with sha256, size, mtime and mtime_ns
+    """
+    stat = os.stat(file_path)
+    metadata = {
+        "sha256": compute_file_hash(file_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "mtime_ns": stat.st_mtime_ns
+    }
+    
+    sidecar = metadata_path(file_path)
+    tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(metadata, handle)
+        os.replace(tmp_path, sidecar)
+    except OSError as e:
+        logger.warning(f"Failed to write output metadata for {file_path}: {str(e)}")
+    
+    _remember(file_path, metadata)
+    return metadata
+
+
+def get_output_metadata(file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the metadata of an output file.
+    Served from memory while the file is unchanged (a single stat call);
+    falls back to the sidecar, and re-hashes files written without one.
+    
+    Args:
+        file_path: Path to the output file
+    
+    Returns:
+        Metadata dictionary, or None if the file does not exist
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    
+    with _cache_lock:
+        metadata = _cache.get(file_path)
+    if _matches(metadata, stat):
+        return metadata
+    
+    try:
+        with open(metadata_path(file_path), "r", encoding="utf-8") as handle:
+            metadata = json.load(handle)
+    except (OSError, json.JSONDecodeError):
+        metadata = None
+    
+    if _matches(metadata, stat):
+        _remember(file_path, metadata)
+        return metadata
+    
+    return record_output_file(file_path)
+
+
+def remove_output_metadata(file_path: str):
+    """Delete the metadata sidecar of an output file."""
+    with _cache_lock:
+        _cache.pop(file_path, None)
+    try:
+        os.remove(metadata_path(file_path))
+    except OSError:
+        pass
@@ -0,0 +1,226 @@
+"""
+Persistent page-level cache for PDF extraction output.
+Stores the text and tables of each page on disk, keyed by file hash,
+page number and extractor version, with size-bounded LRU eviction.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Dict, Any, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Eviction trims the cache down to this fraction of the limit
+EVICTION_TARGET_RATIO = 0.9
+
+
+def compute_file_hash(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 hash of a file.
+    
+    Args:
+        file_path: Path to the file
+        block_size: Read block size in bytes
+    
+    Returns:
+        Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as handle:
+        for block in iter(lambda: handle.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PageCache:
+    """On-disk cache of per-page extraction output."""
+    
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Initialize the page cache.
+        
+        Args:
+            cache_dir: Root directory of the cache (uses settings if not provided)
+            max_bytes: Maximum total size of cached files (0 disables the cache)
+        """
+        self.cache_dir = cache_dir or settings.PAGE_CACHE_DIR
+        self.max_bytes = settings.PAGE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache is active."""
+        return self.max_bytes > 0
+    
+    def _document_dir(self, file_hash: str, version: str) -> str:
+        return os.path.join(self.cache_dir, version, file_hash[:2], file_hash)
+    
+    def _page_path(self, file_hash: str, version: str, page_num: int) -> str:
+        return os.path.join(self._document_dir(file_hash, version), f"page_{page_num}.json")
+    
+    def _manifest_path(self, file_hash: str, version: str) -> str:
+        return os.path.join(self._document_dir(file_hash, version), "manifest.json")
+    
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        """Read a cache entry and mark it as recently used."""
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+            os.utime(path, None)
+            return data
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Discarding unreadable page cache entry {path}: {str(e)}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+    
+    def _write(self, path: str, data: Dict[str, Any]):
+        """Atomically write a cache entry and enforce the size limit."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle)
+        size = os.path.getsize(tmp_path)
+        
+        with self._lock:
+            # An overwritten entry no longer counts towards the total
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += size - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+    
+    def get_page(self, file_hash: str, version: str, page_num: int) -> Optional[Dict[str, Any]]:
+        """
+        Get cached output for a page.
+        
+        Args:
+            file_hash: SHA-256 of the PDF file
+            version: Extractor version
+            page_num: 1-based page number
+        
+        Returns:
+            Cached page data (text and tables) or None
+        """
+        if not self.enabled:
+            return None
+        return self._read(self._page_path(file_hash, version, page_num))
+    
+    def put_page(self, file_hash: str, version: str, page_num: int, page_data: Dict[str, Any]):
+        """Store the output for a page."""
+        if not self.enabled:
+            return
+        try:
+            self._write(self._page_path(file_hash, version, page_num), page_data)
+        except OSError as e:
+            logger.warning(f"Failed to write page cache entry: {str(e)}")
+    
+    def get_manifest(self, file_hash: str, version: str) -> Optional[Dict[str, Any]]:
+        """Get the document manifest (page count) for a cached file."""
+        if not self.enabled:
+            return None
+        return self._read(self._manifest_path(file_hash, version))
+    
+    def put_manifest(self, file_hash: str, version: str, manifest: Dict[str, Any]):
+        """Store the document manifest once every page has been cached."""
+        if not self.enabled:
+            return
+        try:
+            self._write(self._manifest_path(file_hash, version), manifest)
+        except OSError as e:
+            logger.warning(f"Failed to write page cache manifest: {str(e)}")
+    
+    def _scan_size(self) -> int:
+        """Total size of all files in the cache directory."""
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+    
+    def _evict(self):
+        """Delete least recently used entries until the cache is under its target size."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * EVICTION_TARGET_RATIO)
+        evicted = 0
+        
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                evicted += 1
+                # Drop the manifest so an incomplete document is re-validated
+                manifest = os.path.join(os.path.dirname(path), "manifest.json")
+                if os.path.exists(manifest) and manifest != path:
+                    total -= os.path.getsize(manifest)
+                    os.remove(manifest)
+            except OSError:
+                pass
+        
+        self._total_bytes = total
+        if evicted:
+            logger.info(f"Page cache eviction removed {evicted} entries ({total} bytes remaining)")
+    
+    def clear(self):
+        """Remove every cache entry."""
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            self._total_bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and limits."""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            return {
+                "enabled": self.enabled,
+                "cache_dir": self.cache_dir,
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+_page_cache: Optional[PageCache] = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache:
+    """Get the process-wide page cache."""
+    global _page_cache
+    if _page_cache is None:
+        with _page_cache_lock:
+            if _page_cache is None:
+                _page_cache = PageCache()
+    return _page_cache
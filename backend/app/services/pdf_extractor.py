@@ -3,71 +3,482 @@ PDF text extraction service using pdfplumber.
 Handles PDF parsing and text extraction with error handling.
 """
 
-import pdfplumber
+import hashlib
+import itertools
+import json
 import logging
-from typing import Optional
+from bisect import bisect_left
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+
+from app.config import settings
+from app.services.chunk_planner import ChunkPlanner
+from app.services.cancellation import CancellationToken, JobCancelledError
+from app.services.page_cache import PageCache, get_page_cache, compute_file_hash
+from app.services.text_normalizer import BoilerplateRemover
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the per-page output changes so stale cache entries are ignored
+EXTRACTOR_VERSION = "1"
+
 
 class PDFExtractor:
     """Extract text content from PDF files."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        page_cache: Optional[PageCache] = None,
+        remove_boilerplate: Optional[bool] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ):
         self.extracted_text = ""
+        self.cancel_token = cancel_token
+        self.page_cache = page_cache or get_page_cache()
+        self.remove_boilerplate = (
+            settings.BOILERPLATE_REMOVAL_ENABLED if remove_boilerplate is None else remove_boilerplate
+        )
+        self.file_hash: Optional[str] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.normalization_stats: Optional[Dict[str, Any]] = None
+        self.pages: List[Tuple[int, Dict[str, Any]]] = []
+        self.extracted_chars = 0
+        # Set by scan_pdf(), which keeps no page in memory
+        self.streaming = False
+        self._stream_path: Optional[str] = None
+        self._stream_remover: Optional[BoilerplateRemover] = None
+        self._page_hashes: Optional[List[str]] = None
     
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """
         Extract all text content from a PDF file.
+        Pages already extracted in an earlier run are read from the page cache.
+        Unless disabled, page text is normalized before rendering: whitespace is
+        collapsed and boilerplate repeated across pages is kept only once
+        (tables are left untouched). See normalization_stats for the savings.
         
         Args:
             pdf_path: Path to the PDF file
-            
+        
         Returns:
             Extracted text as a string
-            
+        
         Raises:
+            JobCancelledError: If the job is cancelled (checked between pages)
             Exception: If PDF extraction fails
         """
         try:
-            extracted_text = []
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.file_hash = compute_file_hash(pdf_path)
+            self.normalization_stats = None
+            self.streaming = False
+            self._page_hashes = None
             
-            with pdfplumber.open(pdf_path) as pdf:
-                logger.info(f"Processing PDF with {len(pdf.pages)} pages")
-                
-                for page_num, page in enumerate(pdf.pages, start=1):
-                    logger.debug(f"Extracting text from page {page_num}")
-                    
-                    # Extract text from the page
-                    text = page.extract_text()
-                    
-                    if text:
-                        extracted_text.append(f"\n--- Page {page_num} ---\n")
-                        extracted_text.append(text)
-                    
-                    # Also extract tables if present
-                    tables = page.extract_tables()
-                    if tables:
-                        for table_num, table in enumerate(tables, start=1):
-                            extracted_text.append(f"\n[Table {table_num} on Page {page_num}]\n")
-                            # Convert table to text representation
-                            for row in table:
-                                if row:
-                                    row_text = " | ".join([str(cell) if cell else "" for cell in row])
-                                    extracted_text.append(row_text + "\n")
+            pages = list(self._iter_pages(pdf_path))
+            if self.remove_boilerplate:
+                texts, self.normalization_stats = BoilerplateRemover().normalize_pages(
+                    [page_data.get("text") or "" for _, page_data in pages]
+                )
+                pages = [
+                    (page_num, dict(page_data, text=text))
+                    for (page_num, page_data), text in zip(pages, texts)
+                ]
             
-            self.extracted_text = "".join(extracted_text)
+            self.pages = pages
+            self.extracted_text = self.render_pages()
+            self.extracted_chars = len(self.extracted_text)
             
             if not self.extracted_text.strip():
                 raise Exception("No text could be extracted from the PDF")
             
-            logger.info(f"Successfully extracted {len(self.extracted_text)} characters from PDF")
+            logger.info(
+                f"Successfully extracted {len(self.extracted_text)} characters from PDF "
+                f"({self.cache_hits} pages from cache, {self.cache_misses} parsed)"
+            )
             return self.extracted_text
+        
+        except JobCancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error extracting text from PDF: {str(e)}")
+            raise Exception(f"Failed to extract text from PDF: {str(e)}")
+    
+    def page_count(self, pdf_path: str) -> int:
+        """
+        Count the pages of a PDF without extracting them.
+        
+        Args:
+            pdf_path: Path to the PDF file
+        
+        Returns:
+            Number of pages (from the page cache manifest when available)
+        """
+        manifest = self.page_cache.get_manifest(compute_file_hash(pdf_path), EXTRACTOR_VERSION)
+        if manifest:
+            return manifest["page_count"]
+        
+        import pdfplumber
+        
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+    
+    def scan_pdf(self, pdf_path: str) -> int:
+        """
+        Extract a PDF in streaming mode, keeping no page in memory.
+        Pages are parsed one at a time into the page cache while boilerplate is
+        counted; a second pass reads them back to compute page hashes, the
+        normalization stats and the rendered size. The text itself is produced
+        by iter_chunks(), so extracted_text stays empty and render_pages() is
+        not available. Memory stays flat in the number of pages, at the cost
+        of re-parsing the PDF if the page cache is disabled or too small.
+        
+        Args:
+            pdf_path: Path to the PDF file
+        
+        Returns:
+            Number of characters of the rendered text
+        
+        Raises:
+            JobCancelledError: If the job is cancelled (checked between pages)
+            Exception: If PDF extraction fails
+        """
+        try:
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.file_hash = compute_file_hash(pdf_path)
+            self.normalization_stats = None
+            self.pages = []
+            self.extracted_text = ""
+            self.streaming = True
+            self._stream_path = pdf_path
+            self._stream_remover = None
+            
+            first_pass_counts = None
+            if self.remove_boilerplate:
+                rescan_counts = []
+                
+                def page_texts():
+                    return (page_data.get("text") or "" for _, page_data in self._iter_pages(pdf_path))
+                
+                def rescan():
+                    rescan_counts.append((self.cache_hits, self.cache_misses))
+                    return page_texts()
+                
+                self._stream_remover = BoilerplateRemover()
+                self._stream_remover.scan(page_texts(), rescan=rescan)
+                first_pass_counts = rescan_counts[0] if rescan_counts else (self.cache_hits, self.cache_misses)
             
+            page_hashes = []
+            extracted_chars = 0
+            for page_num, page_data in self._iter_stream_pages():
+                page_hashes.append(self._page_hash(page_data))
+                extracted_chars += sum(len(fragment) for fragment in self._render_page(page_num, page_data))
+            
+            if self._stream_remover:
+                self.normalization_stats = dict(self._stream_remover.stats)
+            if first_pass_counts:
+                # The pages were parsed by the first pass; later passes only read them back
+                self.cache_hits, self.cache_misses = first_pass_counts
+            self._page_hashes = page_hashes
+            self.extracted_chars = extracted_chars
+            
+            if not extracted_chars:
+                raise Exception("No text could be extracted from the PDF")
+            
+            logger.info(
+                f"Successfully scanned {len(page_hashes)} pages ({extracted_chars} characters) "
+                f"for streaming ({self.cache_hits} pages from cache, {self.cache_misses} parsed)"
+            )
+            return extracted_chars
+        
+        except JobCancelledError:
+            raise
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
     
+    def _iter_stream_pages(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield the normalized pages of the document given to scan_pdf(), one at a time."""
+        pages = self._iter_pages(self._stream_path)
+        if not self._stream_remover:
+            yield from pages
+            return
+        
+        pages, texts = itertools.tee(pages)
+        normalized = self._stream_remover.iter_normalized(page_data.get("text") or "" for _, page_data in texts)
+        for (page_num, page_data), text in zip(pages, normalized):
+            yield page_num, dict(page_data, text=text)
+        # Let the normalizer finish its stats
+        next(normalized, None)
+    
+    def iter_chunks(self, max_chars: Optional[int] = None) -> Iterator[str]:
+        """
+        Render the document given to scan_pdf() into chunks for Gemini.
+        Pages are read back one at a time and grouped at page boundaries, so
+        only the chunk being built is held in memory.
+        
+        Args:
+            max_chars: Maximum chunk size (uses settings if not provided)
+        
+        Yields:
+            Rendered text of consecutive pages
+        """
+        if not self.streaming:
+            raise RuntimeError("iter_chunks() requires a document extracted with scan_pdf()")
+        
+        cache_hits, cache_misses = self.cache_hits, self.cache_misses
+        rendered = (
+            "".join(self._render_page(page_num, page_data))
+            for page_num, page_data in self._iter_stream_pages()
+        )
+        try:
+            yield from ChunkPlanner.plan(rendered, max_chars or settings.PDF_STREAMING_CHUNK_CHARS)
+        finally:
+            # Keep reporting the pass of scan_pdf() that parsed the pages
+            self.cache_hits, self.cache_misses = cache_hits, cache_misses
+    
+    def iter_page_texts(self) -> Iterator[Tuple[int, str]]:
+        """
+        Yield (page_num, text) for every extracted page, after normalization.
+        Documents extracted with scan_pdf() are read back one page at a time.
+        """
+        if not self.streaming:
+            for page_num, page_data in self.pages:
+                yield page_num, page_data.get("text") or ""
+            return
+        
+        cache_hits, cache_misses = self.cache_hits, self.cache_misses
+        try:
+            for page_num, page_data in self._iter_stream_pages():
+                yield page_num, page_data.get("text") or ""
+        finally:
+            self.cache_hits, self.cache_misses = cache_hits, cache_misses
+    
+    def _iter_pages(self, pdf_path: str):
+        """
+        Yield (page_num, page_data) for every page, using the cache when possible.
+        Pages are yielded as they are read, so only one is held at a time. The
+        PDF is only opened if a page is missing from the cache, and then only
+        the remaining pages are visited.
+        
+        Args:
+            pdf_path: Path to the PDF file
+        """
+        next_page = 1
+        manifest = self.page_cache.get_manifest(self.file_hash, EXTRACTOR_VERSION)
+        if manifest:
+            while next_page <= manifest["page_count"]:
+                if self.cancel_token:
+                    self.cancel_token.check()
+                page_data = self.page_cache.get_page(self.file_hash, EXTRACTOR_VERSION, next_page)
+                if page_data is None:
+                    break
+                self.cache_hits += 1
+                yield next_page, page_data
+                next_page += 1
+            else:
+                logger.info(f"All {manifest['page_count']} pages found in page cache")
+                return
+        
+        # Imported on first use to keep application start-up fast
+        import pdfplumber
+        
+        with pdfplumber.open(pdf_path) as pdf:
+            page_count = len(pdf.pages)
+            logger.info(f"Processing PDF with {page_count} pages")
+            
+            for page_num, page in enumerate(pdf.pages[next_page - 1:], start=next_page):
+                if self.cancel_token:
+                    self.cancel_token.check()
+                page_data = self.page_cache.get_page(self.file_hash, EXTRACTOR_VERSION, page_num)
+                if page_data is not None:
+                    self.cache_hits += 1
+                else:
+                    logger.debug(f"Extracting text from page {page_num}")
+                    page_data = self._extract_page(page)
+                    self.page_cache.put_page(self.file_hash, EXTRACTOR_VERSION, page_num, page_data)
+                    self.cache_misses += 1
+                # Release the parsed layout and objects of this page
+                page.close()
+                yield page_num, page_data
+        
+        self.page_cache.put_manifest(self.file_hash, EXTRACTOR_VERSION, {"page_count": page_count})
+    
+    def _extract_page(self, page) -> Dict[str, Any]:
+        """
+        Extract text and tables from a single pdfplumber page in one pass.
+        The page layout is parsed once; the text rendering, table detection
+        and table cell text all read the same chars and edges. Output is
+        identical to page.extract_text() plus page.extract_tables().
+        
+        Args:
+            page: pdfplumber page object
+        
+        Returns:
+            Dictionary with the page text and table rows
+        """
+        from pdfplumber import utils
+        from pdfplumber.table import TableFinder, TableSettings
+        
+        chars = page.chars
+        text = utils.extract_text(
+            chars,
+            x_shift=page.bbox[0],
+            y_shift=page.bbox[1],
+            layout_width=page.width,
+            layout_height=page.height
+        )
+        
+        tables = []
+        # The default "lines" strategy can only find tables on pages with ruling edges
+        if page.edges:
+            table_settings = TableSettings.resolve(None)
+            found = TableFinder(page, table_settings).tables
+            if found:
+                char_index = self._build_char_index(chars)
+                tables = [
+                    self._extract_table_rows(table, chars, char_index, table_settings.text_settings or {})
+                    for table in found
+                ]
+        
+        return {"text": text or "", "tables": tables}
+    
+    def _build_char_index(self, chars: List[Dict[str, Any]]) -> Tuple[List[float], List[int]]:
+        """
+        Index chars by vertical midpoint, so the chars of a table row are found
+        with a binary search instead of a scan of every char on the page.
+        
+        Returns:
+            Tuple of (sorted vertical midpoints, char positions in the same order)
+        """
+        entries = sorted(((char["top"] + char["bottom"]) / 2, idx) for idx, char in enumerate(chars))
+        return [mid for mid, _ in entries], [idx for _, idx in entries]
+    
+    def _extract_table_rows(
+        self,
+        table,
+        chars: List[Dict[str, Any]],
+        char_index: Tuple[List[float], List[int]],
+        text_settings: Dict[str, Any]
+    ) -> List[List[Optional[str]]]:
+        """
+        Extract the cell text of a table (same result as pdfplumber's Table.extract).
+        
+        Args:
+            table: pdfplumber Table
+            chars: All chars of the page
+            char_index: Vertical index from _build_char_index
+            text_settings: Text extraction settings for cells
+        
+        Returns:
+            Table rows as lists of cell strings (None for merged cells)
+        """
+        from pdfplumber import utils
+        
+        mids, positions = char_index
+        rows = []
+        
+        for row in table.rows:
+            x0, top, x1, bottom = row.bbox
+            candidates = sorted(positions[bisect_left(mids, top):bisect_left(mids, bottom)])
+            row_chars = [
+                chars[idx] for idx in candidates
+                if x0 <= (chars[idx]["x0"] + chars[idx]["x1"]) / 2 < x1
+            ]
+            
+            cells = []
+            for cell in row.cells:
+                if cell is None:
+                    cells.append(None)
+                    continue
+                
+                cell_chars = [char for char in row_chars if self._char_in_bbox(char, cell)]
+                if cell_chars:
+                    cells.append(utils.extract_text(
+                        cell_chars, **{**text_settings, "x_shift": cell[0], "y_shift": cell[1]}
+                    ))
+                else:
+                    cells.append("")
+            rows.append(cells)
+        
+        return rows
+    
+    @staticmethod
+    def _char_in_bbox(char: Dict[str, Any], bbox) -> bool:
+        v_mid = (char["top"] + char["bottom"]) / 2
+        h_mid = (char["x0"] + char["x1"]) / 2
+        x0, top, x1, bottom = bbox
+        return (h_mid >= x0) and (h_mid < x1) and (v_mid >= top) and (v_mid < bottom)
+    
+    def _render_page(self, page_num: int, page_data: Dict[str, Any]) -> List[str]:
+        """
+        Render a page's text and tables into the text format sent to Gemini.
+        
+        Args:
+            page_num: 1-based page number
+            page_data: Page text and tables
+        
+        Returns:
+            List of text fragments for the page
+        """
+        fragments = []
+        
+        text = page_data.get("text")
+        if text:
+            fragments.append(f"\n--- Page {page_num} ---\n")
+            fragments.append(text)
+        
+        # Also include tables if present
+        for table_num, table in enumerate(page_data.get("tables") or [], start=1):
+            fragments.append(f"\n[Table {table_num} on Page {page_num}]\n")
+            # Convert table to text representation
+            for row in table:
+                if row:
+                    row_text = " | ".join([str(cell) if cell else "" for cell in row])
+                    fragments.append(row_text + "\n")
+        
+        return fragments
+    
+    def render_pages(self, page_numbers: Optional[List[int]] = None) -> str:
+        """
+        Render extracted pages into the text format sent to Gemini.
+        
+        Args:
+            page_numbers: 1-based numbers of the pages to include (all pages if None)
+        
+        Returns:
+            Rendered text, keeping the original page numbers in the page markers
+        """
+        selected = None if page_numbers is None else set(page_numbers)
+        fragments = []
+        for page_num, page_data in self.pages:
+            if selected is None or page_num in selected:
+                fragments.extend(self._render_page(page_num, page_data))
+        return "".join(fragments)
+    
+    def page_hashes(self) -> List[str]:
+        """
+        Fingerprint the content of every extracted page.
+        Hashes the normalized text and tables without the page number, so a page
+        that moved keeps its fingerprint and running page numbers do not count
+        as a change.
+        
+        Returns:
+            SHA-256 hex digest per page, in page order
+        """
+        if self._page_hashes is not None:
+            return list(self._page_hashes)
+        return [self._page_hash(page_data) for _, page_data in self.pages]
+    
+    @staticmethod
+    def _page_hash(page_data: Dict[str, Any]) -> str:
+        content = json.dumps(
+            {"text": page_data.get("text") or "", "tables": page_data.get("tables") or []},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+    
     def get_text_preview(self, max_chars: int = 500) -> str:
         """Get a preview of the extracted text."""
         if not self.extracted_text:
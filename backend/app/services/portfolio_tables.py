@@ -0,0 +1,291 @@
+"""
+Normalized portfolio tables populated from extraction results.
+Flattens the portfolio summary, schedule of investments, company profiles
+and company financials of a result's extracted_data into typed rows, so
+cross-fund questions ("every holding in company X", "NAV by industry") are
+answered with indexed SQL instead of deserializing every stored result.
+"""
+
+import logging
+import re
+from datetime import date, datetime
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app.database.crud import PortfolioService
+from app.services.analytics import refresh_funds
+
+logger = logging.getLogger(__name__)
+
+# Length of the String(255) columns of the portfolio tables
+MAX_TEXT_LENGTH = 255
+
+# Legal-form suffixes ignored when matching company names across reports
+_COMPANY_SUFFIXES = {
+    "inc", "incorporated", "llc", "llp", "lp", "ltd", "limited", "corp",
+    "corporation", "co", "company", "plc", "gmbh", "ag", "sa", "sarl", "bv", "nv"
+}
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_NUMBER = re.compile(r"^\d+(\.\d+)?$")
+_DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y", "%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%Y-%m"]
+
+_REGION_FIELDS = {
+    "north_america": "north_america_percent",
+    "europe": "europe_percent",
+    "asia": "asia_percent",
+    "other": "other_region_percent",
+}
+_INDUSTRY_FIELDS = {
+    "consumer_goods": "consumer_goods_percent",
+    "it": "it_percent",
+    "financials": "financials_percent",
+    "healthcare": "healthcare_percent",
+    "services": "services_percent",
+    "industrials": "industrials_percent",
+    "other": "other_industry_percent",
+}
+_SUMMARY_NUMBERS = [
+    "total_commitments", "total_drawdowns", "remaining_commitments", "total_distributions",
+    "net_contributions", "assets_under_management", "nav", "fair_value", "total_investments",
+    "realized_investments", "unrealized_investments", "dpi", "rvpi", "tvpi", "irr", "moic"
+]
+
+
+class PortfolioRows(NamedTuple):
+    """Rows of the portfolio tables for one extraction result."""
+    summary: Dict[str, Any]
+    investments: List[Dict[str, Any]]
+    profiles: List[Dict[str, Any]]
+    financials: List[Dict[str, Any]]
+
+
+def to_number(value: Any) -> Optional[float]:
+    """
+    Parse an extracted amount, percentage or multiple.
+    Accepts numbers and strings such as "$1,234.5", "(250)", "12.5%" or "1.8x".
+    
+    Returns:
+        The value as a float, or None if it is missing or not numeric
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    
+    text = value.strip().replace(",", "").replace(" ", "")
+    negative = text.startswith("(") and text.endswith(")")
+    text = text.strip("()")
+    if text.startswith("-"):
+        negative = not negative
+        text = text[1:]
+    text = text.lstrip("$€£¥").rstrip("%xX")
+    if not _NUMBER.match(text):
+        return None
+    number = float(text)
+    return -number if negative else number
+
+
+def to_date(value: Any) -> Optional[date]:
+    """
+    Parse an extracted date ("YYYY-MM-DD" as requested from Gemini, or a few
+    common report formats).
+    
+    Returns:
+        The date, or None if it cannot be parsed
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str) or not value.strip():
+        return None
+    
+    text = value.strip()
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def to_text(value: Any) -> Optional[str]:
+    """Extracted text trimmed to the column length, or None if empty."""
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    text = str(value).strip()
+    return text[:MAX_TEXT_LENGTH] if text else None
+
+
+def company_key(name: Optional[str]) -> str:
+    """
+    Key matching the same company (or fund) across reports.
+    Case, punctuation and legal-form suffixes are ignored, so "Acme, Inc."
+    and "ACME Inc" share a key, as do "Fund II, L.P." and "Fund II LP".
+    
+    Args:
+        name: Company name as extracted
+    
+    Returns:
+        Normalized key ("" for an empty name)
+    """
+    words = _NON_ALNUM.sub(" ", (name or "").casefold().replace(".", "")).split()
+    while len(words) > 1 and words[-1] in _COMPANY_SUFFIXES:
+        words.pop()
+    return " ".join(words)[:MAX_TEXT_LENGTH]
+
+
+def _first(item: Dict[str, Any], *keys: str) -> Any:
+    """First non-empty value among alternative keys (prompt and sheet names differ)."""
+    for key in keys:
+        value = item.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _items(data: Dict[str, Any], section: str) -> Iterable[Dict[str, Any]]:
+    value = data.get(section)
+    return [item for item in value if isinstance(item, dict)] if isinstance(value, list) else []
+
+
+def build_portfolio_rows(data: Dict[str, Any]) -> PortfolioRows:
+    """
+    Flatten the portfolio sections of a result's extracted data.
+    Items without a company name are skipped. Holdings take their fund from
+    the summary when the item has none, and their industry from the company
+    profile of the same report.
+    
+    Args:
+        data: Structured extraction data
+    
+    Returns:
+        PortfolioRows, without result_id
+    """
+    data = data if isinstance(data, dict) else {}
+    summary_data = data.get("portfolio_summary") if isinstance(data.get("portfolio_summary"), dict) else {}
+    fund_name = to_text(summary_data.get("fund_name"))
+    
+    summary = {
+        "general_partner": to_text(summary_data.get("general_partner")),
+        "fund_name": fund_name,
+        "fund_key": company_key(fund_name) or None,
+        "fund_currency": to_text(summary_data.get("fund_currency")),
+        "reporting_period": to_text(summary_data.get("reporting_period")),
+        "report_date": to_date(summary_data.get("report_date")),
+    }
+    for key in _SUMMARY_NUMBERS:
+        summary[key] = to_number(summary_data.get(key))
+    for column, fields in (("region_breakdown", _REGION_FIELDS), ("industry_breakdown", _INDUSTRY_FIELDS)):
+        breakdown = {name: to_number(summary_data.get(key)) for name, key in fields.items()}
+        summary[column] = {name: value for name, value in breakdown.items() if value is not None} or None
+    
+    profiles = []
+    industries: Dict[str, str] = {}
+    for item in _items(data, "portfolio_company_profile"):
+        name = to_text(item.get("company_name"))
+        key = company_key(name)
+        if not key:
+            continue
+        industry = to_text(item.get("industry"))
+        if industry:
+            industries.setdefault(key, industry)
+        profiles.append({
+            "company_name": name,
+            "company_key": key,
+            "fund": fund_name,
+            "industry": industry,
+            "headquarters": to_text(item.get("headquarters")),
+            "securities_held": to_text(item.get("securities_held")),
+            "initial_investment_date": to_date(item.get("initial_investment_date")),
+            "fund_ownership_percent": to_number(item.get("fund_ownership_percent")),
+            "investment_commitment": to_number(item.get("investment_commitment")),
+            "invested_capital": to_number(item.get("invested_capital")),
+            "reported_value": to_number(item.get("reported_value")),
+            "realized_proceeds": to_number(item.get("realized_proceeds")),
+            "investment_multiple": to_number(item.get("investment_multiple")),
+            "gross_irr": to_number(_first(item, "gross_irr", "irr")),
+        })
+    
+    investments = []
+    for item in _items(data, "schedule_of_investments"):
+        name = to_text(item.get("company"))
+        key = company_key(name)
+        if not key:
+            continue
+        investments.append({
+            "company": name,
+            "company_key": key,
+            "fund": to_text(item.get("fund")) or fund_name,
+            "industry": industries.get(key),
+            "reported_date": to_date(item.get("reported_date")) or summary["report_date"],
+            "investment_status": to_text(item.get("investment_status")),
+            "security_type": to_text(item.get("security_type")),
+            "initial_investment_date": to_date(item.get("initial_investment_date")),
+            "total_invested": to_number(item.get("total_invested")),
+            "current_cost": to_number(item.get("current_cost")),
+            "reported_value": to_number(item.get("reported_value")),
+            "realized_proceeds": to_number(item.get("realized_proceeds")),
+            "fund_ownership_percent": to_number(item.get("fund_ownership_percent")),
+            "investment_multiple": to_number(
+                _first(item, "current_quarter_investment_multiple", "investment_multiple")
+            ),
+            "irr": to_number(_first(item, "since_inception_irr", "irr")),
+        })
+    
+    financials = []
+    for item in _items(data, "portfolio_company_financials"):
+        name = to_text(item.get("company"))
+        key = company_key(name)
+        if not key:
+            continue
+        financials.append({
+            "company": name,
+            "company_key": key,
+            "fund": fund_name,
+            "company_currency": to_text(item.get("company_currency")),
+            "operating_data_date": to_date(item.get("operating_data_date")),
+            "ltm_revenue": to_number(item.get("ltm_revenue")),
+            "ltm_ebitda": to_number(item.get("ltm_ebitda")),
+            "cash": to_number(item.get("cash")),
+            "gross_debt": to_number(item.get("gross_debt")),
+            "yoy_revenue_growth": to_number(_first(item, "yoy_percent_growth_revenue", "yoy_revenue_growth")),
+            "ebitda_margin": to_number(item.get("ebitda_margin")),
+            "total_enterprise_value": to_number(item.get("total_enterprise_value")),
+            "tev_multiple": to_number(item.get("tev_multiple")),
+        })
+    
+    return PortfolioRows(summary, investments, profiles, financials)
+
+
+def index_result(db: Session, result_id: int, data: Dict[str, Any], refresh_rollups: bool = True) -> Dict[str, int]:
+    """
+    Replace the portfolio rows of a result with those of its extracted data,
+    then refresh the analytics rollups of its fund.
+    
+    Args:
+        db: Database session
+        result_id: Extraction result ID
+        data: The result's extracted_data
+        refresh_rollups: False when indexing many results before a single
+            rebuild_rollups()
+    
+    Returns:
+        Number of rows written per table
+    """
+    rows = build_portfolio_rows(data)
+    previous_fund_key = PortfolioService.get_fund_key(db, result_id)
+    counts = PortfolioService.replace_for_result(
+        db, result_id, rows.summary, rows.investments, rows.profiles, rows.financials
+    )
+    if refresh_rollups:
+        refresh_funds(db, {previous_fund_key, rows.summary["fund_key"]})
+    logger.info(
+        f"Indexed result {result_id}: {counts['investments']} holdings, "
+        f"{counts['profiles']} company profiles, {counts['financials']} company financials"
+    )
+    return counts
@@ -0,0 +1,312 @@
+"""
+Shared token-bucket rate limiter for Gemini API calls.
+Accounts for both requests-per-minute and tokens-per-minute quotas, serves
+waiting callers in priority order and backs off automatically on HTTP 429.
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+from app.config import settings
+from app.services.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# Adaptive rate control: multiplicative decrease on 429, additive recovery on success
+RATE_DECREASE_FACTOR = 0.7
+RATE_RECOVERY_STEP = 0.02
+MIN_RATE_FACTOR = 0.1
+
+# Maximum time a waiter sleeps before re-checking (picks up changes from other processes)
+MAX_WAIT_SLICE = 1.0
+
+
+class TokenBucketRateLimiter:
+    """
+    Token-bucket limiter with a request bucket and a token bucket.
+    
+    Both buckets refill continuously at the configured per-minute rate,
+    scaled by an adaptive rate factor that drops on 429 responses and
+    slowly recovers on successful calls. When a state file is configured,
+    bucket levels are shared between processes through a locked JSON file.
+    """
+    
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        state_file: Optional[str] = None
+    ):
+        """
+        Initialize the rate limiter.
+        
+        Args:
+            requests_per_minute: Request quota (0 disables the request bucket)
+            tokens_per_minute: Token quota (0 disables the token bucket)
+            state_file: Optional path of a shared state file for cross-process limiting
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.state_file = state_file
+        
+        self._condition = threading.Condition()
+        self._waiters = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._local_state = self._initial_state()
+        
+        # Statistics
+        self.total_requests = 0
+        self.total_wait_seconds = 0.0
+        self.rate_limited_responses = 0
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether any quota is configured."""
+        return self.requests_per_minute > 0 or self.tokens_per_minute > 0
+    
+    def _initial_state(self) -> Dict[str, float]:
+        """Full buckets at the nominal rate."""
+        return {
+            "requests": float(self.requests_per_minute),
+            "tokens": float(self.tokens_per_minute),
+            "rate_factor": 1.0,
+            "updated": time.time()
+        }
+    
+    @contextmanager
+    def _locked_state(self):
+        """
+        Yield the bucket state, locked for the duration of the block.
+        Uses the shared state file (with an exclusive file lock) when configured.
+        """
+        if not self.state_file:
+            yield self._local_state
+            return
+        
+        import fcntl
+        
+        with open(self.state_file, "a+") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                handle.seek(0)
+                content = handle.read()
+                try:
+                    state = json.loads(content) if content else self._initial_state()
+                except json.JSONDecodeError:
+                    state = self._initial_state()
+                
+                yield state
+                
+                handle.seek(0)
+                handle.truncate()
+                handle.write(json.dumps(state))
+                handle.flush()
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+    
+    def _refill(self, state: Dict[str, float]):
+        """Refill both buckets for the time elapsed since the last update."""
+        now = time.time()
+        elapsed = max(0.0, now - state["updated"])
+        factor = state["rate_factor"]
+        
+        if self.requests_per_minute > 0:
+            capacity = self.requests_per_minute * factor
+            state["requests"] = min(capacity, state["requests"] + elapsed * capacity / 60.0)
+        if self.tokens_per_minute > 0:
+            capacity = self.tokens_per_minute * factor
+            state["tokens"] = min(capacity, state["tokens"] + elapsed * capacity / 60.0)
+        
+        state["updated"] = now
+    
+    def _try_take(self, tokens: int) -> float:
+        """
+        Take one request and `tokens` tokens if both buckets allow it.
+        
+        Args:
+            tokens: Estimated tokens for the call
+        
+        Returns:
+            0 if the quota was taken, otherwise seconds until it could be
+        """
+        with self._locked_state() as state:
+            self._refill(state)
+            factor = state["rate_factor"]
+            wait = 0.0
+            
+            if self.requests_per_minute > 0 and state["requests"] < 1:
+                rate = self.requests_per_minute * factor / 60.0
+                wait = max(wait, (1 - state["requests"]) / rate)
+            
+            if self.tokens_per_minute > 0:
+                # A single call larger than the bucket would never fit - cap it
+                needed = min(tokens, self.tokens_per_minute * factor)
+                if state["tokens"] < needed:
+                    rate = self.tokens_per_minute * factor / 60.0
+                    wait = max(wait, (needed - state["tokens"]) / rate)
+            
+            if wait > 0:
+                return wait
+            
+            if self.requests_per_minute > 0:
+                state["requests"] -= 1
+            if self.tokens_per_minute > 0:
+                state["tokens"] -= tokens
+            return 0.0
+    
+    def acquire(
+        self,
+        tokens: int,
+        priority: int = PRIORITY_INTERACTIVE,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> float:
+        """
+        Block until the call fits within both quotas.
+        Waiters are served in priority order, then first come first served.
+        
+        Args:
+            tokens: Estimated tokens for the call
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH (lower is served first)
+            cancel_token: Leave the queue if the job is cancelled while waiting
+        
+        Returns:
+            Seconds spent waiting
+        
+        Raises:
+            JobCancelledError: If the job is cancelled while waiting
+        """
+        if not self.enabled:
+            return 0.0
+        
+        ticket = (priority, next(self._sequence))
+        start = time.monotonic()
+        
+        with self._condition:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if cancel_token:
+                        cancel_token.check()
+                    if self._waiters[0] == ticket:
+                        wait = self._try_take(tokens)
+                        if wait <= 0:
+                            heapq.heappop(self._waiters)
+                            break
+                        self._condition.wait(timeout=min(wait, MAX_WAIT_SLICE))
+                    else:
+                        self._condition.wait(timeout=MAX_WAIT_SLICE)
+            except BaseException:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                raise
+            finally:
+                self._condition.notify_all()
+            
+            waited = time.monotonic() - start
+            self.total_requests += 1
+            self.total_wait_seconds += waited
+        
+        if waited > 0.5:
+            logger.info(f"Rate limiter: waited {waited:.1f}s for {tokens} tokens (priority {priority})")
+        return waited
+    
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """
+        Correct the token bucket once the real token count of a call is known.
+        
+        Args:
+            estimated_tokens: Tokens taken in acquire()
+            actual_tokens: Tokens reported by the API (None if unknown)
+        """
+        if not actual_tokens or self.tokens_per_minute <= 0:
+            return
+        with self._condition:
+            with self._locked_state() as state:
+                state["tokens"] -= actual_tokens - estimated_tokens
+    
+    def report_success(self):
+        """Let the adaptive rate creep back up towards the configured quota."""
+        if not self.enabled:
+            return
+        with self._condition:
+            with self._locked_state() as state:
+                state["rate_factor"] = min(1.0, state["rate_factor"] + RATE_RECOVERY_STEP)
+    
+    def report_rate_limited(self):
+        """
+        Adapt to an HTTP 429 response: lower the rate and drain the buckets
+        so every waiter backs off before the next call.
+        """
+        if not self.enabled:
+            return
+        with self._condition:
+            self.rate_limited_responses += 1
+            with self._locked_state() as state:
+                self._refill(state)
+                state["rate_factor"] = max(MIN_RATE_FACTOR, state["rate_factor"] * RATE_DECREASE_FACTOR)
+                state["requests"] = min(state["requests"], 0.0)
+                state["tokens"] = min(state["tokens"], 0.0)
+                factor = state["rate_factor"]
+        logger.warning(f"Rate limited by Gemini API (429) - reducing rate to {factor:.0%} of quota")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Current limiter state and counters."""
+        with self._condition:
+            with self._locked_state() as state:
+                self._refill(state)
+                snapshot = dict(state)
+            return {
+                "enabled": self.enabled,
+                "shared": bool(self.state_file),
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "rate_factor": round(snapshot["rate_factor"], 3),
+                "available_requests": round(snapshot["requests"], 2),
+                "available_tokens": int(snapshot["tokens"]),
+                "waiting": len(self._waiters),
+                "total_requests": self.total_requests,
+                "total_wait_seconds": round(self.total_wait_seconds, 2),
+                "rate_limited_responses": self.rate_limited_responses
+            }
+
+
+_rate_limiter: Optional[TokenBucketRateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TokenBucketRateLimiter:
+    """
+    Get the process-wide rate limiter, creating it from settings on first use.
+    
+    Returns:
+        Shared TokenBucketRateLimiter instance
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                state_file = settings.GEMINI_RATE_LIMIT_STATE_FILE or None
+                if state_file:
+                    os.makedirs(os.path.dirname(os.path.abspath(state_file)), exist_ok=True)
+                _rate_limiter = TokenBucketRateLimiter(
+                    requests_per_minute=settings.GEMINI_REQUESTS_PER_MINUTE,
+                    tokens_per_minute=settings.GEMINI_TOKENS_PER_MINUTE,
+                    state_file=state_file
+                )
+                logger.info(
+                    f"Gemini rate limiter: {settings.GEMINI_REQUESTS_PER_MINUTE} RPM, "
+                    f"{settings.GEMINI_TOKENS_PER_MINUTE} TPM"
+                    + (f", shared via {state_file}" if state_file else "")
+                )
+    return _rate_limiter
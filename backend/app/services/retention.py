@@ -0,0 +1,309 @@
+"""
+Storage retention manager for uploaded PDFs and generated workbooks.
+Periodically sweeps the upload and output directories: removes orphaned
+files, evicts files not accessed within the age limit, and evicts the least
+recently accessed files until the total size fits the quota. Evicted
+artifacts are flagged in the database so workbooks can be regenerated;
+workbooks of results without extracted data are never evicted.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.config import settings
+from app.database import SessionLocal
+from app.database.crud import UploadedFileService, ExtractionResultService, ExtractionLogService, JobStatusService
+from app.database.models import LogLevelEnum
+from app.services.output_files import METADATA_SUFFIX, remove_output_metadata
+
+logger = logging.getLogger(__name__)
+
+# Quota eviction trims total usage down to this fraction of the limit
+EVICTION_TARGET_RATIO = 0.9
+
+
+def record_access(file_path: str):
+    """
+    Mark a file as accessed now.
+    Sets the access time explicitly (keeping the modification time), so the
+    LRU order does not depend on atime support of the filesystem.
+    
+    Args:
+        file_path: Path to the accessed file
+    """
+    try:
+        stat = os.stat(file_path)
+        os.utime(file_path, ns=(time.time_ns(), stat.st_mtime_ns))
+    except OSError:
+        pass
+
+
+class RetentionManager:
+    """Age- and quota-based eviction for the upload and output directories."""
+    
+    def __init__(
+        self,
+        upload_dir: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        max_age_days: Optional[float] = None,
+        max_total_bytes: Optional[int] = None,
+        orphan_grace_seconds: Optional[int] = None
+    ):
+        """
+        Initialize the retention manager.
+        
+        Args:
+            upload_dir: Directory of uploaded PDFs (uses settings if not provided)
+            output_dir: Directory of generated workbooks (uses settings if not provided)
+            max_age_days: Evict files not accessed for this many days (0 disables)
+            max_total_bytes: Total size quota of both directories (0 disables)
+            orphan_grace_seconds: Minimum age before a file without a DB row is removed
+        """
+        self.upload_dir = upload_dir or settings.UPLOAD_DIR
+        self.output_dir = output_dir or settings.OUTPUT_DIR
+        self.max_age_days = settings.RETENTION_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        self.max_total_bytes = settings.RETENTION_MAX_TOTAL_BYTES if max_total_bytes is None else max_total_bytes
+        self.orphan_grace_seconds = (
+            settings.RETENTION_ORPHAN_GRACE_SECONDS if orphan_grace_seconds is None else orphan_grace_seconds
+        )
+        self._sweep_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_sweep: Optional[Dict[str, Any]] = None
+    
+    def start(self, interval_seconds: Optional[int] = None):
+        """Run sweeps in a background daemon thread."""
+        if self._thread is not None:
+            return
+        interval = interval_seconds or settings.RETENTION_INTERVAL_SECONDS
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="retention-manager", daemon=True)
+        self._thread.start()
+        logger.info(f"Retention manager started (every {interval}s)")
+    
+    def stop(self):
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def _run(self, interval: int):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Retention sweep failed: {str(e)}", exc_info=True)
+            self._stop.wait(interval)
+    
+    def _scan(self, directory: str, extensions: Tuple[str, ...]) -> List[Dict[str, Any]]:
+        """List files of a directory with their size and last access time."""
+        entries = []
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return entries
+        
+        for name in names:
+            if not name.endswith(extensions):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append({
+                "path": path,
+                "key": os.path.abspath(path),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "accessed": max(stat.st_atime, stat.st_mtime)
+            })
+        return entries
+    
+    def sweep(self, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Run one retention pass.
+        
+        Args:
+            dry_run: Report what would be removed without deleting anything
+        
+        Returns:
+            Summary with removed orphans, evicted files and remaining usage
+        """
+        with self._sweep_lock:
+            start = now = time.time()
+            
+            db = SessionLocal()
+            try:
+                uploads = {
+                    os.path.abspath(path): file_id
+                    for file_id, path in UploadedFileService.get_all_paths(db)
+                }
+                outputs = {}
+                in_use = set()
+                for result_id, file_id, path, has_data in ExtractionResultService.get_all_excel_paths(db):
+                    outputs[os.path.abspath(path)] = (result_id, file_id)
+                    if not has_data:
+                        # Without extracted data the workbook could never be regenerated
+                        in_use.add(os.path.abspath(path))
+                # Uploads of unfinished jobs (and the prior reports they compare against) are never evicted
+                in_use_file_ids = JobStatusService.get_unfinished_file_ids(db)
+                in_use.update(key for key, file_id in uploads.items() if file_id in in_use_file_ids)
+                
+                files = self._scan(self.upload_dir, (".pdf",)) + self._scan(self.output_dir, (".xlsx",))
+                
+                # 1. Orphans: files with no DB row, past the grace period for in-flight extractions
+                orphans = [
+                    entry for entry in files
+                    if entry["key"] not in uploads and entry["key"] not in outputs
+                    and now - entry["mtime"] > self.orphan_grace_seconds
+                ]
+                orphan_keys = {entry["key"] for entry in orphans}
+                tracked = sorted(
+                    [entry for entry in files if entry["key"] not in orphan_keys],
+                    key=lambda entry: entry["accessed"]
+                )
+                
+                # 2. Age limit
+                evicted = []
+                if self.max_age_days > 0:
+                    cutoff = now - self.max_age_days * 86400
+                    evicted = [
+                        entry for entry in tracked
+                        if entry["accessed"] < cutoff and entry["key"] not in in_use
+                    ]
+                
+                # 3. Size quota, least recently accessed first (files in use still count towards it)
+                evicted_keys = {entry["key"] for entry in evicted}
+                remaining = [entry for entry in tracked if entry["key"] not in evicted_keys]
+                total = sum(entry["size"] for entry in remaining)
+                if self.max_total_bytes > 0 and total > self.max_total_bytes:
+                    target = int(self.max_total_bytes * EVICTION_TARGET_RATIO)
+                    for entry in remaining:
+                        if total <= target:
+                            break
+                        if entry["key"] in in_use:
+                            continue
+                        evicted.append(entry)
+                        total -= entry["size"]
+                
+                stray = self._stray_files(now)
+                
+                if not dry_run:
+                    orphans = [entry for entry in orphans if self._remove(entry["path"])]
+                    evicted = [entry for entry in evicted if self._remove(entry["path"])]
+                    for path in stray:
+                        self._remove(path)
+                    self._mark_evicted(db, evicted, uploads, outputs)
+            finally:
+                db.close()
+            
+            summary = {
+                "dry_run": dry_run,
+                "timestamp": datetime.now().isoformat(),
+                "orphans_removed": [entry["path"] for entry in orphans],
+                "evicted": [entry["path"] for entry in evicted],
+                "stray_files_removed": stray,
+                "bytes_freed": sum(entry["size"] for entry in orphans + evicted),
+                "total_bytes": total,
+                "max_total_bytes": self.max_total_bytes,
+                "duration_ms": int((time.time() - start) * 1000)
+            }
+            if not dry_run:
+                self.last_sweep = summary
+            if orphans or evicted:
+                logger.info(
+                    f"Retention sweep: {len(orphans)} orphans and {len(evicted)} files "
+                    f"{'would be ' if dry_run else ''}removed, {summary['bytes_freed']} bytes"
+                )
+            return summary
+    
+    def _stray_files(self, now: float) -> List[str]:
+        """Metadata sidecars without a workbook and abandoned regeneration temp files."""
+        stray = []
+        try:
+            names = os.listdir(self.output_dir)
+        except OSError:
+            return stray
+        
+        for name in names:
+            path = os.path.join(self.output_dir, name)
+            if name.endswith(METADATA_SUFFIX):
+                if not os.path.exists(path[:-len(METADATA_SUFFIX)]):
+                    stray.append(path)
+            elif ".regen-" in name:
+                try:
+                    if now - os.path.getmtime(path) > self.orphan_grace_seconds:
+                        stray.append(path)
+                except OSError:
+                    pass
+        return stray
+    
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Retention could not remove {path}: {str(e)}")
+            return False
+        if path.endswith(".xlsx"):
+            remove_output_metadata(path)
+        return True
+    
+    def _mark_evicted(
+        self,
+        db,
+        evicted: List[Dict[str, Any]],
+        uploads: Dict[str, int],
+        outputs: Dict[str, Tuple[int, int]]
+    ):
+        """Flag evicted artifacts in the database and log the eviction per file."""
+        evicted_at = datetime.utcnow()
+        file_ids = [uploads[entry["key"]] for entry in evicted if entry["key"] in uploads]
+        results = [outputs[entry["key"]] for entry in evicted if entry["key"] in outputs]
+        
+        UploadedFileService.mark_evicted(db, file_ids, evicted_at)
+        ExtractionResultService.mark_excel_evicted(db, [result_id for result_id, _ in results], evicted_at)
+        
+        for file_id in file_ids:
+            ExtractionLogService.create(
+                db, file_id, "Uploaded PDF evicted by retention policy",
+                LogLevelEnum.INFO, "retention"
+            )
+        for _, file_id in results:
+            ExtractionLogService.create(
+                db, file_id, "Excel file evicted by retention policy (regenerate from stored data)",
+                LogLevelEnum.INFO, "retention"
+            )
+    
+    def stats(self) -> Dict[str, Any]:
+        """Configuration and the outcome of the last sweep."""
+        last = self.last_sweep or {}
+        return {
+            "running": self._thread is not None,
+            "max_age_days": self.max_age_days,
+            "max_total_bytes": self.max_total_bytes,
+            "last_sweep": last.get("timestamp"),
+            "last_bytes_freed": last.get("bytes_freed"),
+            "total_bytes": last.get("total_bytes")
+        }
+
+
+_retention_manager: Optional[RetentionManager] = None
+_retention_manager_lock = threading.Lock()
+
+
+def get_retention_manager() -> RetentionManager:
+    """Get the process-wide retention manager."""
+    global _retention_manager
+    if _retention_manager is None:
+        with _retention_manager_lock:
+            if _retention_manager is None:
+                _retention_manager = RetentionManager()
+    return _retention_manager
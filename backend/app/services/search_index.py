@@ -0,0 +1,147 @@
+"""
+Full-text search over uploaded files.
+The normalized text of every PDF page, the footnotes and the company
+descriptions of a file's extracted data are stored as search documents
+when its job completes; app.database.fulltext indexes them.
+"""
+
+import itertools
+import logging
+import re
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database.crud import SearchService
+from app.services.portfolio_tables import to_text
+
+logger = logging.getLogger(__name__)
+
+SEARCH_SOURCES = ("page", "footnote", "company_description")
+
+_QUERY_TERM = re.compile(r'(-?)"([^"]*)"?|(\S+)')
+_WORD = re.compile(r"\w+")
+
+
+def page_documents(pages: Iterable[Tuple[int, str]]) -> Iterator[Dict[str, Any]]:
+    """Search documents of the pages of a PDF (blank pages are skipped)."""
+    for page_num, text in pages:
+        if text and text.strip():
+            yield {"source": "page", "page_number": page_num, "title": None, "content": text}
+
+
+def data_documents(data: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Search documents of the footnotes and company descriptions of extracted data."""
+    data = data if isinstance(data, dict) else {}
+    documents = []
+    for item in data.get("footnotes") or []:
+        if isinstance(item, dict) and to_text(item.get("description")):
+            number = to_text(item.get("note_number"))
+            header = to_text(item.get("note_header"))
+            title = " ".join(part for part in (f"Note {number}" if number else None, header) if part)
+            documents.append({
+                "source": "footnote",
+                "page_number": None,
+                "title": title[:255] or None,
+                "content": str(item["description"]).strip()
+            })
+    for item in data.get("portfolio_company_profile") or []:
+        if isinstance(item, dict) and to_text(item.get("company_description")):
+            documents.append({
+                "source": "company_description",
+                "page_number": None,
+                "title": to_text(item.get("company_name")),
+                "content": str(item["company_description"]).strip()
+            })
+    return documents
+
+
+def index_file(
+    db: Session,
+    file_id: int,
+    pages: Optional[Iterable[Tuple[int, str]]],
+    data: Optional[Dict[str, Any]]
+) -> Dict[str, int]:
+    """
+    Replace the search documents of a file.
+    
+    Args:
+        db: Database session
+        file_id: Uploaded file ID
+        pages: (page_num, text) of every page, e.g. PDFExtractor.iter_page_texts();
+            None when the PDF is no longer available (only data is indexed)
+        data: The file's extracted_data
+    
+    Returns:
+        Number of documents written per source
+    """
+    documents = data_documents(data)
+    if pages is not None:
+        documents = itertools.chain(page_documents(pages), documents)
+    counts = SearchService.replace_for_file(db, file_id, iter(documents))
+    logger.info(f"Indexed file {file_id} for search: {counts}")
+    return counts
+
+
+def fts5_query(query: str) -> str:
+    """
+    Translate a search box query into an FTS5 MATCH expression.
+    Words and "quoted phrases" must all match; OR between two terms matches
+    either, and a leading - excludes a term. Punctuation is never passed
+    through, so user input cannot produce an FTS5 syntax error.
+    
+    Returns:
+        MATCH expression ("" if the query has no term to match)
+    """
+    terms: List[str] = []
+    excluded: List[str] = []
+    pending_or = False
+    for negated, phrase, bare in _QUERY_TERM.findall(query):
+        if bare and bare.upper() == "OR":
+            pending_or = bool(terms)
+            continue
+        if bare.startswith("-") and len(bare) > 1:
+            negated, bare = "-", bare[1:]
+        words = _WORD.findall(phrase or bare)
+        if not words:
+            continue
+        term = '"' + " ".join(words) + '"'
+        if negated:
+            excluded.append(term)
+        else:
+            terms.append(f"OR {term}" if pending_or else term)
+            pending_or = False
+    
+    # FTS5's NOT needs a left operand, so exclusions go last
+    if not terms:
+        return ""
+    if not excluded:
+        return " ".join(terms)
+    return f"({' '.join(terms)})" + "".join(f" NOT {term}" for term in excluded)
+
+
+def search(
+    db: Session,
+    query: str,
+    source: Optional[str] = None,
+    file_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 20
+) -> List[Dict[str, Any]]:
+    """
+    Search every indexed file, best matches first.
+    The query syntax is that of fts5_query(), which PostgreSQL's
+    websearch_to_tsquery() accepts as well.
+    
+    Raises:
+        ValueError: If the query has no searchable word
+    """
+    if not _WORD.search(query or ""):
+        raise ValueError("The search query has no word to match")
+    if db.get_bind().dialect.name == "postgresql":
+        return SearchService.search(db, query, source, file_id, skip, limit)
+    
+    match = fts5_query(query)
+    if not match:
+        raise ValueError("The search query has no word to match")
+    return SearchService.search(db, match, source, file_id, skip, limit)
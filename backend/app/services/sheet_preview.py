@@ -0,0 +1,217 @@
+"""
+Server-side sheet preview service.
+Builds the rows of each workbook sheet from a result's extracted data (or,
+when no data was stored, from a read-only parse of the Excel file) and keeps
+them in a small in-process LRU cache so pages can be served without
+re-reading the database JSON or the workbook.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+from app.config import settings
+from app.services.sheet_specs import WORKBOOK_SHEETS, build_sheet
+
+logger = logging.getLogger(__name__)
+
+SOURCE_EXTRACTED_DATA = "extracted_data"
+SOURCE_WORKBOOK = "workbook"
+
+_TITLE_TO_KEY = {title: key for key, title in WORKBOOK_SHEETS}
+
+
+def _sheet_key_for_title(title: str) -> str:
+    """Section key of a known sheet title, or a slug of the title."""
+    if title in _TITLE_TO_KEY:
+        return _TITLE_TO_KEY[title]
+    return re.sub(r"[^a-z0-9]+", "_", title.lower()).strip("_")
+
+
+class ParsedSheets:
+    """Rows of every sheet of one result, built lazily per sheet."""
+    
+    def __init__(self, source: str, data: Optional[Dict[str, Any]] = None):
+        self.source = source
+        self._data = data
+        self._sheets: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        if source == SOURCE_EXTRACTED_DATA:
+            for key, title in WORKBOOK_SHEETS:
+                self._sheets[key] = {"key": key, "title": title, "columns": None, "rows": None}
+    
+    @classmethod
+    def from_workbook(cls, excel_path: str) -> "ParsedSheets":
+        """
+        Parse every sheet of an Excel file (first row as headers).
+        
+        Args:
+            excel_path: Path to the workbook
+        
+        Returns:
+            ParsedSheets with all sheets loaded
+        """
+        from openpyxl import load_workbook
+        
+        parsed = cls(SOURCE_WORKBOOK)
+        wb = load_workbook(excel_path, read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                rows = [
+                    ["" if value is None else value for value in row]
+                    for row in ws.iter_rows(values_only=True)
+                ]
+                columns = [str(value) for value in rows[0]] if rows else []
+                key = _sheet_key_for_title(ws.title)
+                parsed._sheets[key] = {"key": key, "title": ws.title, "columns": columns, "rows": rows[1:]}
+        finally:
+            wb.close()
+        return parsed
+    
+    def keys(self) -> List[str]:
+        """Sheet keys in workbook order."""
+        return list(self._sheets.keys())
+    
+    def resolve(self, sheet: str) -> Optional[str]:
+        """Map a sheet key or title (case-insensitive) to its key."""
+        if sheet in self._sheets:
+            return sheet
+        wanted = sheet.lower()
+        for key, entry in self._sheets.items():
+            if entry["title"].lower() == wanted:
+                return key
+        return None
+    
+    def get(self, key: str) -> Dict[str, Any]:
+        """Get a sheet (key, title, columns, rows), building it on first use."""
+        entry = self._sheets[key]
+        if entry["rows"] is None:
+            with self._lock:
+                if entry["rows"] is None:
+                    columns, rows = build_sheet(self._data, key)
+                    entry["columns"] = columns
+                    entry["rows"] = rows
+        return entry
+
+
+class SheetPreviewCache:
+    """LRU cache of parsed sheets, keyed by result ID and result version."""
+    
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = settings.SHEET_PREVIEW_CACHE_SIZE if max_entries is None else max_entries
+        self._entries: "OrderedDict[tuple[int, str], ParsedSheets]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, result_id: int, version: str) -> Optional[ParsedSheets]:
+        """Get cached sheets for a result version and mark them as recently used."""
+        with self._lock:
+            parsed = self._entries.get((result_id, version))
+            if parsed is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((result_id, version))
+            self.hits += 1
+            return parsed
+    
+    def put(self, result_id: int, version: str, parsed: ParsedSheets):
+        """Store parsed sheets, replacing older versions of the same result."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == result_id]:
+                del self._entries[key]
+            self._entries[(result_id, version)] = parsed
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, result_id: int):
+        """Drop every cached version of a result."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == result_id]:
+                del self._entries[key]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache occupancy and hit counts."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+_preview_cache: Optional[SheetPreviewCache] = None
+_preview_cache_lock = threading.Lock()
+
+
+def get_sheet_preview_cache() -> SheetPreviewCache:
+    """Get the process-wide sheet preview cache."""
+    global _preview_cache
+    if _preview_cache is None:
+        with _preview_cache_lock:
+            if _preview_cache is None:
+                _preview_cache = SheetPreviewCache()
+    return _preview_cache
+
+
+def result_version(db_result) -> str:
+    """
+    Version string of a result's preview source.
+    Changes when the result is re-extracted or its workbook is rewritten.
+    
+    Args:
+        db_result: ExtractionResult instance (extracted_data may be deferred)
+    
+    Returns:
+        Version string
+    """
+    try:
+        mtime = os.path.getmtime(db_result.excel_path)
+    except OSError:
+        mtime = 0
+    return f"{db_result.extraction_timestamp.isoformat()}:{mtime}"
+
+
+def load_sheets(db_result) -> Optional[ParsedSheets]:
+    """
+    Get the parsed sheets of a result, from the cache when possible.
+    Only touches extracted_data (or the workbook) on a cache miss.
+    
+    Args:
+        db_result: ExtractionResult instance
+    
+    Returns:
+        ParsedSheets, or None if the result has neither data nor a workbook
+    """
+    cache = get_sheet_preview_cache()
+    version = result_version(db_result)
+    
+    parsed = cache.get(db_result.id, version)
+    if parsed is not None:
+        return parsed
+    
+    if isinstance(db_result.extracted_data, dict):
+        parsed = ParsedSheets(SOURCE_EXTRACTED_DATA, db_result.extracted_data)
+    elif os.path.exists(db_result.excel_path):
+        logger.info(f"Parsing workbook for preview of result {db_result.id}")
+        parsed = ParsedSheets.from_workbook(db_result.excel_path)
+    else:
+        return None
+    
+    cache.put(db_result.id, version, parsed)
+    return parsed
+
+
+def payload_etag(payload: Dict[str, Any]) -> str:
+    """Strong ETag of a JSON payload."""
+    body = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
@@ -0,0 +1,389 @@
+"""
+Declarative sheet specifications for the 9-sheet fund report template.
+Each spec lists the column header, the source key in the extracted data,
+an optional number format (applied to numeric values) and an optional width hint.
+"""
+
+from itertools import zip_longest
+from typing import NamedTuple, Optional, List, Tuple, Dict, Any
+
+class ColumnSpec(NamedTuple):
+    """A single column of a table sheet."""
+    header: str
+    key: str
+    number_format: Optional[str] = None
+    width: Optional[int] = None
+
+
+class SheetSpec(NamedTuple):
+    """A table sheet: one row per item of a list section."""
+    title: str
+    section: str
+    columns: List[ColumnSpec]
+
+
+class LineItemSheetSpec(NamedTuple):
+    """
+    A transposed statement sheet: line items are columns and the
+    rows are periods, read from row_{n}_{period} keys.
+    """
+    title: str
+    section: str
+    line_items: List[str]
+    periods: List[Tuple[str, str]]
+
+
+# Row labels and key suffixes for transposed statement sheets
+STATEMENT_PERIODS = [
+    ("Current Period", "current"),
+    ("Prior Period", "prior"),
+    ("Year to Date", "ytd"),
+]
+
+
+# Sheet 1: Portfolio Summary - (label, key); key None marks a section header
+PORTFOLIO_SUMMARY_FIELDS = [
+    ("General Partner", "general_partner"),
+    ("ILPA GP", "ilpa_gp"),
+    ("Assets Under Management", "assets_under_management"),
+    ("Active Funds", "active_funds"),
+    ("Active Portfolio Companies", "active_portfolio_companies"),
+    ("Fund Name", "fund_name"),
+    ("Fund Currency", "fund_currency"),
+    ("Total Commitments", "total_commitments"),
+    ("Total Drawdowns", "total_drawdowns"),
+    ("Remaining Commitments", "remaining_commitments"),
+    ("Net Contributions", "net_contributions"),
+    ("NAV", "nav"),
+    ("Fair Value", "fair_value"),
+    ("Total Number of Investments", "total_investments"),
+    ("Realized Investments", "realized_investments"),
+    ("Unrealized Investments", "unrealized_investments"),
+    ("Total Distributions", "total_distributions"),
+    ("- as % of Drawdowns", "distributions_percent_of_drawdowns"),
+    ("- as % of Commitments", "distributions_percent_of_commitments"),
+    ("DPI", "dpi"),
+    ("RVPI", "rvpi"),
+    ("TVPI", "tvpi"),
+    ("IRR", "irr"),
+    ("MOIC", "moic"),
+    ("Portfolio Breakdown By Region", None),  # Section header
+    ("North America", "north_america_percent"),
+    ("Europe", "europe_percent"),
+    ("Asia", "asia_percent"),
+    ("Other Regions", "other_region_percent"),
+    ("Portfolio Breakdown By Industry", None),  # Section header
+    ("Consumer Goods", "consumer_goods_percent"),
+    ("IT", "it_percent"),
+    ("Financials", "financials_percent"),
+    ("HealthCare", "healthcare_percent"),
+    ("Services", "services_percent"),
+    ("Industrials", "industrials_percent"),
+    ("Other", "other_industry_percent"),
+]
+
+
+# Sheet 2: Schedule of Investments
+SCHEDULE_OF_INVESTMENTS = SheetSpec(
+    title="Schedule of Investments",
+    section="schedule_of_investments",
+    columns=[
+        ColumnSpec("Company", "company"),
+        ColumnSpec("Fund", "fund"),
+        ColumnSpec("Reported Date", "reported_date"),
+        ColumnSpec("Investment Status", "investment_status"),
+        ColumnSpec("Security Type", "security_type"),
+        ColumnSpec("Number of Shares", "number_of_shares"),
+        ColumnSpec("Fund Ownership %", "fund_ownership_percent"),
+        ColumnSpec("Initial Investment Date", "initial_investment_date"),
+        ColumnSpec("Fund Commitment", "fund_commitment"),
+        ColumnSpec("Total Invested (A)", "total_invested"),
+        ColumnSpec("Current Cost (B)", "current_cost"),
+        ColumnSpec("Reported Value (C)", "reported_value"),
+        ColumnSpec("Realized Proceeds (D)", "realized_proceeds"),
+        ColumnSpec("LP Ownership % (Fully Diluted)", "lp_ownership_percent_fully_diluted"),
+        ColumnSpec("Final Exit Date", "final_exit_date"),
+        ColumnSpec("Valuation Policy", "valuation_policy"),
+        ColumnSpec("Period Change in Valuation", "period_change_in_valuation"),
+        ColumnSpec("Period Change in Cost", "period_change_in_cost"),
+        ColumnSpec("Unrealized Gains/(Losses)", "unrealized_gains_losses"),
+        ColumnSpec("Movement Summary", "movement_summary"),
+        ColumnSpec("Current Quarter Investment Multiple", "current_quarter_investment_multiple"),
+        ColumnSpec("Prior Quarter Investment Multiple", "prior_quarter_investment_multiple"),
+        ColumnSpec("Since Inception IRR", "since_inception_irr"),
+    ]
+)
+
+
+# Sheet 3: Statement of Operations
+STATEMENT_OF_OPERATIONS = SheetSpec(
+    title="Statement of Operations",
+    section="statement_of_operations",
+    columns=[
+        ColumnSpec("Period", "period"),
+        ColumnSpec("Portfolio Interest Income", "portfolio_interest_income"),
+        ColumnSpec("Portfolio Dividend Income", "portfolio_dividend_income"),
+        ColumnSpec("Other Interest Earned", "other_interest_earned"),
+        ColumnSpec("Total Income", "total_income"),
+        ColumnSpec("Management Fees, Net", "management_fees_net"),
+        ColumnSpec("Broken Deal Fees", "broken_deal_fees"),
+        ColumnSpec("Interest", "interest"),
+        ColumnSpec("Professional Fees", "professional_fees"),
+        ColumnSpec("Bank Fees", "bank_fees"),
+        ColumnSpec("Advisory Directors' Fees", "advisory_directors_fees"),
+        ColumnSpec("Insurance", "insurance"),
+        ColumnSpec("Total Expenses", "total_expenses"),
+        ColumnSpec("Net Operating Income / (Deficit)", "net_operating_income_deficit"),
+        ColumnSpec("Net Realized Gain / (Loss) on Investments", "net_realized_gain_loss_on_investments"),
+        ColumnSpec("Net Change in Unrealized Gain / (Loss) on Investments", "net_change_in_unrealized_gain_loss_on_investments"),
+        ColumnSpec("Net Realized Gain / (Loss) due to F/X", "net_realized_gain_loss_due_to_fx"),
+        ColumnSpec("Net Realized and Unrealized Gain / (Loss) on Investments", "net_realized_and_unrealized_gain_loss_on_investments"),
+        ColumnSpec("Net Increase / (Decrease) in Partners' Capital Resulting from Operations", "net_increase_decrease_in_partners_capital"),
+    ]
+)
+
+
+# Sheet 4: Statement of Cashflows
+STATEMENT_OF_CASHFLOWS = LineItemSheetSpec(
+    title="Statement of Cashflows",
+    section="statement_of_cashflows",
+    line_items=[
+        "Cash flows from operating activities",
+        "Net increase/(decrease) in partners' capital",
+        "Adjustments to reconcile net increase/(decrease)",
+        "Net realized (gain)/loss on investments",
+        "Net change in unrealized (gain)/loss on investments",
+        "Changes in operating assets and liabilities",
+        "(Increase)/decrease in due from affiliates",
+        "(Increase)/decrease in due from third party",
+        "(Increase)/decrease in due from investment",
+        "Purchase of investments",
+        "Proceeds from sale of investments",
+        "Net cash provided by/(used in) operating activities",
+        "Cash flows from financing activities",
+        "Capital contributions",
+        "Distributions",
+        "Increase/(decrease) in due to limited partners",
+        "Increase/(decrease) in due to affiliates",
+        "(Increase)/decrease in due from limited partners",
+        "Proceeds from loans",
+        "Repayment of loans",
+        "Net cash provided by/(used in) financing activities",
+        "Net increase/(decrease) in cash and cash equivalents",
+        "Cash and cash equivalents, beginning of period",
+        "Cash and cash equivalents, end of period",
+        "Supplemental disclosure of cash flow information",
+        "Cash paid for interest",
+    ],
+    periods=STATEMENT_PERIODS
+)
+
+
+# Sheet 5: PCAP Statement
+PCAP_STATEMENT = LineItemSheetSpec(
+    title="PCAP Statement",
+    section="pcap_statement",
+    line_items=[
+        "Beginning NAV - Net of Incentive Allocation",
+        "Contributions - Cash & Non-Cash",
+        "Distributions - Cash & Non-Cash",
+        "Total Cash / Non-Cash Flows",
+        "(Management Fees - Gross of Offsets, Waivers & Rebates)",
+        "(Management Fee Rebate)",
+        "(Partnership Expenses - Total)",
+        "Total Offsets to Fees & Expenses",
+        "Fee Waiver",
+        "Interest Income",
+        "Dividend Income",
+        "(Interest Expense)",
+        "Other Income/(Expense)",
+        "Total Net Operating Income / (Expense)",
+        "(Placement Fees)",
+        "Realized Gain / (Loss)",
+        "Change in Unrealized Gain / (Loss)",
+        "Ending NAV - Net of Incentive Allocation",
+        "Incentive Allocation - Paid During the Period",
+        "Accrued Incentive Allocation - Periodic Change",
+        "Accrued Incentive Allocation - Ending Period Balance",
+        "Ending NAV - Gross of Accrued Incentive Allocation",
+        "Total Commitment",
+        "Beginning Unfunded Commitment",
+        "Plus Recallable Distributions",
+        "Less Expired/Released Commitments",
+        "+/- Other Unfunded Adjustment",
+        "Ending Unfunded Commitment",
+    ],
+    periods=STATEMENT_PERIODS
+)
+
+
+# Sheet 6: Portfolio Company Profile
+PORTFOLIO_COMPANY_PROFILE = SheetSpec(
+    title="Portfolio Company Profile",
+    section="portfolio_company_profile",
+    columns=[
+        ColumnSpec("Company Name", "company_name"),
+        ColumnSpec("Initial Investment Date", "initial_investment_date"),
+        ColumnSpec("Industry", "industry"),
+        ColumnSpec("Headquarters", "headquarters"),
+        ColumnSpec("Company Description", "company_description"),
+        ColumnSpec("Fund Ownership %", "fund_ownership_percent"),
+        ColumnSpec("Investor Group Ownership %", "investor_group_ownership_percent"),
+        ColumnSpec("Enterprise Valuation at Closing", "enterprise_valuation_at_closing"),
+        ColumnSpec("Securities Held", "securities_held"),
+        ColumnSpec("Ticker Symbol", "ticker_symbol"),
+        ColumnSpec("Investor Group Members", "investor_group_members"),
+        ColumnSpec("Management Ownership %", "management_ownership_percent"),
+        ColumnSpec("Board Representation", "board_representation"),
+        ColumnSpec("Board Members", "board_members"),
+        ColumnSpec("Investment Commitment", "investment_commitment"),
+        ColumnSpec("Invested Capital", "invested_capital"),
+        ColumnSpec("Reported Value", "reported_value"),
+        ColumnSpec("Realized Proceeds", "realized_proceeds"),
+        ColumnSpec("Investment Multiple", "investment_multiple"),
+        ColumnSpec("Gross IRR (All Security Types)", "gross_irr"),
+        ColumnSpec("Investment Background", "investment_background"),
+        ColumnSpec("Initial Investment Thesis", "initial_investment_thesis"),
+        ColumnSpec("Exit Expectations", "exit_expectations"),
+        ColumnSpec("Recent Events & Key Initiatives", "recent_events_key_initiatives"),
+        ColumnSpec("Company Assessment", "company_assessment"),
+        ColumnSpec("Valuation Methodology", "valuation_methodology"),
+        ColumnSpec("Risk Assessment / Update", "risk_assessment_update"),
+    ]
+)
+
+
+# Sheet 7: Portfolio Company Financials
+PORTFOLIO_COMPANY_FINANCIALS = SheetSpec(
+    title="Portfolio Company Financials",
+    section="portfolio_company_financials",
+    columns=[
+        ColumnSpec("Company", "company"),
+        ColumnSpec("Company Currency", "company_currency"),
+        ColumnSpec("Operating Data Date", "operating_data_date"),
+        ColumnSpec("Data Type", "data_type"),
+        ColumnSpec("LTM Revenue", "ltm_revenue"),
+        ColumnSpec("LTM EBITDA", "ltm_ebitda"),
+        ColumnSpec("Cash", "cash"),
+        ColumnSpec("Book Value", "book_value"),
+        ColumnSpec("Gross Debt", "gross_debt"),
+        ColumnSpec("1 Year", "debt_1_year"),
+        ColumnSpec("2 Years", "debt_2_years"),
+        ColumnSpec("3 Years", "debt_3_years"),
+        ColumnSpec("4 Years", "debt_4_years"),
+        ColumnSpec("5 Years", "debt_5_years"),
+        ColumnSpec("After 5 Years", "debt_after_5_years"),
+        ColumnSpec("YOY % Growth (Revenue)", "yoy_percent_growth_revenue"),
+        ColumnSpec("LTM EBITDA (Pro-forma)", "ltm_ebitda_pro_forma"),
+        ColumnSpec("YOY % Growth (EBITDA)", "yoy_percent_growth_ebitda"),
+        ColumnSpec("EBITDA Margin", "ebitda_margin"),
+        ColumnSpec("Total Enterprise Value (TEV)", "total_enterprise_value"),
+        ColumnSpec("TEV Multiple", "tev_multiple"),
+        ColumnSpec("Total Leverage", "total_leverage"),
+        ColumnSpec("Total Leverage Multiple", "total_leverage_multiple"),
+    ]
+)
+
+
+# Sheet 8: Footnotes
+FOOTNOTES = SheetSpec(
+    title="Footnotes",
+    section="footnotes",
+    columns=[
+        ColumnSpec("Note #", "note_number"),
+        ColumnSpec("Note Header", "note_header"),
+        ColumnSpec("Operating Data Date", "operating_data_date"),
+        ColumnSpec("Description", "description"),
+    ]
+)
+
+
+# Sheet order of the workbook (Portfolio Summary and Reference Values are special-cased)
+TABLE_SHEETS = [
+    SCHEDULE_OF_INVESTMENTS,
+    STATEMENT_OF_OPERATIONS,
+    PORTFOLIO_COMPANY_PROFILE,
+    PORTFOLIO_COMPANY_FINANCIALS,
+    FOOTNOTES,
+]
+LINE_ITEM_SHEETS = [
+    STATEMENT_OF_CASHFLOWS,
+    PCAP_STATEMENT,
+]
+
+# Every sheet of the workbook in order: (sheet key, sheet title)
+WORKBOOK_SHEETS = [
+    ("portfolio_summary", "Portfolio Summary"),
+    (SCHEDULE_OF_INVESTMENTS.section, SCHEDULE_OF_INVESTMENTS.title),
+    (STATEMENT_OF_OPERATIONS.section, STATEMENT_OF_OPERATIONS.title),
+    (STATEMENT_OF_CASHFLOWS.section, STATEMENT_OF_CASHFLOWS.title),
+    (PCAP_STATEMENT.section, PCAP_STATEMENT.title),
+    (PORTFOLIO_COMPANY_PROFILE.section, PORTFOLIO_COMPANY_PROFILE.title),
+    (PORTFOLIO_COMPANY_FINANCIALS.section, PORTFOLIO_COMPANY_FINANCIALS.title),
+    (FOOTNOTES.section, FOOTNOTES.title),
+    ("reference_values", "Reference Values"),
+]
+
+_SPECS_BY_SECTION = {spec.section: spec for spec in TABLE_SHEETS + LINE_ITEM_SHEETS}
+
+
+def build_summary_rows(data: Dict[str, Any]) -> Tuple[List[str], List[List[Any]]]:
+    """Headers and (label, value) rows of the Portfolio Summary sheet."""
+    rows = [
+        [label, "" if key is None else data.get(key, "")]
+        for label, key in PORTFOLIO_SUMMARY_FIELDS
+    ]
+    return ["Field", "Value"], rows
+
+
+def build_table_rows(spec: SheetSpec, items: List[Dict[str, Any]]) -> Tuple[List[str], List[List[Any]]]:
+    """Headers and one row per item of a table sheet."""
+    keys = [column.key for column in spec.columns]
+    rows = [[item.get(key, "") for key in keys] for item in items if isinstance(item, dict)]
+    return [column.header for column in spec.columns], rows
+
+
+def build_line_item_rows(spec: LineItemSheetSpec, data: Dict[str, Any]) -> Tuple[List[str], List[List[Any]]]:
+    """Headers and one row per period of a transposed statement sheet."""
+    rows = []
+    for label, suffix in spec.periods:
+        row = [label]
+        for idx in range(1, len(spec.line_items) + 1):
+            value = data.get(f"row_{idx}_{suffix}", "")
+            row.append(value if value != 0 else "")
+        rows.append(row)
+    return ["Description"] + spec.line_items, rows
+
+
+def build_reference_rows(data: Dict[str, Any]) -> Tuple[List[str], List[List[Any]]]:
+    """Headers (one per reference type) and rows of the Reference Values sheet."""
+    headers = [key.replace("_", " ").title() for key in data.keys()]
+    columns = [values if isinstance(values, list) else [] for values in data.values()]
+    return headers, [list(values) for values in zip_longest(*columns)]
+
+
+def build_sheet(data: Dict[str, Any], sheet_key: str) -> Tuple[List[str], List[List[Any]]]:
+    """
+    Build the headers and rows of one workbook sheet from extracted data.
+    
+    Args:
+        data: Structured extraction data
+        sheet_key: Section key of the sheet (see WORKBOOK_SHEETS)
+    
+    Returns:
+        Tuple of (headers, rows)
+    
+    Raises:
+        KeyError: If the sheet key is unknown
+    """
+    section = data.get(sheet_key)
+    
+    if sheet_key == "portfolio_summary":
+        return build_summary_rows(section if isinstance(section, dict) else {})
+    if sheet_key == "reference_values":
+        return build_reference_rows(section if isinstance(section, dict) else {})
+    
+    spec = _SPECS_BY_SECTION[sheet_key]
+    if isinstance(spec, LineItemSheetSpec):
+        return build_line_item_rows(spec, section if isinstance(section, dict) else {})
+    return build_table_rows(spec, section if isinstance(section, list) else [])
@@ -0,0 +1,219 @@
+"""
+Pre-LLM normalization of extracted page text.
+Fingerprints lines and two-line blocks across all pages of a document and
+drops running headers, footers, disclaimers and confidentiality notices that
+repeat on most pages, keeping their first occurrence. Whitespace is
+collapsed as well, so Gemini is not billed for the same text on every page.
+"""
+
+import logging
+import math
+import re
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Documents with fewer pages have no meaningful "most pages"
+MIN_PAGES = 3
+
+# Fingerprints whose page counts are kept while scanning; rarer ones are
+# trimmed so the counts of a long document stay bounded
+MAX_TRACKED_KEYS = 10000
+
+_WHITESPACE = re.compile(r"[ \t\u00a0\f\v]+")
+_DIGITS = re.compile(r"\d+")
+# Page numbers once digits are masked: "#", "- # -", "Page #", "Page # of #", "# / #"
+_PAGE_NUMBER = re.compile(r"^[-–—\s]*(page\s*)?#(\s*(of|/)\s*#)?[-–—\s]*$")
+
+
+class BoilerplateRemover:
+    """Remove text repeated across the pages of a document."""
+    
+    def __init__(
+        self,
+        min_page_ratio: Optional[float] = None,
+        edge_lines: Optional[int] = None,
+        min_line_chars: Optional[int] = None,
+        max_tracked_keys: int = MAX_TRACKED_KEYS
+    ):
+        """
+        Initialize the remover.
+        
+        Args:
+            min_page_ratio: Fraction of pages a line must appear on to count as boilerplate
+            edge_lines: Lines at the top and bottom of a page treated as header/footer zone
+            min_line_chars: Minimum length of a body line (outside the header/footer zone)
+                to be considered; shorter body lines are usually labels, not boilerplate
+            max_tracked_keys: Fingerprints kept while scanning (see scan())
+        """
+        self.min_page_ratio = settings.BOILERPLATE_MIN_PAGE_RATIO if min_page_ratio is None else min_page_ratio
+        self.edge_lines = settings.BOILERPLATE_EDGE_LINES if edge_lines is None else edge_lines
+        self.min_line_chars = settings.BOILERPLATE_MIN_LINE_CHARS if min_line_chars is None else min_line_chars
+        self.max_tracked_keys = max_tracked_keys
+        self.frequent: Set[int] = set()
+        self.stats: Dict[str, Any] = {}
+    
+    @staticmethod
+    def collapse_whitespace(text: str) -> List[str]:
+        """Split text into lines with runs of whitespace collapsed and blank lines removed."""
+        lines = []
+        for line in text.splitlines():
+            line = _WHITESPACE.sub(" ", line).strip()
+            if line:
+                lines.append(line)
+        return lines
+    
+    def _line_keys(self, lines: List[str]) -> List[Set[int]]:
+        """
+        Fingerprints of each line of a page.
+        Every line long enough or in the header/footer zone is keyed by its
+        case-folded text. Zone lines that are page numbers are also keyed with
+        digits masked, so "Page 3 of 36" matches on every page; other lines
+        must repeat exactly, so totals and holdings that differ only in their
+        amounts are kept. Each pair of consecutive lines
+        forms a block key shared by both lines, which catches multi-line
+        notices made of short lines. Keys are hashed, so the counts kept for a
+        whole document do not hold a copy of its text.
+        """
+        keys = [set() for _ in lines]
+        folded = [line.casefold() for line in lines]
+        
+        for idx, line in enumerate(folded):
+            in_zone = idx < self.edge_lines or idx >= len(lines) - self.edge_lines
+            if in_zone or len(line) >= self.min_line_chars:
+                keys[idx].add(hash(("line", line)))
+            if in_zone:
+                masked = _DIGITS.sub("#", line)
+                if masked != line and _PAGE_NUMBER.match(masked):
+                    keys[idx].add(hash(("edge", masked)))
+        
+        for idx in range(len(folded) - 1):
+            block = folded[idx] + "\n" + folded[idx + 1]
+            if len(block) >= self.min_line_chars:
+                block_key = hash(("block", block))
+                keys[idx].add(block_key)
+                keys[idx + 1].add(block_key)
+        
+        return keys
+    
+    def _page_keys(self, text: str) -> Set[int]:
+        """All fingerprints of a page."""
+        return set().union(*self._line_keys(self.collapse_whitespace(text or "")))
+    
+    def scan(self, pages: Iterable[str], rescan: Optional[Callable[[], Iterable[str]]] = None) -> int:
+        """
+        First pass: find the fingerprints repeated on most pages.
+        Pages can be streamed. Page counts are kept for at most twice
+        max_tracked_keys fingerprints: beyond that the table is trimmed back to
+        the most frequent ones and every count is lowered by the count of the
+        first one dropped, which can only drop fingerprints too rare to be
+        boilerplate (frequent-items counting). If trimming happened, the
+        remaining candidates are counted exactly over rescan().
+        
+        Args:
+            pages: Text of each page, in page order
+            rescan: Returns the page texts again; without it, trimmed counts are
+                used as they are, which can only miss boilerplate
+        
+        Returns:
+            Number of boilerplate patterns found
+        """
+        page_counts: Dict[int, int] = {}
+        page_count = 0
+        trimmed = 0
+        for text in pages:
+            page_count += 1
+            for key in self._page_keys(text):
+                page_counts[key] = page_counts.get(key, 0) + 1
+            if len(page_counts) > 2 * self.max_tracked_keys:
+                cut = sorted(page_counts.values(), reverse=True)[self.max_tracked_keys]
+                page_counts = {key: count - cut for key, count in page_counts.items() if count > cut}
+                trimmed += cut
+        
+        self.frequent = set()
+        if page_count < MIN_PAGES:
+            return 0
+        threshold = max(MIN_PAGES, math.ceil(page_count * self.min_page_ratio))
+        
+        if trimmed:
+            candidates = {key for key, count in page_counts.items() if count + trimmed >= threshold}
+            logger.info(
+                f"Scanned {page_count} pages with more than {2 * self.max_tracked_keys} distinct "
+                f"fingerprints; {len(candidates)} boilerplate candidates"
+            )
+            if rescan is not None:
+                page_counts = dict.fromkeys(candidates, 0)
+                for text in rescan():
+                    for key in self._page_keys(text) & candidates:
+                        page_counts[key] += 1
+        
+        self.frequent = {key for key, count in page_counts.items() if count >= threshold}
+        return len(self.frequent)
+    
+    def iter_normalized(self, pages: Iterable[str]) -> Iterator[str]:
+        """
+        Second pass: normalize each page, dropping repeats of the boilerplate
+        found by scan(). Pages are streamed one at a time; stats is complete
+        once the iterator is exhausted.
+        
+        Args:
+            pages: Text of each page, in the same order as for scan()
+        
+        Yields:
+            Normalized text of each page
+        """
+        emitted: Set[int] = set()
+        self.stats = {
+            "pages": 0,
+            "original_chars": 0,
+            "normalized_chars": 0,
+            "removed_chars": 0,
+            "boilerplate_lines_removed": 0,
+            "boilerplate_patterns": len(self.frequent)
+        }
+        
+        for text in pages:
+            lines = self.collapse_whitespace(text or "")
+            kept = []
+            page_emitted = set()
+            for line, line_keys in zip(lines, self._line_keys(lines)):
+                matched = line_keys & self.frequent
+                if matched & emitted:
+                    self.stats["boilerplate_lines_removed"] += 1
+                    continue
+                kept.append(line)
+                page_emitted |= matched
+            # Keys are retired per page, so a notice is kept whole on its first page
+            emitted |= page_emitted
+            normalized = "\n".join(kept)
+            
+            self.stats["pages"] += 1
+            self.stats["original_chars"] += len(text or "")
+            self.stats["normalized_chars"] += len(normalized)
+            self.stats["removed_chars"] = self.stats["original_chars"] - self.stats["normalized_chars"]
+            yield normalized
+        
+        if self.stats["boilerplate_lines_removed"]:
+            logger.info(
+                f"Removed {self.stats['boilerplate_lines_removed']} repeated lines "
+                f"({len(self.frequent)} patterns) and {self.stats['removed_chars']} characters "
+                f"in total from {self.stats['pages']} pages"
+            )
+    
+    def normalize_pages(self, pages: List[str]) -> Tuple[List[str], Dict[str, Any]]:
+        """
+        Normalize the text of every page of a document.
+        
+        Args:
+            pages: Text of each page, in page order
+        
+        Returns:
+            Tuple of (normalized page texts, statistics with original_chars,
+            normalized_chars, removed_chars, boilerplate_lines_removed and
+            boilerplate_patterns)
+        """
+        self.scan(pages, rescan=lambda: pages)
+        normalized = list(self.iter_normalized(pages))
+        return normalized, dict(self.stats)
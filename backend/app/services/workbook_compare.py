@@ -0,0 +1,361 @@
+"""
+Workbook comparison and accuracy scoring service.
+Compares an extracted workbook against a reference workbook sheet by sheet,
+aligning rows by their key column (company, period, line item) and columns
+by header, and scores each sheet with cell-level precision and recall.
+"""
+
+import logging
+import math
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Values treated as "no data", matching the browser comparison
+EMPTY_VALUES = {"", "0", "not found", "null", "n/a", "na", "none", "-"}
+
+# Header names that identify a row, in order of preference
+KEY_HEADERS = [
+    "company", "company name", "period", "note #", "note number",
+    "field", "description", "note header"
+]
+
+NUMBER_PATTERN = re.compile(r"^\(?-?[\d,]*\.?\d+\)?$")
+
+
+def normalize_value(value: Any) -> Any:
+    """
+    Normalize a cell value for comparison.
+    Drops "|source" citations, maps empty markers to None and parses numbers.
+    
+    Args:
+        value: Raw cell value
+    
+    Returns:
+        None, a float or a lower-case string
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (int, float)):
+        return None if value == 0 or math.isnan(value) else float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()[:10]
+    
+    text = str(value).split("|", 1)[0].strip()
+    text = " ".join(text.split()).lower()
+    if text in EMPTY_VALUES:
+        return None
+    
+    number = text.replace("$", "").replace("%", "").replace(" ", "")
+    if NUMBER_PATTERN.match(number):
+        negative = number.startswith("(") and number.endswith(")")
+        try:
+            parsed = float(number.strip("()").replace(",", ""))
+        except ValueError:
+            return text
+        if parsed == 0:
+            return None
+        return -parsed if negative else parsed
+    
+    return text
+
+
+def _header_name(value: Any) -> str:
+    return " ".join(str(value).split()).lower() if value is not None else ""
+
+
+class WorkbookComparator:
+    """Compare a workbook against a reference workbook and score its accuracy."""
+    
+    def __init__(
+        self,
+        rel_tolerance: Optional[float] = None,
+        abs_tolerance: Optional[float] = None,
+        max_diffs: Optional[int] = None
+    ):
+        """
+        Initialize the comparator.
+        
+        Args:
+            rel_tolerance: Relative tolerance for numeric values (uses settings if not provided)
+            abs_tolerance: Absolute tolerance for numeric values (uses settings if not provided)
+            max_diffs: Maximum number of cell diffs and row keys reported per sheet
+        """
+        self.rel_tolerance = settings.COMPARE_REL_TOLERANCE if rel_tolerance is None else rel_tolerance
+        self.abs_tolerance = settings.COMPARE_ABS_TOLERANCE if abs_tolerance is None else abs_tolerance
+        self.max_diffs = settings.COMPARE_MAX_DIFFS if max_diffs is None else max_diffs
+    
+    def values_match(self, expected: Any, actual: Any) -> bool:
+        """Whether two normalized values are equivalent."""
+        if isinstance(expected, float) and isinstance(actual, float):
+            return math.isclose(expected, actual, rel_tol=self.rel_tolerance, abs_tol=self.abs_tolerance)
+        return expected == actual
+    
+    def compare(self, expected_path: str, actual_path: str) -> Dict[str, Any]:
+        """
+        Compare two workbooks.
+        Both are opened in read-only mode; only the reference rows of the
+        sheet being compared are held in memory.
+        
+        Args:
+            expected_path: Path to the reference workbook
+            actual_path: Path to the workbook being scored
+        
+        Returns:
+            Per-sheet scores and diffs plus overall totals
+        """
+        from openpyxl import load_workbook
+        
+        expected_wb = load_workbook(expected_path, read_only=True, data_only=True)
+        actual_wb = load_workbook(actual_path, read_only=True, data_only=True)
+        
+        try:
+            actual_titles = {title.strip().lower(): title for title in actual_wb.sheetnames}
+            sheets = []
+            
+            for title in expected_wb.sheetnames:
+                actual_title = actual_titles.pop(title.strip().lower(), None)
+                if actual_title is None:
+                    sheets.append(self._missing_sheet(title, expected_wb[title]))
+                    continue
+                sheets.append(self._compare_sheet(title, expected_wb[title], actual_wb[actual_title]))
+            
+            for actual_title in actual_titles.values():
+                sheets.append({"sheet": actual_title, "status": "extra"})
+        finally:
+            expected_wb.close()
+            actual_wb.close()
+        
+        return {
+            "expected": expected_path,
+            "actual": actual_path,
+            "sheets": sheets,
+            "totals": self._totals(sheets)
+        }
+    
+    def _read_header(self, rows) -> Tuple[List[str], int]:
+        """
+        Consume rows up to and including the header row.
+        The header is the first row with at least two non-empty cells, which
+        skips title rows in hand-made reference templates.
+        
+        Returns:
+            Tuple of (normalized header names, key column index)
+        """
+        for row in rows:
+            headers = [_header_name(value) for value in row]
+            if len([h for h in headers if h]) >= 2:
+                key_index = 0
+                for candidate in KEY_HEADERS:
+                    if candidate in headers:
+                        key_index = headers.index(candidate)
+                        break
+                return headers, key_index
+        return [], 0
+    
+    def _row_key(self, row: tuple, key_index: int, seen: Counter) -> Optional[Tuple[str, int]]:
+        """Key of a data row; repeated keys are numbered by occurrence."""
+        value = row[key_index] if key_index < len(row) else None
+        key = normalize_value(value)
+        if key is None:
+            if not any(normalize_value(v) is not None for v in row):
+                return None
+            key = ""
+        key = str(key)
+        seen[key] += 1
+        return key, seen[key]
+    
+    def _compare_sheet(self, title: str, expected_ws, actual_ws) -> Dict[str, Any]:
+        """Align rows by key and columns by header, then score the sheet."""
+        expected_rows = expected_ws.iter_rows(values_only=True)
+        expected_headers, expected_key = self._read_header(expected_rows)
+        key_header = expected_headers[expected_key] if expected_headers else ""
+        scored_headers = {header for header in expected_headers if header and header != key_header}
+        
+        # Reference rows keyed for lookup: {row key: {header: normalized value}}
+        expected = {}
+        seen = Counter()
+        for row in expected_rows:
+            key = self._row_key(row, expected_key, seen)
+            if key is None:
+                continue
+            expected[key] = {
+                header: normalize_value(value)
+                for header, value in zip(expected_headers, row)
+                if header in scored_headers
+            }
+        
+        actual_rows = actual_ws.iter_rows(values_only=True)
+        actual_headers, actual_key = self._read_header(actual_rows)
+        if key_header in actual_headers:
+            actual_key = actual_headers.index(key_header)
+        
+        sheet = {
+            "sheet": title,
+            "status": "compared",
+            "key_column": key_header or None,
+            "rows": {"expected": len(expected), "actual": 0, "matched": 0, "missing": 0, "extra": 0},
+            "cells": {"expected": 0, "actual": 0, "matched": 0},
+            "diffs": [],
+            "missing_rows": [],
+            "extra_rows": []
+        }
+        rows = sheet["rows"]
+        cells = sheet["cells"]
+        
+        cells["expected"] = sum(
+            1 for values in expected.values() for value in values.values() if value is not None
+        )
+        
+        seen = Counter()
+        for row in actual_rows:
+            key = self._row_key(row, actual_key, seen)
+            if key is None:
+                continue
+            rows["actual"] += 1
+            actual_values = {
+                header: normalize_value(value)
+                for header, value in zip(actual_headers, row)
+                if header in scored_headers
+            }
+            cells["actual"] += len([v for v in actual_values.values() if v is not None])
+            
+            expected_values = expected.pop(key, None)
+            if expected_values is None:
+                rows["extra"] += 1
+                self._append_capped(sheet["extra_rows"], key[0])
+                continue
+            
+            rows["matched"] += 1
+            for header, expected_value in expected_values.items():
+                actual_value = actual_values.get(header)
+                if expected_value is None and actual_value is None:
+                    continue
+                if expected_value is not None and actual_value is not None and self.values_match(expected_value, actual_value):
+                    cells["matched"] += 1
+                    continue
+                self._append_capped(sheet["diffs"], {
+                    "row": key[0],
+                    "column": header,
+                    "expected": expected_value,
+                    "actual": actual_value
+                })
+        
+        rows["missing"] = len(expected)
+        for key in expected:
+            self._append_capped(sheet["missing_rows"], key[0])
+        
+        sheet.update(self._scores(cells))
+        return sheet
+    
+    def _missing_sheet(self, title: str, expected_ws) -> Dict[str, Any]:
+        """Score a reference sheet that is absent from the compared workbook."""
+        rows = expected_ws.iter_rows(values_only=True)
+        headers, key_index = self._read_header(rows)
+        expected_cells = 0
+        for row in rows:
+            expected_cells += len([
+                value for idx, value in enumerate(row)
+                if idx != key_index and idx < len(headers) and headers[idx] and normalize_value(value) is not None
+            ])
+        cells = {"expected": expected_cells, "actual": 0, "matched": 0}
+        return {"sheet": title, "status": "missing", "cells": cells, **self._scores(cells)}
+    
+    def _append_capped(self, items: List[Any], item: Any):
+        if len(items) < self.max_diffs:
+            items.append(item)
+    
+    def _scores(self, cells: Dict[str, int]) -> Dict[str, Optional[float]]:
+        """Precision, recall and F1 from cell counts (None when undefined)."""
+        precision = cells["matched"] / cells["actual"] if cells["actual"] else None
+        recall = cells["matched"] / cells["expected"] if cells["expected"] else None
+        f1 = None
+        if precision is not None and recall is not None:
+            f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return {
+            "precision": round(precision, 4) if precision is not None else None,
+            "recall": round(recall, 4) if recall is not None else None,
+            "f1": round(f1, 4) if f1 is not None else None
+        }
+    
+    def _totals(self, sheets: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Micro-averaged scores over every scored sheet."""
+        cells = {"expected": 0, "actual": 0, "matched": 0}
+        for sheet in sheets:
+            for name in cells:
+                cells[name] += sheet.get("cells", {}).get(name, 0)
+        return {"cells": cells, **self._scores(cells)}
+
+
+def _compare_task(expected_path: str, actual_path: str, include_diffs: bool) -> Dict[str, Any]:
+    """Compare one pair of workbooks. Module-level so it can run in a worker process."""
+    report = WorkbookComparator().compare(expected_path, actual_path)
+    if not include_diffs:
+        for sheet in report["sheets"]:
+            for field in ("diffs", "missing_rows", "extra_rows"):
+                sheet.pop(field, None)
+    return report
+
+
+def compare_many(
+    pairs: List[Tuple[str, str]],
+    max_workers: Optional[int] = None,
+    include_diffs: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Compare many (expected, actual) workbook pairs in a pool of worker processes.
+    Each comparison runs in isolation, so memory use is bounded by the largest
+    single pair rather than by the size of the batch.
+    
+    Args:
+        pairs: List of (expected_path, actual_path) tuples
+        max_workers: Pool size (uses settings if not provided)
+        include_diffs: Whether to keep cell diffs and row keys in each report
+    
+    Returns:
+        One report per pair, in input order; failed pairs carry an "error" field
+    """
+    max_workers = max_workers or settings.COMPARE_WORKERS
+    reports: List[Optional[Dict[str, Any]]] = [None] * len(pairs)
+    
+    if not pairs:
+        return []
+    
+    if len(pairs) == 1 or max_workers <= 1:
+        for idx, (expected_path, actual_path) in enumerate(pairs):
+            reports[idx] = _run_inline(expected_path, actual_path, include_diffs)
+        return reports
+    
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(pairs))) as pool:
+        futures = {
+            pool.submit(_compare_task, expected_path, actual_path, include_diffs): idx
+            for idx, (expected_path, actual_path) in enumerate(pairs)
+        }
+        for future in as_completed(futures):
+            idx = futures[future]
+            expected_path, actual_path = pairs[idx]
+            try:
+                reports[idx] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to compare {actual_path} against {expected_path}: {str(e)}")
+                reports[idx] = {"expected": expected_path, "actual": actual_path, "error": str(e)}
+    
+    return reports
+
+
+def _run_inline(expected_path: str, actual_path: str, include_diffs: bool) -> Dict[str, Any]:
+    """Compare a single pair in the current process."""
+    try:
+        return _compare_task(expected_path, actual_path, include_diffs)
+    except Exception as e:
+        logger.error(f"Failed to compare {actual_path} against {expected_path}: {str(e)}")
+        return {"expected": expected_path, "actual": actual_path, "error": str(e)}
@@ -0,0 +1,63 @@
+"""
+Populate the portfolio tables from extraction results stored before they
+existed (new results are indexed when their job completes), then rebuild
+the analytics rollups of every fund.
+
+Usage:
+    python backfill_portfolio_tables.py [--all] [--limit N]
+
+Without --all, only results that have no portfolio rows yet are indexed;
+--all rebuilds the rows of every result, e.g. after a parsing fix.
+"""
+
+import argparse
+import logging
+import sys
+
+from app.database import SessionLocal, init_db
+from app.database.crud import ExtractionResultService, PortfolioService
+from app.services.analytics import rebuild_rollups
+from app.services.portfolio_tables import index_result
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("backfill_portfolio_tables")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--all", action="store_true", help="Rebuild the rows of every result")
+    parser.add_argument("--limit", type=int, default=0, help="Index at most this many results")
+    args = parser.parse_args(argv)
+    
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.all:
+            result_ids = ExtractionResultService.get_filtered_ids(db, limit=args.limit or None)
+        else:
+            result_ids = PortfolioService.get_unindexed_result_ids(db, limit=args.limit or None)
+        
+        indexed = failed = holdings = 0
+        for result_id, data in ExtractionResultService.iter_extracted_data(db, result_ids):
+            try:
+                counts = index_result(db, result_id, data, refresh_rollups=False)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Result {result_id}: {str(e)}")
+                failed += 1
+                continue
+            indexed += 1
+            holdings += counts["investments"]
+        
+        funds = rebuild_rollups(db)
+        print(
+            f"Indexed {indexed} of {len(result_ids)} results ({holdings} holdings), {failed} failed; "
+            f"rebuilt the rollups of {funds} funds"
+        )
+        return 1 if failed else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
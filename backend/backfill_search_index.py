@@ -0,0 +1,78 @@
+"""
+Index files processed before full-text search existed (new files are
+indexed when their job completes).
+
+Usage:
+    python backfill_search_index.py [--all] [--limit N]
+
+Page text is re-read from the PDF, mostly from the page cache; files whose
+PDF was removed only get their footnotes and company descriptions indexed.
+Without --all, only files that have no search documents yet are indexed;
+--all rebuilds the documents of every file with a result.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+from app.database import SessionLocal, init_db
+from app.database.crud import UploadedFileService, ExtractionResultService, SearchService
+from app.services.pdf_extractor import PDFExtractor
+from app.services.search_index import index_file
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("backfill_search_index")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--all", action="store_true", help="Rebuild the documents of every file")
+    parser.add_argument("--limit", type=int, default=0, help="Index at most this many files")
+    args = parser.parse_args(argv)
+    
+    init_db()
+    db = SessionLocal()
+    try:
+        file_ids = SearchService.get_result_file_ids(db, unindexed_only=not args.all, limit=args.limit or None)
+        
+        indexed = failed = pages = data_only = 0
+        for file_id in file_ids:
+            db_file = UploadedFileService.get_by_id(db, file_id)
+            db_result = ExtractionResultService.get_by_file_id(db, file_id)
+            if not db_file or not db_result:
+                continue
+            
+            page_texts = None
+            if os.path.exists(db_file.file_path):
+                extractor = PDFExtractor()
+                try:
+                    extractor.scan_pdf(db_file.file_path)
+                    page_texts = extractor.iter_page_texts()
+                except Exception as e:
+                    logger.warning(f"File {file_id}: pages not indexed: {str(e)}")
+            if page_texts is None:
+                data_only += 1
+            
+            try:
+                counts = index_file(db, file_id, page_texts, db_result.extracted_data)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"File {file_id}: {str(e)}")
+                failed += 1
+                continue
+            indexed += 1
+            pages += counts.get("page", 0)
+            db.expunge_all()
+        
+        print(
+            f"Indexed {indexed} of {len(file_ids)} files ({pages} pages, {data_only} without their PDF), "
+            f"{failed} failed"
+        )
+        return 1 if failed else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Benchmark the spec-driven Excel writer against the previous cell-by-cell writer.
+Generates synthetic portfolios of increasing size and times workbook generation.
+
+Usage:
+    python benchmark_excel_generator.py [--sizes 100 1000 5000] [--repeat 3]
+"""
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+from app.services.excel_generator import ExcelGenerator
+from app.services.sheet_specs import TABLE_SHEETS, LINE_ITEM_SHEETS, PORTFOLIO_SUMMARY_FIELDS
+
+logging.disable(logging.INFO)
+
+
+class CellByCellExcelGenerator(ExcelGenerator):
+    """
+    Previous implementation: a regular (in-memory) workbook, one ws.cell() call
+    per field, header styling per cell and a full auto-size pass per sheet.
+    """
+    
+    def generate_excel(self, data, output_path):
+        self.wb = Workbook()
+        del self.wb["Sheet"]
+        
+        ws = self.wb.create_sheet("Portfolio Summary")
+        self._write_headers(ws, ["Field", "Value"])
+        for row, (label, key) in enumerate(PORTFOLIO_SUMMARY_FIELDS, start=2):
+            ws[f"A{row}"] = label
+            if key is None:
+                ws[f"A{row}"].font = self.section_font
+                ws[f"B{row}"] = ""
+            else:
+                ws[f"B{row}"] = data.get("portfolio_summary", {}).get(key, "")
+        self._auto_size_columns(ws)
+        
+        for spec in TABLE_SHEETS:
+            ws = self.wb.create_sheet(spec.title)
+            self._write_headers(ws, [column.header for column in spec.columns])
+            for row_idx, item in enumerate(data.get(spec.section, []), start=2):
+                for col, column in enumerate(spec.columns, start=1):
+                    ws.cell(row=row_idx, column=col, value=item.get(column.key, ""))
+            self._auto_size_columns(ws)
+        
+        for spec in LINE_ITEM_SHEETS:
+            ws = self.wb.create_sheet(spec.title)
+            self._write_headers(ws, ["Description"] + spec.line_items)
+            section = data.get(spec.section, {})
+            for row_idx, (label, suffix) in enumerate(spec.periods, start=2):
+                ws.cell(row=row_idx, column=1, value=label)
+                for idx in range(1, len(spec.line_items) + 1):
+                    value = section.get(f"row_{idx}_{suffix}", "")
+                    ws.cell(row=row_idx, column=idx + 1, value=value if value != 0 else "")
+            ws.freeze_panes = "B2"
+            self._auto_size_columns(ws)
+        
+        self.wb.save(output_path)
+        return output_path
+    
+    def _write_headers(self, ws, headers):
+        for col, header in enumerate(headers, start=1):
+            cell = ws.cell(row=1, column=col, value=header)
+            cell.font = self.header_font
+            cell.fill = self.header_fill
+            cell.alignment = self.center_alignment
+            cell.border = self.border
+    
+    def _auto_size_columns(self, ws):
+        for column in ws.columns:
+            max_length = 0
+            for cell in column:
+                if cell.value:
+                    max_length = max(max_length, len(str(cell.value)))
+            ws.column_dimensions[get_column_letter(column[0].column)].width = min(max_length + 2, 50)
+
+
+def build_portfolio(size: int) -> dict:
+    """Build synthetic extracted data with `size` rows in every list section."""
+    rng = random.Random(size)
+    data = {
+        "portfolio_summary": {"fund_name": "Benchmark Fund", "nav": 1234567.89, "tvpi": 1.45},
+        "statement_of_cashflows": {f"row_{i}_current": rng.uniform(-1e6, 1e6) for i in range(1, 27)},
+        "pcap_statement": {f"row_{i}_current": rng.uniform(-1e6, 1e6) for i in range(1, 29)},
+        "reference_values": {"currencies": ["USD", "EUR", "GBP"]},
+    }
+    
+    for spec in TABLE_SHEETS:
+        rows = []
+        for row_num in range(size):
+            item = {}
+            for col_idx, column in enumerate(spec.columns):
+                # Mix of text and numeric columns, like real extraction output
+                if col_idx % 2:
+                    item[column.key] = round(rng.uniform(0, 1e7), 2)
+                else:
+                    item[column.key] = f"{column.header} {row_num}"
+            rows.append(item)
+        data[spec.section] = rows
+    
+    return data
+
+
+def time_generator(generator_class, data: dict, repeat: int) -> float:
+    """Return the best wall-clock time over `repeat` runs."""
+    best = float("inf")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, "benchmark.xlsx")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            generator_class().generate_excel(data, output_path)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    print("=" * 80)
+    print("EXCEL GENERATOR BENCHMARK (rows per list section, best of %d)" % args.repeat)
+    print("=" * 80)
+    print(f"{'Rows':>8} {'Cell-by-cell':>14} {'Spec writer':>14} {'Speedup':>10}")
+    
+    for size in args.sizes:
+        data = build_portfolio(size)
+        legacy = time_generator(CellByCellExcelGenerator, data, args.repeat)
+        current = time_generator(ExcelGenerator, data, args.repeat)
+        print(f"{size:>8} {legacy:>13.3f}s {current:>13.3f}s {legacy / current:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
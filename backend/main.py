@@ -2,29 +2,58 @@
 Main FastAPI application for PDF data extraction.
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Depends, Query
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Depends, Header, Query, Request, Response
+from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Any, Dict, List, Optional
 import os
 import logging
-from datetime import datetime
+from datetime import date, datetime
+from email.utils import formatdate, parsedate_to_datetime
 import shutil
 from pathlib import Path
+from urllib.parse import quote
 import time
 import uuid
+import tempfile
+import threading
 
 from app.config import settings
-from app.services.pdf_extractor import PDFExtractor
-from app.services.gemini_extractor import GeminiExtractor
-from app.services.excel_generator import ExcelGenerator
-from app.database import init_db, get_db
+from app.services.llm_client_pool import GeminiClientPool, get_client_pool, close_client_pool
+from app.services.cancellation import JobCancelledError
+from app.services.extraction_job import run_extraction_job, result_summary, upload_filenames, remove_job_files
+from app.services.job_queue import LeaseLostError, get_job_queue
+from app.services.admission import QueueFullError, get_admission_controller
+from app.services import idempotency
+from app.services.rate_limiter import get_rate_limiter
+from app.services.hedging import get_latency_tracker
+from app.services.excel_regenerator import render_workbook, regenerate_many
+from app.services.workbook_compare import WorkbookComparator
+from app.services.data_export import (
+    EXPORT_FORMATS,
+    EXPORT_SECTIONS,
+    ParquetUnavailableError,
+    check_parquet_available,
+    stream_export
+)
+from app.services.output_files import get_output_metadata, remove_output_metadata
+from app.services.retention import get_retention_manager, record_access
+from app.services.sheet_preview import load_sheets, payload_etag, get_sheet_preview_cache
+from app.services.portfolio_tables import company_key
+from app.services.analytics import EXPOSURE_DIMENSIONS, exposure, refresh_funds
+from app.services.search_index import SEARCH_SOURCES, search
+from app.database import init_db, get_db, SessionLocal
 from app.database.crud import (
     UploadedFileService,
     ExtractionResultService,
     ExtractionLogService,
-    JobStatusService
+    JobStatusService,
+    PortfolioService,
+    AnalyticsService
 )
 from app.database.models import JobStatusEnum, LogLevelEnum
 
@@ -61,9 +90,21 @@ async def startup_event():
     """Initialize database on startup."""
     logger.info("Starting application...")
     init_db()
+    if settings.RETENTION_ENABLED:
+        get_retention_manager().start()
+    if settings.GEMINI_API_KEY:
+        # Connect the Gemini clients in the background so startup is not delayed
+        threading.Thread(target=get_client_pool().warm_up, name="gemini-warmup", daemon=True).start()
     logger.info("Application started successfully")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background maintenance and close Gemini connections on shutdown."""
+    get_retention_manager().stop()
+    close_client_pool()
+
+
 @app.get("/")
 async def read_root():
     """API root endpoint."""
@@ -83,10 +124,14 @@ async def read_root():
 @app.get("/health")
 async def health_check(db: Session = Depends(get_db)):
     """Health check endpoint."""
+    job_queue_stats = None
+    admission_stats = None
     try:
         # Test database connection
-        db.execute("SELECT 1")
+        db.execute(text("SELECT 1"))
         db_status = "connected"
+        job_queue_stats = get_job_queue().stats(db)
+        admission_stats = get_admission_controller().stats(db)
     except Exception as e:
         logger.error(f"Database connection error: {str(e)}")
         db_status = "disconnected"
@@ -96,28 +141,53 @@ async def health_check(db: Session = Depends(get_db)):
         "timestamp": datetime.now().isoformat(),
         "gemini_api_configured": bool(settings.GEMINI_API_KEY),
         "database_status": db_status,
-        "database_url_configured": bool(settings.DATABASE_URL)
+        "database_url_configured": bool(settings.DATABASE_URL),
+        "rate_limiter": get_rate_limiter().stats(),
+        "gemini_client_pool": get_client_pool().stats(),
+        "gemini_latency": get_latency_tracker().stats(),
+        "job_queue": job_queue_stats,
+        "admission": admission_stats,
+        "sheet_preview_cache": get_sheet_preview_cache().stats(),
+        "retention": get_retention_manager().stats()
     }
 
 
 @app.post("/api/extract")
 async def extract_data(
+    response: Response,
     file: UploadFile = File(...),
     template_id: str = Form(default="fund_report_v1"),
-    db: Session = Depends(get_db)
+    prior_file_id: Optional[int] = Form(default=None),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db),
+    client_pool: GeminiClientPool = Depends(get_client_pool)
 ):
     """
     Extract data from uploaded PDF file.
+    The upload is stored and enqueued as a job. With the job queue enabled a
+    worker process (worker.py) picks it up and 202 is returned with the job
+    status URL; otherwise the job is processed within this request.
+    With prior_file_id (the previous report of the same fund), only pages that
+    changed since that report are sent to Gemini; the other sections are
+    inherited from its result.
+    A request repeating the Idempotency-Key of an earlier one (within
+    IDEMPOTENCY_KEY_TTL_HOURS) gets that request's job back, still running
+    (202) or finished, instead of starting a duplicate extraction.
+    New uploads are rejected with 429 and Retry-After while MAX_QUEUED_JOBS
+    jobs are pending or processing.
     
     Args:
+        response: Response, to set 202 for queued jobs
         file: Uploaded PDF file
         template_id: Template ID for extraction format
+        prior_file_id: Uploaded file ID of the previous report, for incremental extraction
+        idempotency_key: Client-generated key identifying this upload across retries
         db: Database session
+        client_pool: Shared Gemini client pool
         
     Returns:
-        Job ID and extraction results
+        Job ID and extraction results, or the job status URL if queued
     """
-    start_time = time.time()
     job_id = str(uuid.uuid4())
     
     logger.info(f"[{job_id}] Received extraction request for file: {file.filename}")
@@ -126,247 +196,364 @@ async def extract_data(
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # Check API key
+    # Check API key (workers need it too, and use the same settings)
     if not settings.GEMINI_API_KEY:
         raise HTTPException(
             status_code=500,
             detail="Gemini API key not configured. Please set GEMINI_API_KEY in .env file"
         )
     
-    # Generate unique filenames
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_filename = file.filename.replace(" ", "_").replace(".pdf", "")
-    pdf_filename = f"{safe_filename}_{timestamp}.pdf"
-    pdf_path = os.path.join(settings.UPLOAD_DIR, pdf_filename)
-    excel_filename = f"{safe_filename}_extracted_{timestamp}.xlsx"
-    excel_path = os.path.join(settings.OUTPUT_DIR, excel_filename)
-    
-    # Get file size
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Seek back to start
-    
-    db_file = None
-    db_job = None
+    fingerprint = None
+    if idempotency_key is not None:
+        idempotency_key = idempotency_key.strip()
+        if not idempotency_key or len(idempotency_key) > idempotency.MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Idempotency-Key must be 1 to {idempotency.MAX_KEY_LENGTH} characters"
+            )
+        fingerprint = await run_in_threadpool(
+            idempotency.request_fingerprint, file.file, template_id, prior_file_id
+        )
+        try:
+            existing_job = idempotency.find_job(db, idempotency_key, fingerprint)
+        except idempotency.IdempotencyKeyReusedError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if existing_job:
+            return _replay_job(db, existing_job, response)
     
+    # Admissions of this process are counted until their job is created
     try:
-        # Save uploaded file first
-        logger.info(f"[{job_id}] Saving uploaded file to: {pdf_path}")
-        with open(pdf_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Create uploaded file record in database
-        db_file = UploadedFileService.create(
-            db=db,
-            filename=pdf_filename,
-            original_filename=file.filename,
-            file_path=pdf_path,
-            file_size=file_size
-        )
-        
-        # Now we can create logs with the proper file_id
-        ExtractionLogService.create(
-            db, db_file.id, f"Starting extraction for {file.filename}", 
-            LogLevelEnum.INFO, "initialization"
-        )
-        
-        # Create job status record
-        db_job = JobStatusService.create(db=db, file_id=db_file.id, job_id=job_id)
-        
-        ExtractionLogService.create(
-            db, db_file.id, f"File uploaded successfully: {pdf_filename}", 
-            LogLevelEnum.INFO, "upload"
-        )
-        
-        # Update job status: Processing
-        JobStatusService.update_status(
-            db, job_id, JobStatusEnum.PROCESSING, 
-            "extracting_text", 20
-        )
-        
-        # Step 1: Extract text from PDF
-        logger.info(f"[{job_id}] Step 1: Extracting text from PDF...")
-        step_start = time.time()
-        pdf_extractor = PDFExtractor()
-        extracted_text = pdf_extractor.extract_text_from_pdf(pdf_path)
-        step_duration = int((time.time() - step_start) * 1000)
-        
-        logger.info(f"[{job_id}] Extracted {len(extracted_text)} characters from PDF")
-        ExtractionLogService.create(
-            db, db_file.id, 
-            f"Extracted {len(extracted_text)} characters from PDF",
-            LogLevelEnum.INFO, "text_extraction", step_duration
-        )
-        
-        # Update job status
-        JobStatusService.update_status(
-            db, job_id, JobStatusEnum.PROCESSING, 
-            "processing_with_ai", 40
-        )
-        
-        # Step 2: Send to Gemini for data extraction
-        logger.info(f"[{job_id}] Step 2: Sending text to Gemini API for data extraction...")
-        step_start = time.time()
-        gemini_extractor = GeminiExtractor()
-        structured_data = gemini_extractor.extract_with_retry(extracted_text, max_retries=2)
-        step_duration = int((time.time() - step_start) * 1000)
-        
-        logger.info(f"[{job_id}] Successfully extracted structured data from Gemini")
-        ExtractionLogService.create(
-            db, db_file.id, 
-            f"AI extraction completed using {settings.GEMINI_MODEL}",
-            LogLevelEnum.INFO, "ai_processing", step_duration
-        )
-        
-        # Update job status
-        JobStatusService.update_status(
-            db, job_id, JobStatusEnum.PROCESSING, 
-            "generating_excel", 70
-        )
-        
-        # Step 3: Generate Excel file
-        logger.info(f"[{job_id}] Step 3: Generating Excel file...")
-        step_start = time.time()
-        excel_generator = ExcelGenerator()
-        output_path = excel_generator.generate_excel(structured_data, excel_path)
-        step_duration = int((time.time() - step_start) * 1000)
-        
-        logger.info(f"[{job_id}] Excel file generated: {output_path}")
-        ExtractionLogService.create(
-            db, db_file.id, 
-            f"Excel file generated: {excel_filename}",
-            LogLevelEnum.INFO, "excel_generation", step_duration
-        )
-        
-        # Calculate processing time
-        total_processing_time = time.time() - start_time
-        
-        # Count sheets if structured_data is available
-        total_sheets = 0
-        if isinstance(structured_data, dict):
-            total_sheets = len(structured_data.get("sheets", []))
-        
-        # Create extraction result record
-        db_result = ExtractionResultService.create(
-            db=db,
-            file_id=db_file.id,
-            excel_filename=excel_filename,
-            excel_path=excel_path,
-            extracted_data=structured_data if isinstance(structured_data, dict) else None,
-            processing_time=total_processing_time,
-            total_characters_extracted=len(extracted_text),
-            total_sheets_generated=total_sheets,
-            gemini_model_used=settings.GEMINI_MODEL
-        )
-        
-        # Update job status: Completed
-        JobStatusService.update_status(
-            db, job_id, JobStatusEnum.COMPLETED, 
-            "completed", 100
-        )
-        
-        ExtractionLogService.create(
-            db, db_file.id, 
-            f"Extraction completed successfully in {total_processing_time:.2f}s",
-            LogLevelEnum.INFO, "completion"
-        )
-        
+        with get_admission_controller().admit(db):
+            if prior_file_id is not None:
+                prior_file = UploadedFileService.get_by_id(db, prior_file_id)
+                if not prior_file:
+                    raise HTTPException(status_code=404, detail="Prior file not found")
+                prior_result = ExtractionResultService.get_by_file_id(db, prior_file_id)
+                if not prior_result or not isinstance(prior_result.extracted_data, dict):
+                    raise HTTPException(status_code=409, detail="Prior file has no extracted data to reuse")
+            
+            # Generate unique filenames
+            pdf_filename, _ = upload_filenames(file.filename)
+            pdf_path = os.path.join(settings.UPLOAD_DIR, pdf_filename)
+            
+            # Get file size
+            file.file.seek(0, 2)  # Seek to end
+            file_size = file.file.tell()
+            file.file.seek(0)  # Seek back to start
+            
+            try:
+                # Save uploaded file first
+                logger.info(f"[{job_id}] Saving uploaded file to: {pdf_path}")
+                with open(pdf_path, "wb") as buffer:
+                    shutil.copyfileobj(file.file, buffer)
+                
+                # Create uploaded file record in database
+                db_file = UploadedFileService.create(
+                    db=db,
+                    filename=pdf_filename,
+                    original_filename=file.filename,
+                    file_path=pdf_path,
+                    file_size=file_size
+                )
+                
+                # Now we can create logs with the proper file_id
+                ExtractionLogService.create(
+                    db, db_file.id, f"Starting extraction for {file.filename}", 
+                    LogLevelEnum.INFO, "initialization"
+                )
+                
+                # Create the job; it is pending until a worker claims it
+                JobStatusService.create(
+                    db=db, file_id=db_file.id, job_id=job_id,
+                    template_id=template_id, prior_file_id=prior_file_id,
+                    idempotency_key=idempotency_key, request_fingerprint=fingerprint
+                )
+                
+                ExtractionLogService.create(
+                    db, db_file.id, f"File uploaded successfully: {pdf_filename}", 
+                    LogLevelEnum.INFO, "upload"
+                )
+            except IntegrityError:
+                # A concurrent request with the same Idempotency-Key created its job first
+                UploadedFileService.delete(db, db_file.id)
+                existing_job = JobStatusService.get_by_idempotency_key(db, idempotency_key) if idempotency_key else None
+                # Retries within the same second share the first request's storage name
+                if os.path.exists(pdf_path) and not (existing_job and existing_job.uploaded_file.file_path == pdf_path):
+                    os.remove(pdf_path)
+                if existing_job is None:
+                    raise HTTPException(status_code=500, detail="Extraction failed: could not create the job")
+                return _replay_job(db, existing_job, response)
+            except Exception as e:
+                logger.error(f"[{job_id}] Error storing upload: {str(e)}", exc_info=True)
+                if os.path.exists(pdf_path):
+                    os.remove(pdf_path)
+                raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    job = None if settings.JOB_QUEUE_ENABLED else get_job_queue().claim(db, job_id=job_id)
+    if job is None:
+        logger.info(f"[{job_id}] Queued for a worker")
+        response.status_code = 202
         return {
             "success": True,
-            "message": "Data extracted successfully",
+            "message": "Extraction queued",
             "job_id": job_id,
             "file_id": db_file.id,
-            "output_file": excel_filename,
-            "download_url": f"/api/download/{excel_filename}",
-            "processing_time": f"{total_processing_time:.2f}s",
-            "characters_extracted": len(extracted_text),
-            "sheets_generated": total_sheets
+            "status": JobStatusEnum.PENDING.value,
+            "status_url": f"/api/jobs/{job_id}"
         }
         
+    try:
+        # In the threadpool, so the job can be cancelled while it runs
+        return await run_in_threadpool(_run_claimed_job, db, job, client_pool)
+    except LeaseLostError as e:
+        raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
+    except JobCancelledError:
+        raise HTTPException(status_code=409, detail="Extraction cancelled")
     except Exception as e:
-        logger.error(f"[{job_id}] Error during extraction: {str(e)}", exc_info=True)
-        
-        # Log error to database if file record exists
-        if db_file:
-            ExtractionLogService.create(
-                db, db_file.id, 
-                f"Extraction failed: {str(e)}",
-                LogLevelEnum.ERROR, "error"
-            )
-            
-            # Update job status to failed
-            if db_job:
-                JobStatusService.update_status(
-                    db, job_id, JobStatusEnum.FAILED,
-                    error_message=str(e)
-                )
-        
-        # Clean up files on error
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
-        if os.path.exists(excel_path):
-            os.remove(excel_path)
-        
         raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
 
 
+def _replay_job(db: Session, db_job, response: Response) -> dict:
+    """Respond to a repeated Idempotency-Key with the job of the first request."""
+    logger.info(f"[{db_job.job_id}] Returning the existing job for a repeated Idempotency-Key")
+    response.headers["Idempotent-Replayed"] = "true"
+    if db_job.status == JobStatusEnum.COMPLETED:
+        db_result = ExtractionResultService.get_by_file_id(db, db_job.file_id)
+        if db_result:
+            return result_summary(db_result, db_job.job_id)
+    
+    response.status_code = 202
+    return {
+        "success": True,
+        "message": "Extraction already in progress",
+        "job_id": db_job.job_id,
+        "file_id": db_job.file_id,
+        "status": db_job.status.value,
+        "status_url": f"/api/jobs/{db_job.job_id}"
+    }
+
+
+def _run_claimed_job(db: Session, job, client_pool: GeminiClientPool) -> dict:
+    """Run a job claimed by this process under a heartbeated lease."""
+    with get_job_queue().lease(job) as lease:
+        return run_extraction_job(db, job, client_pool, lease=lease)
+
+
 @app.get("/api/download/{filename}")
-async def download_file(filename: str):
+async def download_file(
+    filename: str,
+    request: Request,
+    v: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
     """
     Download generated Excel file.
+    Supports conditional (If-None-Match / If-Modified-Since) and Range requests.
     
     Args:
         filename: Name of the file to download
+        request: Incoming request (for conditional and Range headers)
+        v: Content hash of the expected version; makes the response immutable
+        db: Database session (to restore evicted files)
         
     Returns:
         Excel file for download
     """
-    file_path = os.path.join(settings.OUTPUT_DIR, filename)
-    
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="File not found")
-    
-    # Security check - ensure filename doesn't contain path traversal
-    if ".." in filename or "/" in filename or "\\" in filename:
-        raise HTTPException(status_code=400, detail="Invalid filename")
-    
-    return FileResponse(
-        path=file_path,
-        filename=filename,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    file_path = await _output_file_path(filename, db)
+    return _cached_file_response(
+        request, file_path, v,
+        headers={"Content-Disposition": _content_disposition(filename)}
     )
 
 
 @app.get("/api/preview/{filename}")
-async def preview_file(filename: str):
+async def preview_file(
+    filename: str,
+    request: Request,
+    v: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
     """
     Get Excel file for preview (returns file content for browser parsing).
+    Supports conditional (If-None-Match / If-Modified-Since) and Range requests.
     
     Args:
         filename: Name of the file to preview
-        
+        request: Incoming request (for conditional and Range headers)
+        v: Content hash of the expected version; makes the response immutable
+        db: Database session (to restore evicted files)
+    
     Returns:
         Excel file content
     """
-    file_path = os.path.join(settings.OUTPUT_DIR, filename)
+    file_path = await _output_file_path(filename, db)
+    return _cached_file_response(
+        request, file_path, v,
+        headers={"Access-Control-Allow-Origin": "*"}
+    )
+
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+async def _output_file_path(filename: str, db: Session) -> str:
+    """
+    Resolve an output filename, rejecting path traversal.
+    A workbook removed by the retention manager is rebuilt from its stored data.
+    """
+    # Security check - ensure filename doesn't contain path traversal
+    if ".." in filename or "/" in filename or "\\" in filename:
+        raise HTTPException(status_code=400, detail="Invalid filename")
     
+    file_path = os.path.join(settings.OUTPUT_DIR, filename)
     if not os.path.exists(file_path):
+        db_result = ExtractionResultService.get_by_excel_filename(db, filename)
+        if not db_result or not db_result.extracted_data:
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        rendered = await run_in_threadpool(render_workbook, db_result.extracted_data, file_path)
+        ExtractionResultService.mark_excel_evicted(db, [db_result.id], None)
+        ExtractionLogService.create(
+            db, db_result.file_id,
+            f"Evicted Excel file restored from stored data: {filename}",
+            LogLevelEnum.INFO, "excel_regeneration", rendered["duration_ms"]
+        )
+    
+    record_access(file_path)
+    return file_path
+
+
+def _content_disposition(filename: str) -> str:
+    """Attachment header, RFC 5987-encoded for non-ASCII names."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def _cached_file_response(request: Request, file_path: str, version: Optional[str], headers: dict):
+    """
+    Serve an output file with validators, 304 handling and single-range support.
+    
+    Args:
+        request: Incoming request
+        file_path: Path to the output file
+        version: Content hash from the URL, if any
+        headers: Extra response headers
+    
+    Returns:
+        304, 206, 416 or full file response
+    """
+    metadata = get_output_metadata(file_path)
+    if metadata is None:
         raise HTTPException(status_code=404, detail="File not found")
     
-    # Security check - ensure filename doesn't contain path traversal
-    if ".." in filename or "/" in filename or "\\" in filename:
-        raise HTTPException(status_code=400, detail="Invalid filename")
+    etag = f'"{metadata["sha256"]}"'
+    headers = dict(headers)
+    headers.update({
+        "ETag": etag,
+        "Last-Modified": formatdate(metadata["mtime"], usegmt=True),
+        "Accept-Ranges": "bytes",
+        # Versioned URLs never change content; plain URLs must be revalidated
+        "Cache-Control": "public, max-age=31536000, immutable"
+        if version == metadata["sha256"] else "no-cache"
+    })
     
-    return FileResponse(
-        path=file_path,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Access-Control-Allow-Origin": "*",
-            "Cache-Control": "no-cache"
-        }
+    if _not_modified(request, etag, metadata["mtime"]):
+        return Response(status_code=304, headers=headers)
+    
+    size = metadata["size"]
+    byte_range = _parse_range(request, etag, metadata["mtime"], size)
+    if byte_range == "unsatisfiable":
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+    
+    if byte_range is None:
+        return FileResponse(path=file_path, media_type=XLSX_MEDIA_TYPE, headers=headers)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _iter_file_range(file_path, start, end),
+        status_code=206,
+        media_type=XLSX_MEDIA_TYPE,
+        headers=headers
     )
 
 
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    
+    return False
+
+
+def _parse_range(request: Request, etag: str, mtime: float, size: int):
+    """
+    Parse a single-range Range header.
+        
+    Returns:
+        (start, end) inclusive byte offsets, None to serve the whole file,
+        or "unsatisfiable"
+    """
+    range_header = request.headers.get("range")
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    
+    # A stale If-Range means the client's partial copy is outdated
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag and if_range != formatdate(mtime, usegmt=True):
+        return None
+    
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        # Multipart ranges are not supported; the full file is a valid answer
+        return None
+    
+    first, _, last = spec.partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, min(end, size - 1)
+
+
+def _iter_file_range(file_path: str, start: int, end: int):
+    """Yield the bytes of a file between two inclusive offsets."""
+    with open(file_path, "rb") as handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = handle.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
 @app.get("/api/templates")
 async def list_templates():
     """List available extraction templates."""
@@ -457,6 +644,7 @@ async def get_file_details(
         "file_size": db_file.file_size,
         "mime_type": db_file.mime_type,
         "upload_timestamp": db_file.upload_timestamp.isoformat(),
+        "evicted_at": db_file.evicted_at.isoformat() if db_file.evicted_at else None,
     }
     
     # Add extraction result if available
@@ -467,10 +655,13 @@ async def get_file_details(
             "excel_filename": er.excel_filename,
             "excel_path": er.excel_path,
             "extraction_timestamp": er.extraction_timestamp.isoformat(),
+            "excel_evicted_at": er.excel_evicted_at.isoformat() if er.excel_evicted_at else None,
             "processing_time": er.processing_time,
             "total_characters_extracted": er.total_characters_extracted,
             "total_sheets_generated": er.total_sheets_generated,
-            "gemini_model_used": er.gemini_model_used
+            "gemini_model_used": er.gemini_model_used,
+            "base_file_id": er.base_file_id,
+            "inherited_sections": er.inherited_sections
         }
     
     # Add job status if available
@@ -510,6 +701,10 @@ async def get_job_status(
     if not db_job:
         raise HTTPException(status_code=404, detail="Job not found")
     
+    db_result = None
+    if db_job.status == JobStatusEnum.COMPLETED:
+        db_result = ExtractionResultService.get_by_file_id(db, db_job.file_id)
+    
     return {
         "job_id": db_job.job_id,
         "file_id": db_job.file_id,
@@ -520,7 +715,58 @@ async def get_job_status(
         "started_at": db_job.started_at.isoformat() if db_job.started_at else None,
         "completed_at": db_job.completed_at.isoformat() if db_job.completed_at else None,
         "error_message": db_job.error_message,
-        "retry_count": db_job.retry_count
+        "retry_count": db_job.retry_count,
+        "worker_id": db_job.worker_id,
+        "heartbeat_at": db_job.heartbeat_at.isoformat() if db_job.heartbeat_at else None,
+        "lease_expires_at": db_job.lease_expires_at.isoformat() if db_job.lease_expires_at else None,
+        "result": result_summary(db_result, db_job.job_id) if db_result else None
+    }
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(
+    job_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Cancel a pending or running job.
+    A pending job is never started. A running job stops at its next
+    checkpoint (between PDF pages, Gemini calls or Excel sheets) without
+    making further Gemini calls, and its files are removed.
+    
+    Args:
+        job_id: Job UUID
+        db: Database session
+    
+    Returns:
+        Job ID and its new status
+    """
+    db_job = JobStatusService.get_by_job_id(db, job_id)
+    if not db_job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    previous_status = db_job.status
+    
+    if not get_job_queue().cancel(db, job_id):
+        db.refresh(db_job)
+        raise HTTPException(status_code=409, detail=f"Job already {db_job.status.value}")
+    
+    if previous_status == JobStatusEnum.PENDING:
+        # Never claimed, so no worker will clean up after it
+        remove_job_files(db_job.uploaded_file.file_path, None)
+        message = "Job cancelled before it started"
+    else:
+        message = "Cancellation requested; the job stops at its next checkpoint"
+    
+    ExtractionLogService.create(
+        db, db_job.file_id, f"Cancellation requested ({previous_status.value})",
+        LogLevelEnum.INFO, "cancelled"
+    )
+    logger.info(f"[{job_id}] {message}")
+    return {
+        "job_id": job_id,
+        "status": JobStatusEnum.CANCELLED.value,
+        "previous_status": previous_status.value,
+        "message": message
     }
 
 
@@ -569,7 +815,8 @@ async def list_jobs(
                 "progress_percentage": j.progress_percentage,
                 "created_at": j.created_at.isoformat(),
                 "completed_at": j.completed_at.isoformat() if j.completed_at else None,
-                "error_message": j.error_message
+                "error_message": j.error_message,
+                "worker_id": j.worker_id
             }
             for j in jobs
         ]
@@ -677,6 +924,47 @@ async def list_results(
     }
 
 
+@app.get("/api/results/export")
+async def export_results(
+    section: str = Query(...),
+    format: str = Query("csv"),
+    result_ids: Optional[str] = Query(None),
+    gemini_model: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    limit: int = Query(1000, ge=1),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream one section of many results, concatenated, as CSV, JSON Lines or Parquet.
+    
+    Args:
+        section: Section of extracted_data to export (e.g. "schedule_of_investments")
+        format: "csv", "jsonl" or "parquet"
+        result_ids: Comma-separated result IDs (overrides the filters)
+        gemini_model: Only results extracted with this Gemini model
+        since: Only results extracted at or after this time
+        until: Only results extracted at or before this time
+        limit: Maximum number of results to export
+        db: Database session
+    
+    Returns:
+        Streaming export, one record per row with a result_id column
+    """
+    if result_ids:
+        try:
+            ids = [int(value) for value in result_ids.split(",") if value.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="result_ids must be comma-separated integers")
+    else:
+        ids = ExtractionResultService.get_filtered_ids(
+            db, gemini_model_used=gemini_model, since=since, until=until,
+            limit=min(limit, settings.EXPORT_MAX_RESULTS)
+        )
+    
+    return _export_response(ids[:settings.EXPORT_MAX_RESULTS], section, format, f"results_{section}")
+
+
 @app.get("/api/results/{result_id}")
 async def get_result_details(
     result_id: int,
@@ -704,10 +992,13 @@ async def get_result_details(
         "excel_filename": db_result.excel_filename,
         "excel_path": db_result.excel_path,
         "extraction_timestamp": db_result.extraction_timestamp.isoformat(),
+        "excel_evicted_at": db_result.excel_evicted_at.isoformat() if db_result.excel_evicted_at else None,
         "processing_time": db_result.processing_time,
         "total_characters_extracted": db_result.total_characters_extracted,
         "total_sheets_generated": db_result.total_sheets_generated,
-        "gemini_model_used": db_result.gemini_model_used
+        "gemini_model_used": db_result.gemini_model_used,
+        "base_file_id": db_result.base_file_id,
+        "inherited_sections": db_result.inherited_sections
     }
     
     if include_data and db_result.extracted_data:
@@ -716,6 +1007,629 @@ async def get_result_details(
     return result
 
 
+def _missing_excel_result_ids(
+    db: Session,
+    gemini_model: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    limit: int,
+    batch_size: int = 500
+) -> List[int]:
+    """
+    IDs of up to `limit` matching results whose Excel file is missing from disk.
+    Pages through every matching result, since the files that still exist
+    can be any number of them.
+    """
+    result_ids = []
+    skip = 0
+    while len(result_ids) < limit:
+        rows = ExtractionResultService.get_filtered_excel_paths(
+            db, gemini_model_used=gemini_model, since=since, until=until, skip=skip, limit=batch_size
+        )
+        if not rows:
+            break
+        result_ids.extend(result_id for result_id, excel_path in rows if not os.path.exists(excel_path))
+        skip += len(rows)
+    return result_ids[:limit]
+
+
+@app.post("/api/results/regenerate")
+async def regenerate_results(
+    gemini_model: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    missing_only: bool = Query(False),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    Regenerate Excel files for every result matching a filter, using a worker pool.
+    
+    Args:
+        gemini_model: Only results extracted with this Gemini model
+        since: Only results extracted at or after this time
+        until: Only results extracted at or before this time
+        missing_only: Only results whose Excel file is missing from disk
+        limit: Maximum number of results to regenerate
+        db: Database session
+        
+    Returns:
+        Per-result regeneration outcome
+    """
+    start_time = time.time()
+    if missing_only:
+        results = ExtractionResultService.get_by_ids(
+            db, _missing_excel_result_ids(db, gemini_model, since, until, limit)
+        )
+    else:
+        results = ExtractionResultService.get_filtered(
+            db, gemini_model_used=gemini_model, since=since, until=until, limit=limit
+        )
+    
+    tasks = [
+        {"result_id": r.id, "data": r.extracted_data, "output_path": r.excel_path}
+        for r in results
+    ]
+    # The worker pool blocks until every workbook is written
+    outcomes = await run_in_threadpool(regenerate_many, tasks)
+    
+    ExtractionResultService.mark_excel_evicted(
+        db, [o["result_id"] for o in outcomes if o["success"]], None
+    )
+    
+    file_ids = {r.id: r.file_id for r in results}
+    for outcome in outcomes:
+        if outcome["success"]:
+            ExtractionLogService.create(
+                db, file_ids[outcome["result_id"]],
+                "Excel file regenerated from stored data",
+                LogLevelEnum.INFO, "excel_regeneration", outcome["duration_ms"]
+            )
+    
+    return {
+        "total": len(outcomes),
+        "succeeded": len([o for o in outcomes if o["success"]]),
+        "failed": len([o for o in outcomes if not o["success"]]),
+        "regeneration_time": f"{time.time() - start_time:.2f}s",
+        "results": outcomes
+    }
+
+
+@app.post("/api/results/{result_id}/regenerate")
+async def regenerate_result(
+    result_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Rebuild the Excel file of a result from its stored extracted data.
+    
+    Args:
+        result_id: Result ID
+        db: Database session
+        
+    Returns:
+        Regenerated file details
+    """
+    db_result = ExtractionResultService.get_by_id(db, result_id)
+    if not db_result:
+        raise HTTPException(status_code=404, detail="Result not found")
+    
+    if not db_result.extracted_data:
+        raise HTTPException(status_code=409, detail="Result has no stored extracted data to regenerate from")
+    
+    try:
+        rendered = await run_in_threadpool(render_workbook, db_result.extracted_data, db_result.excel_path)
+    except Exception as e:
+        logger.error(f"Failed to regenerate Excel for result {result_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Regeneration failed: {str(e)}")
+    
+    ExtractionResultService.mark_excel_evicted(db, [db_result.id], None)
+    ExtractionLogService.create(
+        db, db_result.file_id,
+        f"Excel file regenerated from stored data: {db_result.excel_filename}",
+        LogLevelEnum.INFO, "excel_regeneration", rendered["duration_ms"]
+    )
+    
+    return {
+        "success": True,
+        "result_id": db_result.id,
+        "output_file": db_result.excel_filename,
+        "download_url": f"/api/download/{db_result.excel_filename}?v={rendered['sha256']}",
+        "regeneration_time_ms": rendered["duration_ms"]
+    }
+
+
+@app.get("/api/results/{result_id}/sheets")
+async def list_result_sheets(
+    result_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    """
+    List the sheets of a result's workbook with their columns and row counts.
+    
+    Args:
+        result_id: Result ID
+        request: Incoming request (for If-None-Match)
+        response: Outgoing response (for caching headers)
+        db: Database session
+    
+    Returns:
+        Sheet keys, titles, columns and row counts
+    """
+    db_result = ExtractionResultService.get_by_id_deferred(db, result_id)
+    if not db_result:
+        raise HTTPException(status_code=404, detail="Result not found")
+    
+    parsed = load_sheets(db_result)
+    if parsed is None:
+        raise HTTPException(status_code=404, detail="Result has no stored data or Excel file")
+    
+    sheets = []
+    for key in parsed.keys():
+        sheet = parsed.get(key)
+        sheets.append({
+            "key": sheet["key"],
+            "title": sheet["title"],
+            "columns": sheet["columns"],
+            "total_rows": len(sheet["rows"])
+        })
+    
+    payload = {"result_id": result_id, "source": parsed.source, "sheets": sheets}
+    return _cacheable_json(request, response, payload)
+
+
+@app.get("/api/results/{result_id}/sheets/{sheet}")
+async def get_result_sheet_rows(
+    result_id: int,
+    sheet: str,
+    request: Request,
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    Get a page of rows of one sheet of a result's workbook.
+    
+    Args:
+        result_id: Result ID
+        sheet: Sheet key (e.g. "schedule_of_investments") or title
+        request: Incoming request (for If-None-Match)
+        response: Outgoing response (for caching headers)
+        offset: Index of the first row (after the header row)
+        limit: Maximum number of rows to return
+        db: Database session
+    
+    Returns:
+        Sheet columns, total row count and the requested rows
+    """
+    db_result = ExtractionResultService.get_by_id_deferred(db, result_id)
+    if not db_result:
+        raise HTTPException(status_code=404, detail="Result not found")
+    
+    parsed = load_sheets(db_result)
+    if parsed is None:
+        raise HTTPException(status_code=404, detail="Result has no stored data or Excel file")
+    
+    key = parsed.resolve(sheet)
+    if key is None:
+        raise HTTPException(status_code=404, detail=f"Sheet not found: {sheet}")
+    
+    data = parsed.get(key)
+    payload = {
+        "result_id": result_id,
+        "sheet": data["key"],
+        "title": data["title"],
+        "columns": data["columns"],
+        "offset": offset,
+        "limit": limit,
+        "total_rows": len(data["rows"]),
+        "rows": data["rows"][offset:offset + limit]
+    }
+    return _cacheable_json(request, response, payload)
+
+
+def _cacheable_json(request: Request, response: Response, payload: dict):
+    """Return a JSON payload with an ETag, or 304 if the client already has it."""
+    etag = payload_etag(payload)
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=0, must-revalidate"}
+    
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return payload
+
+
+@app.get("/api/results/{result_id}/export")
+async def export_result(
+    result_id: int,
+    section: str = Query(...),
+    format: str = Query("csv"),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream one section of a result's extracted data as CSV, JSON Lines or Parquet.
+    
+    Args:
+        result_id: Result ID
+        section: Section of extracted_data to export (e.g. "schedule_of_investments")
+        format: "csv", "jsonl" or "parquet"
+        db: Database session
+    
+    Returns:
+        Streaming export, one record per row
+    """
+    has_data = ExtractionResultService.has_extracted_data(db, result_id)
+    if has_data is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    
+    if not has_data:
+        raise HTTPException(status_code=409, detail="Result has no stored extracted data to export")
+    
+    return _export_response([result_id], section, format, f"result_{result_id}_{section}")
+
+
+def _export_response(result_ids: list, section: str, export_format: str, filename_stem: str):
+    """
+    Validate export parameters and build the streaming response.
+    Rows are read from the database one batch of results at a time, in a
+    session owned by the stream, as the response is being sent.
+    """
+    if section not in EXPORT_SECTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown section: {section}. Expected one of: {', '.join(EXPORT_SECTIONS)}"
+        )
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format: {export_format}. Expected one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    if export_format == "parquet":
+        try:
+            check_parquet_available()
+        except ParquetUnavailableError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+    
+    def results():
+        db = SessionLocal()
+        try:
+            yield from ExtractionResultService.iter_extracted_data(db, result_ids)
+        finally:
+            db.close()
+    
+    return StreamingResponse(
+        stream_export(results(), section, export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": _content_disposition(f"{filename_stem}.{export_format}")}
+    )
+
+
+@app.get("/api/portfolio/holdings")
+async def list_holdings(
+    company: Optional[str] = Query(None),
+    fund: Optional[str] = Query(None),
+    industry: Optional[str] = Query(None),
+    reported_since: Optional[date] = Query(None),
+    reported_until: Optional[date] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    List holdings across all extraction results from the portfolio tables.
+    
+    Args:
+        company: Company name (matched ignoring case, punctuation and legal-form suffixes)
+        fund: Exact fund name
+        industry: Exact industry, from the company profile of the same report
+        reported_since: Only holdings reported on or after this date
+        reported_until: Only holdings reported on or before this date
+        skip: Number of records to skip
+        limit: Maximum number of records to return
+        db: Database session
+    
+    Returns:
+        Holdings, most recently reported first
+    """
+    holdings = PortfolioService.get_holdings(
+        db,
+        company_key=company_key(company) if company else None,
+        fund=fund,
+        industry=industry,
+        reported_since=reported_since,
+        reported_until=reported_until,
+        skip=skip,
+        limit=limit
+    )
+    
+    return {
+        "total": len(holdings),
+        "skip": skip,
+        "limit": limit,
+        "holdings": [
+            {
+                "id": h.id,
+                "result_id": h.result_id,
+                "company": h.company,
+                "fund": h.fund,
+                "industry": h.industry,
+                "reported_date": h.reported_date.isoformat() if h.reported_date else None,
+                "investment_status": h.investment_status,
+                "security_type": h.security_type,
+                "total_invested": h.total_invested,
+                "current_cost": h.current_cost,
+                "reported_value": h.reported_value,
+                "realized_proceeds": h.realized_proceeds,
+                "investment_multiple": h.investment_multiple,
+                "irr": h.irr
+            }
+            for h in holdings
+        ]
+    }
+
+
+@app.get("/api/analytics/exposure")
+async def analytics_exposure(
+    dimension: str = Query("industry"),
+    currency: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Exposure by industry or region across all funds, from each fund's latest report.
+    
+    Args:
+        dimension: "industry" or "region"
+        currency: Only funds reporting in this currency (amounts are summed per currency)
+        db: Database session
+    
+    Returns:
+        Buckets with amount, percentage of the currency total and number of funds
+    """
+    if dimension not in EXPOSURE_DIMENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported dimension '{dimension}'. Use one of: {', '.join(EXPOSURE_DIMENSIONS)}"
+        )
+    
+    return {
+        "dimension": dimension,
+        "currency": currency,
+        "buckets": exposure(db, dimension, currency)
+    }
+
+
+@app.get("/api/analytics/fund-trends")
+async def analytics_fund_trends(
+    fund: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    NAV, TVPI, DPI and IRR of each fund per calendar quarter, from the last
+    report dated in that quarter.
+    
+    Args:
+        fund: Fund name (matched ignoring case, punctuation and legal-form suffixes)
+        db: Database session
+    
+    Returns:
+        Funds with their quarters in chronological order
+    """
+    funds: Dict[str, Dict[str, Any]] = {}
+    for q in AnalyticsService.get_fund_trends(db, fund_key=company_key(fund) if fund else None):
+        entry = funds.setdefault(q.fund_key, {"fund_key": q.fund_key, "fund_name": q.fund_name, "quarters": []})
+        entry["fund_name"] = q.fund_name or entry["fund_name"]
+        entry["quarters"].append({
+            "quarter": q.quarter,
+            "report_date": q.report_date.isoformat(),
+            "result_id": q.result_id,
+            "nav": q.nav,
+            "tvpi": q.tvpi,
+            "dpi": q.dpi,
+            "rvpi": q.rvpi,
+            "irr": q.irr,
+            "total_commitments": q.total_commitments
+        })
+    
+    return {"total": len(funds), "funds": list(funds.values())}
+
+
+@app.get("/api/analytics/top-holdings")
+async def analytics_top_holdings(
+    limit: int = Query(20, ge=1, le=500),
+    fund: Optional[str] = Query(None),
+    industry: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Largest holdings by reported value, from each fund's latest report.
+    
+    Args:
+        limit: Number of holdings to return
+        fund: Fund name (matched ignoring case, punctuation and legal-form suffixes)
+        industry: Exact industry, from the company profile of the same report
+        db: Database session
+    
+    Returns:
+        Holdings, largest reported value first
+    """
+    rows = AnalyticsService.get_top_holdings(
+        db, limit=limit, fund_key=company_key(fund) if fund else None, industry=industry
+    )
+    
+    return {
+        "total": len(rows),
+        "holdings": [
+            {
+                "company": h.company,
+                "fund": latest.fund_name or h.fund,
+                "industry": h.industry,
+                "currency": latest.fund_currency,
+                "reported_date": h.reported_date.isoformat() if h.reported_date else None,
+                "reported_value": h.reported_value,
+                "total_invested": h.total_invested,
+                "investment_multiple": h.investment_multiple,
+                "result_id": h.result_id
+            }
+            for h, latest in rows
+        ]
+    }
+
+
+@app.get("/api/search")
+async def search_documents(
+    q: str = Query(..., min_length=1, max_length=500),
+    source: Optional[str] = Query(None),
+    file_id: Optional[int] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Full-text search over the PDF pages, footnotes and company descriptions
+    of every processed file.
+    
+    Args:
+        q: Words and "quoted phrases" that must all match; OR between two terms
+            matches either, and a leading - excludes a term
+        source: Only "page", "footnote" or "company_description" hits
+        file_id: Only hits of this file
+        skip: Number of hits to skip
+        limit: Maximum number of hits to return
+        db: Database session
+    
+    Returns:
+        Hits with file and page references and a snippet, best matches first
+    """
+    if source and source not in SEARCH_SOURCES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported source '{source}'. Use one of: {', '.join(SEARCH_SOURCES)}"
+        )
+    
+    try:
+        hits = search(db, q, source=source, file_id=file_id, skip=skip, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "query": q,
+        "total": len(hits),
+        "skip": skip,
+        "limit": limit,
+        "hits": [
+            {
+                "file_id": hit["file_id"],
+                "filename": hit["filename"],
+                "result_id": hit["result_id"],
+                "source": hit["source"],
+                "page_number": hit["page_number"],
+                "title": hit["title"],
+                "snippet": hit["snippet"],
+                "score": round(hit["score"], 4)
+            }
+            for hit in hits
+        ]
+    }
+
+
+@app.post("/api/compare")
+async def compare_workbooks(
+    expected_file: UploadFile = File(...),
+    actual_file: UploadFile = File(...)
+):
+    """
+    Compare an uploaded workbook against an uploaded reference workbook.
+    
+    Args:
+        expected_file: Reference (ground truth) .xlsx file
+        actual_file: .xlsx file to score
+    
+    Returns:
+        Per-sheet precision/recall, compact diffs and overall totals
+    """
+    expected_path = _save_upload_to_temp(expected_file)
+    try:
+        actual_path = _save_upload_to_temp(actual_file)
+        try:
+            report = WorkbookComparator().compare(expected_path, actual_path)
+        finally:
+            os.remove(actual_path)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Workbook comparison failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=422, detail=f"Comparison failed: {str(e)}")
+    finally:
+        os.remove(expected_path)
+    
+    report["expected"] = expected_file.filename
+    report["actual"] = actual_file.filename
+    return report
+
+
+@app.post("/api/results/{result_id}/compare")
+async def compare_result(
+    result_id: int,
+    expected_file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Score a result's Excel file against an uploaded reference workbook.
+    
+    Args:
+        result_id: Result ID
+        expected_file: Reference (ground truth) .xlsx file
+        db: Database session
+    
+    Returns:
+        Per-sheet precision/recall, compact diffs and overall totals
+    """
+    db_result = ExtractionResultService.get_by_id_deferred(db, result_id)
+    if not db_result:
+        raise HTTPException(status_code=404, detail="Result not found")
+    
+    if not os.path.exists(db_result.excel_path):
+        raise HTTPException(status_code=404, detail="Excel file not found")
+    
+    start_time = time.time()
+    expected_path = _save_upload_to_temp(expected_file)
+    try:
+        report = WorkbookComparator().compare(expected_path, db_result.excel_path)
+    except Exception as e:
+        logger.error(f"Comparison failed for result {result_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=422, detail=f"Comparison failed: {str(e)}")
+    finally:
+        os.remove(expected_path)
+    
+    totals = report["totals"]
+    ExtractionLogService.create(
+        db, db_result.file_id,
+        f"Scored against {expected_file.filename}: precision={totals['precision']}, "
+        f"recall={totals['recall']}, f1={totals['f1']}",
+        LogLevelEnum.INFO, "accuracy_scoring", int((time.time() - start_time) * 1000)
+    )
+    
+    report["expected"] = expected_file.filename
+    report["actual"] = db_result.excel_filename
+    report["result_id"] = db_result.id
+    return report
+
+
+def _save_upload_to_temp(upload: UploadFile) -> str:
+    """Write an uploaded .xlsx file to a temporary path and return it."""
+    if Path(upload.filename or "").suffix.lower() != ".xlsx":
+        raise HTTPException(status_code=400, detail="Only .xlsx files can be compared")
+    
+    handle, path = tempfile.mkstemp(suffix=".xlsx")
+    with os.fdopen(handle, "wb") as buffer:
+        shutil.copyfileobj(upload.file, buffer)
+    return path
+
+
 @app.delete("/api/files/{file_id}")
 async def delete_file(
     file_id: int,
@@ -742,10 +1656,15 @@ async def delete_file(
     excel_path = None
     if db_file.extraction_result:
         excel_path = db_file.extraction_result.excel_path
+    fund_key = PortfolioService.get_fund_key_by_file_id(db, file_id)
     
     # Delete from database (cascade will handle related records)
     success = UploadedFileService.delete(db, file_id)
     
+    # The fund's rollups may have come from the deleted report
+    if success and fund_key:
+        refresh_funds(db, [fund_key])
+    
     # Delete physical files if requested
     files_deleted = []
     if delete_physical_files:
@@ -754,6 +1673,7 @@ async def delete_file(
             files_deleted.append(pdf_path)
         if excel_path and os.path.exists(excel_path):
             os.remove(excel_path)
+            remove_output_metadata(excel_path)
             files_deleted.append(excel_path)
     
     return {
@@ -763,6 +1683,27 @@ async def delete_file(
     }
 
 
+@app.post("/api/retention/sweep")
+async def run_retention_sweep(dry_run: bool = Query(True)):
+    """
+    Run a storage retention pass now.
+    
+    Args:
+        dry_run: Only report what would be removed (default)
+    
+    Returns:
+        Orphans removed, files evicted and remaining usage
+    """
+    return get_retention_manager().sweep(dry_run=dry_run)
+
+
 if __name__ == "__main__":
+    import sys
+    
+    if "--profile-startup" in sys.argv:
+        # Import and startup time per module, measured in a fresh interpreter
+        from profile_startup import main as profile_startup
+        sys.exit(profile_startup([arg for arg in sys.argv[1:] if arg != "--profile-startup"]))
+    
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
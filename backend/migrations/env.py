@@ -0,0 +1,52 @@
+"""
+Alembic environment.
+Runs migrations on the application's engine, so the database URL and
+connection options come from app.config like everywhere else.
+"""
+
+from alembic import context
+
+from app.database.database import engine
+from app.database.fulltext import FULLTEXT_PREFIX
+from app.database.models import Base
+
+target_metadata = Base.metadata
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """Leave the full-text index, created outside the models, out of autogenerate."""
+    return not (name or "").startswith(FULLTEXT_PREFIX)
+
+
+def run_migrations_offline() -> None:
+    """Emit SQL for the configured database without connecting to it."""
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        include_name=include_name,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run migrations on a connection of the application's engine."""
+    connection = context.config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata, include_name=include_name)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+    
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, include_name=include_name)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,117 @@
+"""Initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+Databases created by Base.metadata.create_all() before migrations existed
+are stamped at this revision by init_db() and migrated from here.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "uploaded_files",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("filename", sa.String(length=255), nullable=False),
+        sa.Column("original_filename", sa.String(length=255), nullable=False),
+        sa.Column("file_path", sa.String(length=512), nullable=False),
+        sa.Column("file_size", sa.Integer(), nullable=False),
+        sa.Column("mime_type", sa.String(length=100), nullable=True),
+        sa.Column("upload_timestamp", sa.DateTime(), nullable=False),
+        sa.Column("evicted_at", sa.DateTime(), nullable=True),
+        sa.Column("page_hashes", sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index(op.f("ix_uploaded_files_filename"), "uploaded_files", ["filename"], unique=False)
+    op.create_index(op.f("ix_uploaded_files_id"), "uploaded_files", ["id"], unique=False)
+    op.create_index(op.f("ix_uploaded_files_upload_timestamp"), "uploaded_files", ["upload_timestamp"], unique=False)
+    
+    op.create_table(
+        "extraction_logs",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("file_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "log_level",
+            sa.Enum("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL", name="loglevelenum"),
+            nullable=False
+        ),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("step", sa.String(length=100), nullable=True),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column("duration_ms", sa.Integer(), nullable=True),
+        sa.Column("extra_data", sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(["file_id"], ["uploaded_files.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index(op.f("ix_extraction_logs_file_id"), "extraction_logs", ["file_id"], unique=False)
+    op.create_index(op.f("ix_extraction_logs_id"), "extraction_logs", ["id"], unique=False)
+    op.create_index(op.f("ix_extraction_logs_log_level"), "extraction_logs", ["log_level"], unique=False)
+    op.create_index(op.f("ix_extraction_logs_timestamp"), "extraction_logs", ["timestamp"], unique=False)
+    
+    op.create_table(
+        "extraction_results",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("file_id", sa.Integer(), nullable=False),
+        sa.Column("excel_filename", sa.String(length=255), nullable=False),
+        sa.Column("excel_path", sa.String(length=512), nullable=False),
+        sa.Column("extracted_data", sa.JSON(), nullable=True),
+        sa.Column("extraction_timestamp", sa.DateTime(), nullable=False),
+        sa.Column("excel_evicted_at", sa.DateTime(), nullable=True),
+        sa.Column("processing_time", sa.Float(), nullable=True),
+        sa.Column("total_characters_extracted", sa.Integer(), nullable=True),
+        sa.Column("total_sheets_generated", sa.Integer(), nullable=True),
+        sa.Column("gemini_model_used", sa.String(length=100), nullable=True),
+        sa.Column("base_file_id", sa.Integer(), nullable=True),
+        sa.Column("inherited_sections", sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(["file_id"], ["uploaded_files.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index(op.f("ix_extraction_results_file_id"), "extraction_results", ["file_id"], unique=True)
+    op.create_index(op.f("ix_extraction_results_id"), "extraction_results", ["id"], unique=False)
+    
+    op.create_table(
+        "job_statuses",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("file_id", sa.Integer(), nullable=False),
+        sa.Column("job_id", sa.String(length=100), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "PROCESSING", "COMPLETED", "FAILED", "CANCELLED", name="jobstatusenum"),
+            nullable=False
+        ),
+        sa.Column("current_step", sa.String(length=100), nullable=True),
+        sa.Column("progress_percentage", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("retry_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["file_id"], ["uploaded_files.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index(op.f("ix_job_statuses_created_at"), "job_statuses", ["created_at"], unique=False)
+    op.create_index(op.f("ix_job_statuses_file_id"), "job_statuses", ["file_id"], unique=True)
+    op.create_index(op.f("ix_job_statuses_id"), "job_statuses", ["id"], unique=False)
+    op.create_index(op.f("ix_job_statuses_job_id"), "job_statuses", ["job_id"], unique=True)
+    op.create_index(op.f("ix_job_statuses_status"), "job_statuses", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table("job_statuses")
+    op.drop_table("extraction_results")
+    op.drop_table("extraction_logs")
+    op.drop_table("uploaded_files")
+    sa.Enum(name="jobstatusenum").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="loglevelenum").drop(op.get_bind(), checkfirst=True)
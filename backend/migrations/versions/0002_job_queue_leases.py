@@ -0,0 +1,41 @@
+"""Job parameters and worker leases on job_statuses
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 15:00:00
+
+Jobs are claimed from job_statuses by worker processes. The parameters of
+the upload are stored with the job, and the claiming worker holds a lease
+that it renews with heartbeats.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("job_statuses") as batch_op:
+        batch_op.add_column(sa.Column("template_id", sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column("prior_file_id", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("worker_id", sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column("heartbeat_at", sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column("lease_expires_at", sa.DateTime(), nullable=True))
+        batch_op.create_index(op.f("ix_job_statuses_lease_expires_at"), ["lease_expires_at"], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("job_statuses") as batch_op:
+        batch_op.drop_index(op.f("ix_job_statuses_lease_expires_at"))
+        batch_op.drop_column("lease_expires_at")
+        batch_op.drop_column("heartbeat_at")
+        batch_op.drop_column("worker_id")
+        batch_op.drop_column("prior_file_id")
+        batch_op.drop_column("template_id")
@@ -0,0 +1,157 @@
+"""Normalized portfolio tables
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 18:00:00
+
+Fund summaries, holdings, company profiles and company financials are
+flattened out of extraction_results.extracted_data into indexed tables.
+Results stored before this revision are indexed by
+backfill_portfolio_tables.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "fund_summaries",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("result_id", sa.Integer(), nullable=False),
+        sa.Column("general_partner", sa.String(length=255), nullable=True),
+        sa.Column("fund_name", sa.String(length=255), nullable=True),
+        sa.Column("fund_currency", sa.String(length=20), nullable=True),
+        sa.Column("reporting_period", sa.String(length=100), nullable=True),
+        sa.Column("report_date", sa.Date(), nullable=True),
+        sa.Column("total_commitments", sa.Float(), nullable=True),
+        sa.Column("total_drawdowns", sa.Float(), nullable=True),
+        sa.Column("remaining_commitments", sa.Float(), nullable=True),
+        sa.Column("total_distributions", sa.Float(), nullable=True),
+        sa.Column("net_contributions", sa.Float(), nullable=True),
+        sa.Column("assets_under_management", sa.Float(), nullable=True),
+        sa.Column("nav", sa.Float(), nullable=True),
+        sa.Column("fair_value", sa.Float(), nullable=True),
+        sa.Column("total_investments", sa.Float(), nullable=True),
+        sa.Column("realized_investments", sa.Float(), nullable=True),
+        sa.Column("unrealized_investments", sa.Float(), nullable=True),
+        sa.Column("dpi", sa.Float(), nullable=True),
+        sa.Column("rvpi", sa.Float(), nullable=True),
+        sa.Column("tvpi", sa.Float(), nullable=True),
+        sa.Column("irr", sa.Float(), nullable=True),
+        sa.Column("moic", sa.Float(), nullable=True),
+        sa.Column("region_breakdown", sa.JSON(), nullable=True),
+        sa.Column("industry_breakdown", sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(["result_id"], ["extraction_results.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index(op.f("ix_fund_summaries_id"), "fund_summaries", ["id"], unique=False)
+    op.create_index(op.f("ix_fund_summaries_result_id"), "fund_summaries", ["result_id"], unique=True)
+    op.create_index(op.f("ix_fund_summaries_fund_name"), "fund_summaries", ["fund_name"], unique=False)
+    op.create_index(op.f("ix_fund_summaries_report_date"), "fund_summaries", ["report_date"], unique=False)
+    
+    op.create_table(
+        "portfolio_investments",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("result_id", sa.Integer(), nullable=False),
+        sa.Column("company", sa.String(length=255), nullable=False),
+        sa.Column("company_key", sa.String(length=255), nullable=False),
+        sa.Column("fund", sa.String(length=255), nullable=True),
+        sa.Column("industry", sa.String(length=255), nullable=True),
+        sa.Column("reported_date", sa.Date(), nullable=True),
+        sa.Column("investment_status", sa.String(length=100), nullable=True),
+        sa.Column("security_type", sa.String(length=255), nullable=True),
+        sa.Column("initial_investment_date", sa.Date(), nullable=True),
+        sa.Column("total_invested", sa.Float(), nullable=True),
+        sa.Column("current_cost", sa.Float(), nullable=True),
+        sa.Column("reported_value", sa.Float(), nullable=True),
+        sa.Column("realized_proceeds", sa.Float(), nullable=True),
+        sa.Column("fund_ownership_percent", sa.Float(), nullable=True),
+        sa.Column("investment_multiple", sa.Float(), nullable=True),
+        sa.Column("irr", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(["result_id"], ["extraction_results.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index(op.f("ix_portfolio_investments_id"), "portfolio_investments", ["id"], unique=False)
+    op.create_index(op.f("ix_portfolio_investments_result_id"), "portfolio_investments", ["result_id"], unique=False)
+    op.create_index(op.f("ix_portfolio_investments_industry"), "portfolio_investments", ["industry"], unique=False)
+    op.create_index(op.f("ix_portfolio_investments_reported_date"), "portfolio_investments", ["reported_date"], unique=False)
+    op.create_index(
+        "ix_portfolio_investments_company_key_reported_date", "portfolio_investments",
+        ["company_key", "reported_date"], unique=False
+    )
+    op.create_index(
+        "ix_portfolio_investments_fund_reported_date", "portfolio_investments",
+        ["fund", "reported_date"], unique=False
+    )
+    
+    op.create_table(
+        "portfolio_company_profiles",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("result_id", sa.Integer(), nullable=False),
+        sa.Column("company_name", sa.String(length=255), nullable=False),
+        sa.Column("company_key", sa.String(length=255), nullable=False),
+        sa.Column("fund", sa.String(length=255), nullable=True),
+        sa.Column("industry", sa.String(length=255), nullable=True),
+        sa.Column("headquarters", sa.String(length=255), nullable=True),
+        sa.Column("securities_held", sa.String(length=255), nullable=True),
+        sa.Column("initial_investment_date", sa.Date(), nullable=True),
+        sa.Column("fund_ownership_percent", sa.Float(), nullable=True),
+        sa.Column("investment_commitment", sa.Float(), nullable=True),
+        sa.Column("invested_capital", sa.Float(), nullable=True),
+        sa.Column("reported_value", sa.Float(), nullable=True),
+        sa.Column("realized_proceeds", sa.Float(), nullable=True),
+        sa.Column("investment_multiple", sa.Float(), nullable=True),
+        sa.Column("gross_irr", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(["result_id"], ["extraction_results.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index(op.f("ix_portfolio_company_profiles_id"), "portfolio_company_profiles", ["id"], unique=False)
+    op.create_index(op.f("ix_portfolio_company_profiles_result_id"), "portfolio_company_profiles", ["result_id"], unique=False)
+    op.create_index(op.f("ix_portfolio_company_profiles_company_key"), "portfolio_company_profiles", ["company_key"], unique=False)
+    op.create_index(op.f("ix_portfolio_company_profiles_fund"), "portfolio_company_profiles", ["fund"], unique=False)
+    op.create_index(op.f("ix_portfolio_company_profiles_industry"), "portfolio_company_profiles", ["industry"], unique=False)
+    
+    op.create_table(
+        "portfolio_company_financials",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("result_id", sa.Integer(), nullable=False),
+        sa.Column("company", sa.String(length=255), nullable=False),
+        sa.Column("company_key", sa.String(length=255), nullable=False),
+        sa.Column("fund", sa.String(length=255), nullable=True),
+        sa.Column("company_currency", sa.String(length=20), nullable=True),
+        sa.Column("operating_data_date", sa.Date(), nullable=True),
+        sa.Column("ltm_revenue", sa.Float(), nullable=True),
+        sa.Column("ltm_ebitda", sa.Float(), nullable=True),
+        sa.Column("cash", sa.Float(), nullable=True),
+        sa.Column("gross_debt", sa.Float(), nullable=True),
+        sa.Column("yoy_revenue_growth", sa.Float(), nullable=True),
+        sa.Column("ebitda_margin", sa.Float(), nullable=True),
+        sa.Column("total_enterprise_value", sa.Float(), nullable=True),
+        sa.Column("tev_multiple", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(["result_id"], ["extraction_results.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index(op.f("ix_portfolio_company_financials_id"), "portfolio_company_financials", ["id"], unique=False)
+    op.create_index(op.f("ix_portfolio_company_financials_result_id"), "portfolio_company_financials", ["result_id"], unique=False)
+    op.create_index(op.f("ix_portfolio_company_financials_company_key"), "portfolio_company_financials", ["company_key"], unique=False)
+    op.create_index(op.f("ix_portfolio_company_financials_fund"), "portfolio_company_financials", ["fund"], unique=False)
+    op.create_index(
+        op.f("ix_portfolio_company_financials_operating_data_date"), "portfolio_company_financials",
+        ["operating_data_date"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("portfolio_company_financials")
+    op.drop_table("portfolio_company_profiles")
+    op.drop_table("portfolio_investments")
+    op.drop_table("fund_summaries")
@@ -0,0 +1,91 @@
+"""Analytics rollup tables
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 20:00:00
+
+Fund summaries get a fund_key matching the same fund across reports, and
+three rollup tables maintained per fund back the /api/analytics endpoints.
+Rollups of results indexed before this revision are built by
+backfill_portfolio_tables.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("fund_summaries") as batch_op:
+        batch_op.add_column(sa.Column("fund_key", sa.String(length=255), nullable=True))
+        batch_op.create_index(op.f("ix_fund_summaries_fund_key"), ["fund_key"], unique=False)
+    
+    op.create_table(
+        "analytics_fund_latest",
+        sa.Column("fund_key", sa.String(length=255), nullable=False),
+        sa.Column("fund_name", sa.String(length=255), nullable=True),
+        sa.Column("result_id", sa.Integer(), nullable=False),
+        sa.Column("report_date", sa.Date(), nullable=True),
+        sa.Column("fund_currency", sa.String(length=20), nullable=True),
+        sa.Column("nav", sa.Float(), nullable=True),
+        sa.Column("tvpi", sa.Float(), nullable=True),
+        sa.Column("dpi", sa.Float(), nullable=True),
+        sa.Column("irr", sa.Float(), nullable=True),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("fund_key")
+    )
+    op.create_index(op.f("ix_analytics_fund_latest_result_id"), "analytics_fund_latest", ["result_id"], unique=False)
+    
+    op.create_table(
+        "analytics_fund_quarters",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("fund_key", sa.String(length=255), nullable=False),
+        sa.Column("fund_name", sa.String(length=255), nullable=True),
+        sa.Column("quarter", sa.String(length=7), nullable=False),
+        sa.Column("report_date", sa.Date(), nullable=False),
+        sa.Column("result_id", sa.Integer(), nullable=False),
+        sa.Column("nav", sa.Float(), nullable=True),
+        sa.Column("tvpi", sa.Float(), nullable=True),
+        sa.Column("dpi", sa.Float(), nullable=True),
+        sa.Column("rvpi", sa.Float(), nullable=True),
+        sa.Column("irr", sa.Float(), nullable=True),
+        sa.Column("total_commitments", sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("fund_key", "quarter", name="uq_analytics_fund_quarters_fund_key_quarter")
+    )
+    op.create_index(op.f("ix_analytics_fund_quarters_id"), "analytics_fund_quarters", ["id"], unique=False)
+    op.create_index(op.f("ix_analytics_fund_quarters_fund_key"), "analytics_fund_quarters", ["fund_key"], unique=False)
+    op.create_index(op.f("ix_analytics_fund_quarters_quarter"), "analytics_fund_quarters", ["quarter"], unique=False)
+    
+    op.create_table(
+        "analytics_exposures",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("fund_key", sa.String(length=255), nullable=False),
+        sa.Column("dimension", sa.String(length=20), nullable=False),
+        sa.Column("bucket", sa.String(length=255), nullable=False),
+        sa.Column("currency", sa.String(length=20), nullable=True),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index(op.f("ix_analytics_exposures_id"), "analytics_exposures", ["id"], unique=False)
+    op.create_index(op.f("ix_analytics_exposures_fund_key"), "analytics_exposures", ["fund_key"], unique=False)
+    op.create_index(
+        "ix_analytics_exposures_dimension_bucket", "analytics_exposures",
+        ["dimension", "bucket"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("analytics_exposures")
+    op.drop_table("analytics_fund_quarters")
+    op.drop_table("analytics_fund_latest")
+    with op.batch_alter_table("fund_summaries") as batch_op:
+        batch_op.drop_index(op.f("ix_fund_summaries_fund_key"))
+        batch_op.drop_column("fund_key")
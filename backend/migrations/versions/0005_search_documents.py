@@ -0,0 +1,46 @@
+"""Full-text search documents
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 22:00:00
+
+Page text, footnotes and company descriptions of each uploaded file are
+stored in search_documents with a full-text index (FTS5 on SQLite, a GIN
+tsvector index on PostgreSQL). Files processed before this revision are
+indexed by backfill_search_index.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.database.fulltext import create_fulltext_index, drop_fulltext_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "search_documents",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("file_id", sa.Integer(), nullable=False),
+        sa.Column("source", sa.String(length=30), nullable=False),
+        sa.Column("page_number", sa.Integer(), nullable=True),
+        sa.Column("title", sa.String(length=255), nullable=True),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(["file_id"], ["uploaded_files.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index(op.f("ix_search_documents_id"), "search_documents", ["id"], unique=False)
+    op.create_index(op.f("ix_search_documents_file_id"), "search_documents", ["file_id"], unique=False)
+    create_fulltext_index(op.get_bind())
+
+
+def downgrade() -> None:
+    drop_fulltext_index(op.get_bind())
+    op.drop_table("search_documents")
@@ -0,0 +1,35 @@
+"""Idempotency keys of extraction jobs
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 09:00:00
+
+Jobs record the Idempotency-Key of the /api/extract request that created
+them and a fingerprint of that request, so retried uploads return the
+existing job.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("job_statuses") as batch_op:
+        batch_op.add_column(sa.Column("idempotency_key", sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column("request_fingerprint", sa.String(length=64), nullable=True))
+        batch_op.create_index(op.f("ix_job_statuses_idempotency_key"), ["idempotency_key"], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("job_statuses") as batch_op:
+        batch_op.drop_index(op.f("ix_job_statuses_idempotency_key"))
+        batch_op.drop_column("request_fingerprint")
+        batch_op.drop_column("idempotency_key")
@@ -0,0 +1,29 @@
+"""Index of job completion times
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 12:00:00
+
+Admission control measures recent throughput by counting the jobs that
+finished within a time window.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("job_statuses") as batch_op:
+        batch_op.create_index(op.f("ix_job_statuses_completed_at"), ["completed_at"], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("job_statuses") as batch_op:
+        batch_op.drop_index(op.f("ix_job_statuses_completed_at"))
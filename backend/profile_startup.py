@@ -0,0 +1,175 @@
+"""
+Profile the cold start of the API: import time per module, the startup steps
+and the imports deferred to the first request. Runs in a fresh interpreter
+so nothing is imported or cached beforehand.
+
+Usage:
+    python main.py --profile-startup [--top 15] [--json report.json]
+    python profile_startup.py [--top 15] [--json report.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Heavy dependencies loaded by the services on first use
+DEFERRED_IMPORTS = [
+    "pdfplumber",
+    "openpyxl",
+    "google.generativeai",
+    "google.ai.generativelanguage",
+    "pyarrow",
+]
+
+
+def run_child():
+    """Measure startup inside the fresh interpreter and print the timings as JSON."""
+    timings = {}
+    
+    start = time.perf_counter()
+    import main
+    timings["import_main"] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    main.init_db()
+    timings["init_db"] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    main.get_client_pool()
+    timings["client_pool"] = time.perf_counter() - start
+    
+    # 0 = imported during startup, None = loaded by an earlier entry of the list
+    preloaded = {module for module in DEFERRED_IMPORTS if module in sys.modules}
+    deferred = {}
+    for module in DEFERRED_IMPORTS:
+        if module in sys.modules:
+            deferred[module] = 0.0 if module in preloaded else None
+            continue
+        start = time.perf_counter()
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        deferred[module] = time.perf_counter() - start
+    timings["deferred_imports"] = deferred
+    
+    print(json.dumps(timings))
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Parse `python -X importtime` output.
+    
+    Returns:
+        List of (module, depth, self_seconds, cumulative_seconds) in import order
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        entries.append((name.strip(), depth, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return entries
+
+
+def build_report(entries: list, timings: dict, top: int) -> dict:
+    """Group import times by module and combine them with the startup timings."""
+    # importtime lists a module after everything it imported, one level deeper
+    direct = []
+    main_index = next((idx for idx, entry in enumerate(entries) if entry[0] == "main"), None)
+    if main_index is not None:
+        main_depth = entries[main_index][1]
+        for entry in reversed(entries[:main_index]):
+            if entry[1] <= main_depth:
+                break
+            if entry[1] == main_depth + 1:
+                direct.append(entry)
+    app_modules = [entry for entry in entries if entry[0].startswith("app.")]
+    
+    return {
+        "import_main_seconds": round(timings["import_main"], 4),
+        "startup_steps_seconds": {
+            "init_db (schema check)": round(timings["init_db"], 4),
+            "client pool": round(timings["client_pool"], 4),
+        },
+        "imported_by_main": [
+            {"module": name, "cumulative_seconds": round(cumulative, 4)}
+            for name, _, _, cumulative in sorted(direct, key=lambda entry: -entry[3])[:top]
+        ],
+        "app_modules": [
+            {"module": name, "self_seconds": round(own, 4), "cumulative_seconds": round(cumulative, 4)}
+            for name, _, own, cumulative in sorted(app_modules, key=lambda entry: -entry[3])[:top]
+        ],
+        "deferred_to_first_use_seconds": {
+            module: None if seconds is None else round(seconds, 4)
+            for module, seconds in timings["deferred_imports"].items()
+        },
+    }
+
+
+def print_report(report: dict):
+    print("=" * 80)
+    print("STARTUP PROFILE")
+    print("=" * 80)
+    print(f"import main: {report['import_main_seconds'] * 1000:8.1f} ms")
+    for step, seconds in report["startup_steps_seconds"].items():
+        print(f"{step + ':':<28} {seconds * 1000:8.1f} ms")
+    
+    print("\nImported by main (cumulative):")
+    for entry in report["imported_by_main"]:
+        print(f"  {entry['module']:<44} {entry['cumulative_seconds'] * 1000:8.1f} ms")
+    
+    print("\nApplication modules (self / cumulative):")
+    for entry in report["app_modules"]:
+        print(
+            f"  {entry['module']:<44} {entry['self_seconds'] * 1000:8.1f} ms "
+            f"{entry['cumulative_seconds'] * 1000:8.1f} ms"
+        )
+    
+    print("\nDeferred to first use (paid by the first request that needs them):")
+    for module, seconds in report["deferred_to_first_use_seconds"].items():
+        if seconds is None:
+            note = "loaded with a module above"
+        elif seconds == 0:
+            note = "already imported at startup"
+        else:
+            note = f"{seconds * 1000:8.1f} ms"
+        print(f"  {module:<44} {note}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="Number of modules listed per table")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    args = parser.parse_args(argv)
+    
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        return result.returncode
+    
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    report = build_report(parse_importtime(result.stderr), timings, args.top)
+    print_report(report)
+    
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"\nReport written to {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        run_child()
+    else:
+        sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Score extracted workbooks against reference workbooks for regression runs.
+Compares each (expected, actual) pair in a pool of worker processes and
+prints per-sheet and overall precision/recall.
+
+Usage:
+    python score_extractions.py expected.xlsx actual.xlsx
+    python score_extractions.py --pairs pairs.csv [--workers 4] [--json report.json]
+
+The pairs file has one "expected_path,actual_path" pair per line.
+"""
+
+import argparse
+import csv
+import json
+import logging
+
+from app.services.workbook_compare import compare_many
+
+logging.disable(logging.INFO)
+
+
+def read_pairs(path: str) -> list:
+    """Read (expected, actual) pairs from a two-column CSV file."""
+    with open(path, newline="", encoding="utf-8") as handle:
+        return [
+            (row[0].strip(), row[1].strip())
+            for row in csv.reader(handle)
+            if len(row) >= 2 and not row[0].startswith("#")
+        ]
+
+
+def format_score(value) -> str:
+    return "-" if value is None else f"{value:.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("expected", nargs="?")
+    parser.add_argument("actual", nargs="?")
+    parser.add_argument("--pairs", help="CSV file of expected,actual workbook paths")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--diffs", action="store_true", help="Keep cell diffs in the JSON report")
+    parser.add_argument("--json", dest="json_path", help="Write the full report to this file")
+    args = parser.parse_args()
+    
+    if args.pairs:
+        pairs = read_pairs(args.pairs)
+    elif args.expected and args.actual:
+        pairs = [(args.expected, args.actual)]
+    else:
+        parser.error("provide EXPECTED ACTUAL or --pairs")
+    
+    reports = compare_many(pairs, max_workers=args.workers, include_diffs=args.diffs)
+    
+    print("=" * 80)
+    print(f"ACCURACY SCORES ({len(reports)} comparisons)")
+    print("=" * 80)
+    
+    totals = {"expected": 0, "actual": 0, "matched": 0}
+    failed = 0
+    for report in reports:
+        print(f"\n{report['actual']}  vs  {report['expected']}")
+        if "error" in report:
+            failed += 1
+            print(f"  ERROR: {report['error']}")
+            continue
+        
+        for sheet in report["sheets"]:
+            print(
+                f"  {sheet['sheet'][:32]:<32} {sheet['status']:<9} "
+                f"P={format_score(sheet.get('precision'))} "
+                f"R={format_score(sheet.get('recall'))} "
+                f"F1={format_score(sheet.get('f1'))}"
+            )
+        for name in totals:
+            totals[name] += report["totals"]["cells"][name]
+        print(f"  {'TOTAL':<42} F1={format_score(report['totals']['f1'])}")
+    
+    precision = totals["matched"] / totals["actual"] if totals["actual"] else None
+    recall = totals["matched"] / totals["expected"] if totals["expected"] else None
+    print("\n" + "=" * 80)
+    print(f"Overall: P={format_score(precision)} R={format_score(recall)} ({failed} failed)")
+    
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump(reports, handle, indent=2, default=str)
+        print(f"Report written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,5 +6,6 @@ echo "Setting up directories..."
 mkdir -p uploads
 mkdir -p outputs
 mkdir -p static
+mkdir -p cache/pages
 
 echo "Directories created successfully!"
@@ -0,0 +1,77 @@
+"""
+Test local repair of malformed and truncated Gemini responses
+A truncated response keeps only the elements that were complete when it was
+cut off; syntax errors of a complete response are fixed without marking it
+truncated.
+
+Run with: python test_json_repair.py
+"""
+
+from app.services.json_repair import repair_json
+
+
+def test_truncated_number_is_dropped():
+    text = '{"nav": 1500000, "irr": 12'
+    data, report = repair_json(text)
+    
+    assert data == {"nav": 1500000}
+    assert report.truncated
+    assert report.kept_chars == len('{"nav": 1500000')
+    assert report.dropped_chars == len(text) - report.kept_chars
+    print(f"✅ Partial number dropped: {data} ({report.summary()})")
+
+
+def test_truncated_literal_is_dropped():
+    text = '{"a": 1, "b": tru'
+    data, report = repair_json(text)
+    
+    assert data == {"a": 1}
+    assert report.truncated
+    assert report.kept_chars == 7
+    assert report.total_chars == 17
+    assert report.kept_chars <= report.total_chars
+    print(f"✅ Partial literal dropped: {data} ({report.summary()})")
+
+
+def test_truncated_nested_elements_keep_complete_items():
+    text = '```json\n{"sheets": [{"name": "A", "rows": [1, 2]}, {"name": "B", "rows": [3'
+    data, report = repair_json(text)
+    
+    assert data == {"sheets": [{"name": "A", "rows": [1, 2]}, {"name": "B"}]}
+    assert report.truncated
+    assert text[:report.kept_chars].endswith('"name": "B"')
+    print(f"✅ Complete items of a truncated list kept ({report.summary()})")
+
+
+def test_malformed_response_is_not_truncated():
+    data, report = repair_json('Here you go:\n{"a": 1, "b": True, "c": [1, 2,],}')
+    
+    assert data == {"a": 1, "b": True, "c": [1, 2]}
+    assert not report.truncated
+    assert report.dropped_chars == 0
+    assert report.fixes["removed trailing comma"] == 2
+    
+    data, report = repair_json('{"a": 1, "b": }')
+    assert data == {"a": 1}
+    assert not report.truncated
+    assert "dropped unparseable element" in report.fixes
+    print("✅ Malformed but complete responses repaired without being marked truncated")
+
+
+def test_complete_response_kept_whole():
+    text = '```json\n{"a": {"b": [1, 2.5e3, "x"]}}\n```'
+    data, report = repair_json(text)
+    
+    assert data == {"a": {"b": [1, 2500.0, "x"]}}
+    assert not report.truncated
+    assert text[:report.kept_chars].endswith("}}")
+    print("✅ Complete response parsed unchanged")
+
+
+if __name__ == "__main__":
+    test_truncated_number_is_dropped()
+    test_truncated_literal_is_dropped()
+    test_truncated_nested_elements_keep_complete_items()
+    test_malformed_response_is_not_truncated()
+    test_complete_response_kept_whole()
+    print("All JSON repair tests passed")
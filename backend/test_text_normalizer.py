@@ -0,0 +1,69 @@
+"""
+Test cross-page boilerplate removal
+Running headers, footers and page numbers are dropped after their first page,
+while lines that differ only in their amounts (page totals, holdings) are kept.
+
+Run with: python test_text_normalizer.py
+"""
+
+from app.services.text_normalizer import BoilerplateRemover
+
+
+def make_pages(count=6):
+    """Short pages whose first and last lines carry per-page numbers."""
+    pages = []
+    for page in range(1, count + 1):
+        pages.append("\n".join([
+            "Horizon Capital Partners Fund II, L.P. - Quarterly Report",
+            f"Holding A{page} Corp invested {page * 1000} in Series B preferred",
+            f"Holding B{page} Ltd invested {page * 250} in common equity",
+            "Confidential - for limited partners only, do not distribute",
+            f"Total fair value of investments ${page * 1234567:,}",
+            f"Page {page} of {count}",
+        ]))
+    return pages
+
+
+def test_page_totals_are_kept():
+    pages = make_pages()
+    normalized, stats = BoilerplateRemover().normalize_pages(pages)
+    
+    for page, text in enumerate(normalized, start=1):
+        assert f"Total fair value of investments ${page * 1234567:,}" in text
+        assert f"Holding A{page} Corp invested {page * 1000} in Series B preferred" in text
+        assert f"Holding B{page} Ltd invested {page * 250} in common equity" in text
+    assert all(text.strip() for text in normalized)
+    print(f"✅ Page totals and holdings kept on all {len(normalized)} pages")
+
+
+def test_repeated_header_footer_and_page_numbers_removed():
+    pages = make_pages()
+    normalized, stats = BoilerplateRemover().normalize_pages(pages)
+    
+    assert "Quarterly Report" in normalized[0]
+    assert "Confidential" in normalized[0]
+    assert "Page 1 of 6" in normalized[0]
+    for text in normalized[1:]:
+        assert "Quarterly Report" not in text
+        assert "Confidential" not in text
+        assert "Page " not in text
+    assert stats["boilerplate_lines_removed"] == 3 * (len(pages) - 1)
+    print(f"✅ Removed {stats['boilerplate_lines_removed']} repeated header, notice and page number lines")
+
+
+def test_lone_page_numbers_removed():
+    pages = [f"Schedule of investments row {page}\nAcme Corp {page * 10}\n- {page} -" for page in range(1, 6)]
+    normalized, _ = BoilerplateRemover().normalize_pages(pages)
+    
+    assert normalized[0].endswith("- 1 -")
+    for page, text in enumerate(normalized[1:], start=2):
+        assert f"- {page} -" not in text
+        assert f"Acme Corp {page * 10}" in text
+    print("✅ Lone page numbers removed, numbered rows kept")
+
+
+if __name__ == "__main__":
+    test_page_totals_are_kept()
+    test_repeated_header_footer_and_page_numbers_removed()
+    test_lone_page_numbers_removed()
+    print("All text normalizer tests passed")
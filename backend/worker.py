@@ -0,0 +1,135 @@
+"""
+Extraction worker: claims queued jobs from the database and processes them.
+Run any number of these processes, on any number of machines sharing the
+database and the uploads/outputs storage, next to an API started with
+JOB_QUEUE_ENABLED=true.
+
+Usage:
+    python worker.py [--worker-id ID] [--poll-interval 2] [--max-jobs N] [--once]
+"""
+
+import argparse
+import logging
+import signal
+import sys
+import threading
+
+from app.config import settings
+from app.database import SessionLocal, init_db
+from app.services.extraction_job import run_extraction_job
+from app.services.cancellation import JobCancelledError
+from app.services.job_queue import JobQueue, LeaseLostError
+from app.services.llm_client_pool import get_client_pool, close_client_pool
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("worker")
+
+
+class Worker:
+    """Claim-process loop of one worker process."""
+    
+    def __init__(self, queue: JobQueue, poll_interval: float):
+        self.queue = queue
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+        self.processed = 0
+        self.failed = 0
+        self.cancelled = 0
+    
+    def stop(self, *_):
+        """Finish the current job, then exit."""
+        if not self.stopping.is_set():
+            logger.info("Stopping after the current job...")
+        self.stopping.set()
+    
+    def run_once(self) -> bool:
+        """
+        Requeue expired leases and process at most one job.
+        
+        Returns:
+            Whether a job was claimed
+        """
+        db = SessionLocal()
+        try:
+            self.queue.requeue_expired(db)
+            job = self.queue.claim(db)
+            if job is None:
+                return False
+            
+            try:
+                with self.queue.lease(job) as lease:
+                    run_extraction_job(db, job, get_client_pool(), lease=lease)
+                self.processed += 1
+            except LeaseLostError:
+                pass
+            except JobCancelledError:
+                # The client pool and rate limiter slots are free for the next job
+                self.cancelled += 1
+            except Exception:
+                # Already logged and recorded on the job by the pipeline
+                self.failed += 1
+            return True
+        finally:
+            db.close()
+    
+    def run(self, max_jobs: int = 0, once: bool = False):
+        """
+        Process jobs until stopped.
+        
+        Args:
+            max_jobs: Exit after this many jobs (0 = no limit)
+            once: Exit as soon as the queue is empty
+        """
+        logger.info(f"Worker {self.queue.worker_id} started")
+        while not self.stopping.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception as e:
+                logger.error(f"Worker loop error: {str(e)}", exc_info=True)
+                claimed = False
+            
+            if max_jobs and self.processed + self.failed + self.cancelled >= max_jobs:
+                break
+            if not claimed:
+                if once:
+                    break
+                self.stopping.wait(self.poll_interval)
+        logger.info(
+            f"Worker {self.queue.worker_id} stopped: {self.processed} jobs completed, "
+            f"{self.failed} failed, {self.cancelled} cancelled"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker-id", help="Identifier recorded on claimed jobs (default: host:pid)")
+    parser.add_argument(
+        "--poll-interval", type=float, default=settings.JOB_POLL_INTERVAL_SECONDS,
+        help="Seconds between polls while the queue is empty"
+    )
+    parser.add_argument("--max-jobs", type=int, default=0, help="Exit after this many jobs")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    args = parser.parse_args(argv)
+    
+    if not settings.GEMINI_API_KEY:
+        logger.error("Gemini API key not configured. Please set GEMINI_API_KEY in .env file")
+        return 1
+    
+    init_db()
+    get_client_pool().warm_up()
+    
+    worker = Worker(JobQueue(worker_id=args.worker_id), args.poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    try:
+        worker.run(max_jobs=args.max_jobs, once=args.once)
+    finally:
+        close_client_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
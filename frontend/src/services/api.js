@@ -6,13 +6,17 @@ const api = axios.create({
   baseURL: API_BASE_URL,
 });
 
-export const uploadFiles = async (files, templateId) => {
+export const uploadFiles = async (files, templateId, priorFileId = null) => {
   const formData = new FormData();
   
   // The new backend only supports single file upload
   const file = files[0];
   formData.append('file', file);
   formData.append('template_id', templateId || 'fund_report_v1');
+  // Previous report of the same fund: only changed pages are re-extracted
+  if (priorFileId) {
+    formData.append('prior_file_id', priorFileId);
+  }
   
   const response = await api.post('/extract', formData, {
     headers: {
@@ -20,6 +24,28 @@ export const uploadFiles = async (files, templateId) => {
     },
   });
   
+  // 202: queued for a worker process, wait until it has been processed
+  if (response.status === 202) {
+    return waitForJob(response.data.job_id);
+  }
+  return response.data;
+};
+
+export const waitForJob = async (jobId, intervalMs = 2000) => {
+  for (;;) {
+    const { data } = await api.get(`/jobs/${jobId}`);
+    if (data.status === 'completed') {
+      return data.result;
+    }
+    if (data.status === 'failed' || data.status === 'cancelled') {
+      throw new Error(data.error_message || `Extraction ${data.status}`);
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
+
+export const cancelJob = async (jobId) => {
+  const response = await api.post(`/jobs/${jobId}/cancel`);
   return response.data;
 };
 
@@ -49,5 +75,29 @@ export const downloadFile = async (filename) => {
   window.open(url, '_blank');
 };
 
+export const getResultSheets = async (resultId) => {
+  const response = await api.get(`/results/${resultId}/sheets`);
+  return response.data;
+};
+
+export const getResultSheetRows = async (resultId, sheet, offset = 0, limit = 100) => {
+  const response = await api.get(`/results/${resultId}/sheets/${encodeURIComponent(sheet)}`, {
+    params: { offset, limit },
+  });
+  return response.data;
+};
+
+export const compareResultWithReference = async (resultId, expectedFile) => {
+  const formData = new FormData();
+  formData.append('expected_file', expectedFile);
+  
+  const response = await api.post(`/results/${resultId}/compare`, formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+  return response.data;
+};
+
 export default api;
 